@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import AuditLog, Product
+from django.utils import timezone
+from .jobs import scrubbed_job_names
+from .models import AuditLog, Job, Product
+from .search import search_products
 
 # Register your models here.
 
@@ -9,6 +12,12 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ['is_archived', 'created_at']
     search_fields = ['name', 'description']
 
+    def get_search_results(self, request, queryset, search_term):
+        # Use the FTS index instead of icontains scans over name/description.
+        if not search_term:
+            return queryset, False
+        return search_products(queryset, search_term), False
+
 
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
@@ -22,3 +31,28 @@ class AuditLogAdmin(admin.ModelAdmin):
 
     def has_change_permission(self, request, obj=None):
         return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'queue', 'status', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'queue', 'name']
+    readonly_fields = [
+        'name', 'queue', 'payload', 'attempts', 'locked_by', 'locked_until', 'last_error', 'created_at', 'finished_at',
+    ]
+    actions = ['retry_now']
+
+    @admin.action(description="Queue selected jobs to run again now")
+    def retry_now(self, request, queryset):
+        # Finished jobs of scrubbing handlers no longer have their payload.
+        retryable = queryset.exclude(status='running').exclude(
+            name__in=scrubbed_job_names(), status__in=['succeeded', 'failed'],
+        )
+        updated = retryable.update(
+            status='queued', attempts=0, run_at=timezone.now(), locked_by='', locked_until=None,
+        )
+        skipped = queryset.count() - updated
+        message = f"{updated} job(s) queued."
+        if skipped:
+            message += f" {skipped} job(s) skipped: running, or finished with their payload cleared."
+        self.message_user(request, message)
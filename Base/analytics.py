@@ -0,0 +1,247 @@
+# Base/analytics.py
+"""
+Columnar sales analytics on NumPy arrays.
+
+Checked-out build lines are loaded once into flat arrays (one element per
+PCBuildItem) and kept in process memory until sales_data_version() changes,
+so reports over millions of lines are a few vectorized passes instead of
+ORM round trips. NumPy is optional; callers should check numpy_available().
+"""
+import threading
+from array import array
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import BigIntegerField, F, Value
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
+
+from .models import CATEGORY_CHOICES, PCBuildItem
+from .sales import sales_data_version
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+CATEGORIES = tuple(key for key, _ in CATEGORY_CHOICES)
+PERIODS = ('day', 'week', 'month')
+LOAD_CHUNK_SIZE = 10000
+
+_EPOCH = date(1970, 1, 1)
+_cache_lock = threading.Lock()
+_cached = {'version': None, 'frame': None}
+
+
+def numpy_available():
+    return np is not None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImproperlyConfigured("Sales analytics require NumPy; install numpy to enable them.")
+
+
+def _cents(total):
+    return (Decimal(int(total)) / 100).quantize(Decimal('0.01'))
+
+
+class SalesFrame:
+    """
+    Parallel arrays describing checked-out build lines.
+
+    timestamps are the build's local wall-clock time in seconds since the
+    epoch, prices are integer cents and categories are indexes into
+    CATEGORIES (len(CATEGORIES) for anything unknown).
+    """
+
+    COLUMNS = (
+        'build_ids', 'user_ids', 'timestamps', 'archived',
+        'product_ids', 'categories', 'quantities', 'price_cents',
+    )
+
+    def __init__(self, **columns):
+        for name in self.COLUMNS:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.build_ids)
+
+    @property
+    def revenue_cents(self):
+        return self.quantities.astype(np.int64) * self.price_cents
+
+    def filter(self, category=None, user_id=None, since=None, until=None, archived=False):
+        """Return a frame restricted by category, user, date range (inclusive) and archive flag."""
+        mask = np.ones(len(self), dtype=bool)
+        if archived is not None:
+            mask &= self.archived == bool(archived)
+        if category:
+            mask &= self.categories == _category_code(category)
+        if user_id is not None:
+            mask &= self.user_ids == user_id
+        if since is not None:
+            mask &= self.timestamps >= _day_seconds(since)
+        if until is not None:
+            mask &= self.timestamps < _day_seconds(until + timedelta(days=1))
+        return SalesFrame(**{name: getattr(self, name)[mask] for name in self.COLUMNS})
+
+    def totals(self):
+        return {
+            'revenue': _cents(self.revenue_cents.sum()),
+            'builds': int(np.unique(self.build_ids).size),
+            'units': int(self.quantities.sum()),
+            'lines': len(self),
+        }
+
+    def revenue_by_category(self):
+        """{category: Decimal revenue} for every category, including zeros."""
+        sums = np.bincount(
+            self.categories, weights=self.revenue_cents, minlength=len(CATEGORIES) + 1,
+        )
+        return {category: _cents(np.rint(sums[index])) for index, category in enumerate(CATEGORIES)}
+
+    def revenue_by_user(self):
+        """{user_id: Decimal revenue}, highest first."""
+        users, inverse = np.unique(self.user_ids, return_inverse=True)
+        sums = np.rint(np.bincount(inverse, weights=self.revenue_cents, minlength=users.size))
+        order = np.argsort(-sums, kind='stable')
+        return {int(users[index]): _cents(sums[index]) for index in order}
+
+    def revenue_by_period(self, period='day'):
+        """[(period_start, revenue, builds, units)] for every period that had sales, oldest first."""
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period {period!r}; expected one of {', '.join(PERIODS)}.")
+        if not len(self):
+            return []
+
+        days = self.timestamps // 86400
+        if period == 'day':
+            buckets = days
+        elif period == 'week':
+            # Day 0 (1970-01-01) was a Thursday; shift so weeks start on Monday.
+            buckets = (days + 3) // 7
+        else:
+            buckets = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+        keys, inverse = np.unique(buckets, return_inverse=True)
+        revenue = np.rint(np.bincount(inverse, weights=self.revenue_cents, minlength=keys.size))
+        units = np.bincount(inverse, weights=self.quantities, minlength=keys.size)
+        pairs = np.unique(np.stack([inverse, self.build_ids]), axis=1)
+        builds = np.bincount(pairs[0], minlength=keys.size)
+
+        return [
+            (_bucket_start(int(key), period), _cents(revenue[index]), int(builds[index]), int(units[index]))
+            for index, key in enumerate(keys)
+        ]
+
+    def order_values_cents(self):
+        """Total value of each build, in cents."""
+        _, inverse = np.unique(self.build_ids, return_inverse=True)
+        return np.rint(np.bincount(inverse, weights=self.revenue_cents)).astype(np.int64)
+
+    def order_value_percentiles(self, percentiles=(50, 90, 95, 99)):
+        """{percentile: Decimal order value} over the builds in the frame."""
+        values = self.order_values_cents()
+        if not values.size:
+            return {pct: Decimal('0.00') for pct in percentiles}
+        results = np.percentile(values, percentiles)
+        return {pct: _cents(np.rint(value)) for pct, value in zip(percentiles, results)}
+
+
+def moving_average(values, window):
+    """
+    Trailing moving average of a numeric series.
+
+    The first window - 1 points average whatever history exists, so the
+    result always has the same length as the input.
+    """
+    _require_numpy()
+    if window < 1:
+        raise ValueError("window must be at least 1.")
+    values = np.asarray(values, dtype=np.float64)
+    if not values.size:
+        return values
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, values.size + 1), window)
+    return sums / counts
+
+
+def _category_code(category):
+    try:
+        return CATEGORIES.index(category)
+    except ValueError:
+        return len(CATEGORIES)
+
+
+def _day_seconds(day):
+    return (day - _EPOCH).days * 86400
+
+
+def _bucket_start(key, period):
+    if period == 'day':
+        return _EPOCH + timedelta(days=key)
+    if period == 'week':
+        return _EPOCH + timedelta(days=key * 7 - 3)
+    return date(1970 + key // 12, key % 12 + 1, 1)
+
+
+def load_sales_frame(chunk_size=LOAD_CHUNK_SIZE):
+    """Read every checked-out line into a SalesFrame in one streamed query."""
+    _require_numpy()
+    columns = {
+        'build_ids': array('q'), 'user_ids': array('q'), 'timestamps': array('q'), 'archived': array('b'),
+        'product_ids': array('q'), 'categories': array('b'), 'quantities': array('q'), 'price_cents': array('q'),
+    }
+    codes = {category: index for index, category in enumerate(CATEGORIES)}
+    unknown = len(CATEGORIES)
+
+    rows = (
+        PCBuildItem.objects.filter(build__status='checked_out')
+        .annotate(cents=Cast(Round(F('price_at_time') * Value(100)), BigIntegerField()))
+        .order_by('build_id')
+        .values_list(
+            'build_id', 'build__user_id', 'build__created_at', 'build__is_archived',
+            'product_id', 'product__category', 'quantity', 'cents',
+        )
+    )
+    last_build, last_seconds = None, 0
+    for build_id, user_id, created_at, archived, product_id, category, quantity, cents in rows.iterator(
+        chunk_size=chunk_size
+    ):
+        if build_id != last_build:
+            local = timezone.localtime(created_at) if timezone.is_aware(created_at) else created_at
+            last_build = build_id
+            last_seconds = _day_seconds(local.date()) + local.hour * 3600 + local.minute * 60 + local.second
+        columns['build_ids'].append(build_id)
+        columns['user_ids'].append(user_id)
+        columns['timestamps'].append(last_seconds)
+        columns['archived'].append(archived)
+        columns['product_ids'].append(product_id)
+        columns['categories'].append(codes.get(category, unknown))
+        columns['quantities'].append(quantity)
+        columns['price_cents'].append(cents)
+
+    return SalesFrame(
+        build_ids=np.array(columns['build_ids'], dtype=np.int64),
+        user_ids=np.array(columns['user_ids'], dtype=np.int64),
+        timestamps=np.array(columns['timestamps'], dtype=np.int64),
+        archived=np.array(columns['archived'], dtype=bool),
+        product_ids=np.array(columns['product_ids'], dtype=np.int64),
+        categories=np.array(columns['categories'], dtype=np.int8),
+        quantities=np.array(columns['quantities'], dtype=np.int32),
+        price_cents=np.array(columns['price_cents'], dtype=np.int64),
+    )
+
+
+def sales_frame():
+    """The cached SalesFrame for the current sales data version, loading it if stale."""
+    _require_numpy()
+    version = sales_data_version()
+    with _cache_lock:
+        if _cached['version'] != version:
+            _cached['frame'] = load_sales_frame()
+            _cached['version'] = version
+        return _cached['frame']
@@ -5,4 +5,5 @@ class BaseConfig(AppConfig):
     name = 'Base'
 
     def ready(self):
+        import Base.checks
         import Base.signals
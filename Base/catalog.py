@@ -0,0 +1,101 @@
+# Base/catalog.py
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import CATEGORY_CHOICES, Product, StockReservation
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def catalog_version():
+    """
+    Current version of the active catalog; cached catalog views key on it.
+
+    The counter lives in the default cache, which must be shared by every
+    process (see CACHES in settings and check Base.W001). With a
+    per-process cache, other processes only see a change once their
+    snapshot times out.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a cleared key never reuses an old version.
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def _bump_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        catalog_version()
+
+
+def catalog_changed():
+    """
+    Invalidate cached catalog data now and again once the transaction commits.
+
+    The second bump drops any snapshot another request rebuilt from
+    pre-commit rows in between.
+    """
+    _bump_catalog_version()
+    transaction.on_commit(_bump_catalog_version)
+
+
+def catalog_snapshot():
+    """
+    Active parts grouped by category: {category: [{'id', 'name', 'price', 'quantity'}, ...]}.
+
+    Built with one query and cached under the catalog version, so repeat
+    reads cost no catalog queries until a product is saved, archived,
+    restocked or sold.
+    """
+    cache_key = f"catalog:snapshot:{catalog_version()}"
+    snapshot = cache.get(cache_key)
+    if snapshot is not None:
+        return snapshot
+
+    snapshot = {category: [] for category, _ in CATEGORY_CHOICES}
+    rows = (
+        Product.objects.filter(is_archived=False)
+        .order_by('category', 'id')
+        .values_list('id', 'name', 'price', 'quantity', 'category')
+    )
+    for product_id, name, price, quantity, category in rows:
+        snapshot.setdefault(category, []).append({
+            'id': product_id,
+            'name': name,
+            'price': price,
+            'quantity': quantity,
+        })
+    cache.set(cache_key, snapshot, timeout=int(getattr(settings, 'CATALOG_SNAPSHOT_CACHE_SECONDS', 60)))
+    return snapshot
+
+
+def active_holds(exclude_build_id=None):
+    """{product_id: quantity} held by unexpired reservations, in one grouped query."""
+    holds = StockReservation.objects.filter(expires_at__gt=timezone.now())
+    if exclude_build_id is not None:
+        holds = holds.exclude(build_id=exclude_build_id)
+    return dict(
+        holds.order_by().values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total')
+    )
+
+
+def catalog_with_availability(exclude_build_id=None):
+    """
+    The cached snapshot with available_quantity (stock less other drafts' holds) on each part.
+
+    Holds change every few seconds while people build, so they are laid
+    over the snapshot per request rather than cached with it.
+    """
+    holds = active_holds(exclude_build_id)
+    return {
+        category: [{**part, 'available_quantity': part['quantity'] - holds.get(part['id'], 0)} for part in parts]
+        for category, parts in catalog_snapshot().items()
+    }
@@ -0,0 +1,26 @@
+# Base/checks.py
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """Catalog and sales versions live in the cache, so deployments need one all processes share."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend not in PER_PROCESS_CACHES:
+        return []
+    return [
+        Warning(
+            "The default cache is private to each process, so a product write or "
+            "checkout in one process does not invalidate the catalog, stock, facet "
+            "or sales caches of the others.",
+            hint="Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such as Redis "
+                 "when running more than one web process or job worker.",
+            id='Base.W001',
+        )
+    ]
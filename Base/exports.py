@@ -0,0 +1,150 @@
+# Base/exports.py
+import csv
+import json
+
+from django.db.models import Prefetch
+
+from .models import PCBuild, PCBuildItem, Product, StockMovement
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_CHUNK_SIZE = 2000
+CHECKOUT_ITEM_FIELDS = ('product_id', 'product_name', 'category', 'quantity', 'price_at_time')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def _iso(value):
+    return value.isoformat() if value else ''
+
+
+def checkout_history_records(builds=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield one dict per checked-out build with its line items.
+
+    iterator(chunk_size) keeps only one chunk of builds in memory, and the
+    items prefetch runs once per chunk, so an export costs one query for the
+    builds plus one per chunk no matter how many lines there are.
+    """
+    if builds is None:
+        builds = PCBuild.objects.filter(status='checked_out')
+    items = PCBuildItem.objects.select_related('product').only(
+        'build_id', 'quantity', 'price_at_time', 'product__id', 'product__name', 'product__category',
+    ).order_by('id')
+    builds = (
+        builds.select_related('user')
+        .only('id', 'user__username', 'status', 'is_archived', 'total_price', 'item_count', 'unit_count', 'created_at')
+        .prefetch_related(Prefetch('items', queryset=items))
+        .order_by('id')
+    )
+    for build in builds.iterator(chunk_size=chunk_size):
+        yield {
+            'build_id': build.id,
+            'username': build.user.username,
+            'status': build.status,
+            'is_archived': build.is_archived,
+            'total_price': str(build.total_price),
+            'item_count': build.item_count,
+            'unit_count': build.unit_count,
+            'created_at': _iso(build.created_at),
+            'items': [
+                {
+                    'product_id': item.product.id,
+                    'product_name': item.product.name,
+                    'category': item.product.category,
+                    'quantity': item.quantity,
+                    'price_at_time': str(item.price_at_time),
+                }
+                for item in build.items.all()
+            ],
+        }
+
+
+def product_records(products=None, chunk_size=EXPORT_CHUNK_SIZE):
+    if products is None:
+        products = Product.objects.all()
+    rows = products.order_by('id').values(
+        'id', 'name', 'description', 'category', 'price', 'quantity', 'is_archived', 'created_at', 'updated_at',
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        row['price'] = str(row['price'])
+        row['description'] = row['description'] or ''
+        row['created_at'] = _iso(row['created_at'])
+        row['updated_at'] = _iso(row['updated_at'])
+        yield row
+
+
+def stock_movement_records(movements=None, chunk_size=EXPORT_CHUNK_SIZE):
+    if movements is None:
+        movements = StockMovement.objects.all()
+    rows = movements.order_by('id').values(
+        'id', 'product_id', 'product__name', 'build_id', 'changed_by__username',
+        'quantity_change', 'reason', 'note', 'created_at',
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield {
+            'id': row['id'],
+            'product_id': row['product_id'],
+            'product_name': row['product__name'],
+            'build_id': row['build_id'],
+            'changed_by': row['changed_by__username'] or '',
+            'quantity_change': row['quantity_change'],
+            'reason': row['reason'],
+            'note': row['note'] or '',
+            'created_at': _iso(row['created_at']),
+        }
+
+
+def _checkout_history_csv_rows(records):
+    """Flatten builds to one CSV row per line item (builds without items keep one row)."""
+    for record in records:
+        items = record.pop('items') or [dict.fromkeys(CHECKOUT_ITEM_FIELDS, '')]
+        for item in items:
+            yield {**record, **item}
+
+
+EXPORTS = {
+    'checkout-history': (
+        checkout_history_records,
+        (
+            'build_id', 'username', 'status', 'is_archived', 'total_price', 'item_count', 'unit_count',
+            'created_at', *CHECKOUT_ITEM_FIELDS,
+        ),
+    ),
+    'products': (
+        product_records,
+        ('id', 'name', 'description', 'category', 'price', 'quantity', 'is_archived', 'created_at', 'updated_at'),
+    ),
+    'stock-movements': (
+        stock_movement_records,
+        (
+            'id', 'product_id', 'product_name', 'build_id', 'changed_by', 'quantity_change', 'reason',
+            'note', 'created_at',
+        ),
+    ),
+}
+
+
+def export_lines(dataset, fmt, queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the export as text lines, one record (or CSV row) at a time."""
+    records_for, fields = EXPORTS[dataset]
+    records = records_for(queryset, chunk_size=chunk_size)
+    if fmt == 'jsonl':
+        for record in records:
+            yield json.dumps(record) + '\n'
+        return
+
+    if dataset == 'checkout-history':
+        records = _checkout_history_csv_rows(records)
+    writer = csv.DictWriter(_Echo(), fieldnames=fields)
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
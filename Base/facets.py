@@ -0,0 +1,150 @@
+# Base/facets.py
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .catalog import catalog_version
+from .models import CATEGORY_CHOICES
+from .reorder import LOW_STOCK_FILTER
+
+STOCK_STATUS_FILTERS = {
+    'in_stock': Q(quantity__gt=0),
+    'low_stock': LOW_STOCK_FILTER,
+    'out_of_stock': Q(quantity__lte=0),
+}
+ARCHIVE_STATUS_FILTERS = {
+    'active': Q(is_archived=False),
+    'archived': Q(is_archived=True),
+}
+# Lower edges of the price histogram bins; the last bin is open-ended.
+DEFAULT_PRICE_BIN_EDGES = (0, 1000, 2500, 5000, 10000, 25000)
+FACETS = ('category', 'stock_status', 'archive_status', 'price')
+
+
+def _facets_cache_seconds():
+    return int(getattr(settings, 'FACET_COUNTS_CACHE_SECONDS', 60))
+
+
+def price_bins():
+    """[(lower, upper), ...] with upper None for the last bin, from FACET_PRICE_BIN_EDGES."""
+    edges = [Decimal(str(edge)) for edge in getattr(settings, 'FACET_PRICE_BIN_EDGES', DEFAULT_PRICE_BIN_EDGES)]
+    return list(zip(edges, edges[1:] + [None]))
+
+
+def _parse_price(value):
+    try:
+        return Decimal(value) if value else None
+    except (InvalidOperation, ValueError):
+        return None
+
+
+class ProductFilters:
+    """
+    The sidebar filters as one Q per facet.
+
+    Keeping the facets apart is what lets facet_counts() count each facet
+    against every other selected filter but its own, so picking "CPU" still
+    shows how many GPUs there are.
+    """
+
+    def __init__(self, category='', stock_status='', archive_status='', min_price='', max_price=''):
+        self.category = category if category in dict(CATEGORY_CHOICES) else ''
+        self.stock_status = stock_status if stock_status in STOCK_STATUS_FILTERS else ''
+        self.archive_status = archive_status if archive_status in ARCHIVE_STATUS_FILTERS else ''
+        self.min_price = _parse_price(min_price)
+        self.max_price = _parse_price(max_price)
+
+    def selections(self):
+        """{facet: Q} for the facets that are narrowing the list."""
+        selected = {}
+        if self.category:
+            selected['category'] = Q(category=self.category)
+        if self.stock_status:
+            selected['stock_status'] = STOCK_STATUS_FILTERS[self.stock_status]
+        if self.archive_status:
+            selected['archive_status'] = ARCHIVE_STATUS_FILTERS[self.archive_status]
+        price = Q()
+        if self.min_price is not None:
+            price &= Q(price__gte=self.min_price)
+        if self.max_price is not None:
+            price &= Q(price__lte=self.max_price)
+        if price:
+            selected['price'] = price
+        return selected
+
+    def apply(self, queryset):
+        return queryset.filter(*self.selections().values())
+
+    def signature(self):
+        return {
+            'category': self.category,
+            'stock_status': self.stock_status,
+            'archive_status': self.archive_status,
+            'min_price': str(self.min_price) if self.min_price is not None else '',
+            'max_price': str(self.max_price) if self.max_price is not None else '',
+        }
+
+
+def _buckets():
+    """(facet, bucket, Q) for every count the sidebar shows."""
+    buckets = [('category', key, Q(category=key)) for key, _ in CATEGORY_CHOICES]
+    buckets += [('stock_status', key, q) for key, q in STOCK_STATUS_FILTERS.items()]
+    buckets += [('archive_status', key, q) for key, q in ARCHIVE_STATUS_FILTERS.items()]
+    for index, (lower, upper) in enumerate(price_bins()):
+        q = Q(price__gte=lower)
+        if upper is not None:
+            q &= Q(price__lt=upper)
+        buckets.append(('price', index, q))
+    return buckets
+
+
+def facet_counts(queryset, filters, scope, search=''):
+    """
+    Bucket counts for every facet plus the filtered total, from one
+    aggregate query over queryset.
+
+    queryset is the list before the sidebar filters (scope rows plus any
+    search). Each bucket is a conditional COUNT of its own condition ANDed
+    with the selections of the other facets. Results are cached per scope,
+    normalized filters and search text under the catalog version, so any
+    product write invalidates them.
+    """
+    signature = json.dumps({'search': " ".join(search.split()).casefold(), **filters.signature()}, sort_keys=True)
+    digest = hashlib.sha1(signature.encode()).hexdigest()
+    cache_key = f"facets:{scope}:{catalog_version()}:{digest}"
+    facets = cache.get(cache_key)
+    if facets is not None:
+        return facets
+
+    selections = filters.selections()
+    buckets = _buckets()
+    aggregates = {}
+    for index, (facet, _, condition) in enumerate(buckets):
+        for other, selected in selections.items():
+            if other != facet:
+                condition &= selected
+        aggregates[f'b{index}'] = Count('id', filter=condition)
+    aggregates['total'] = Count('id', filter=Q(*selections.values())) if selections else Count('id')
+    row = queryset.order_by().aggregate(**aggregates)
+
+    facets = {facet: {} for facet in FACETS if facet != 'price'}
+    facets['price'] = []
+    facets['total'] = row['total']
+    bins = price_bins()
+    for index, (facet, bucket, _) in enumerate(buckets):
+        count = row[f'b{index}']
+        if facet == 'price':
+            lower, upper = bins[bucket]
+            facets['price'].append({
+                'min': lower,
+                'max': upper - Decimal('0.01') if upper is not None else None,
+                'count': count,
+            })
+        else:
+            facets[facet][bucket] = count
+    cache.set(cache_key, facets, timeout=_facets_cache_seconds())
+    return facets
@@ -3,7 +3,9 @@ from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from .models import Profile
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
+from django.template import loader
+from .jobs import enqueue
 
 class UserUpdateForm(forms.ModelForm):
     username = forms.CharField(
@@ -94,3 +96,22 @@ class EmailAuthenticationForm(forms.Form):
             cleaned_data['user'] = authenticated_user
         
         return cleaned_data
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Renders the reset email during the request but leaves the SMTP round trip to the job worker."""
+
+    def send_mail(self, subject_template_name, email_template_name, context, from_email, to_email,
+                  html_email_template_name=None):
+        subject = "".join(loader.render_to_string(subject_template_name, context).splitlines())
+        body = loader.render_to_string(email_template_name, context)
+        html_body = None
+        if html_email_template_name is not None:
+            html_body = loader.render_to_string(html_email_template_name, context)
+        enqueue('send_email', {
+            'subject': subject,
+            'body': body,
+            'to': [to_email],
+            'from_email': from_email,
+            'html_body': html_body,
+        }, queue='email')
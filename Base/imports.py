@@ -0,0 +1,280 @@
+# Base/imports.py
+import codecs
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .catalog import catalog_changed
+from .models import CATEGORY_CHOICES, Product, StockMovement
+from .pricing import record_price_changes
+from .stock import MAX_QUANTITY, record_stock_movements
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - depends on the environment
+    openpyxl = None
+
+IMPORT_CHUNK_SIZE = 1000
+REQUIRED_COLUMNS = ('name', 'category', 'price')
+
+_NAME_MAX_LENGTH = Product._meta.get_field('name').max_length
+_PRICE_FIELD = Product._meta.get_field('price')
+# Accept either the stored key ("psu") or the label ("Power Supply").
+_CATEGORY_LOOKUP = {
+    **{label.casefold(): key for key, label in CATEGORY_CHOICES},
+    **{key: key for key, _ in CATEGORY_CHOICES},
+}
+
+
+class ImportFileError(Exception):
+    """Raised when the upload itself cannot be read (bad format, missing columns)."""
+
+
+class ImportResult:
+    """Counts and per-row errors from one import run; row numbers match the file (header is row 1)."""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'skipped': self.skipped,
+            'errors': [{'row': row, 'error': message} for row, message in self.errors],
+        }
+
+
+def _normalize_header(value):
+    return "_".join(str(value or '').split()).casefold()
+
+
+def _check_header(header):
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ImportFileError(f"Missing required column(s): {', '.join(missing)}.")
+
+
+def iter_csv_rows(binary_file):
+    """Yield (row_number, {column: value}) from a CSV byte stream, one row at a time."""
+    reader = csv.reader(codecs.iterdecode(binary_file, 'utf-8-sig'))
+    try:
+        header = [_normalize_header(column) for column in next(reader)]
+    except StopIteration:
+        raise ImportFileError("The file is empty.")
+    except UnicodeDecodeError:
+        raise ImportFileError("CSV files must be UTF-8 encoded.")
+    _check_header(header)
+    try:
+        for row_number, values in enumerate(reader, start=2):
+            if any(value.strip() for value in values):
+                yield row_number, dict(zip(header, values))
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFileError(f"Could not read the CSV file: {e}")
+
+
+def iter_xlsx_rows(binary_file):
+    """Yield (row_number, {column: value}) from the first worksheet in read-only mode."""
+    if openpyxl is None:
+        raise ImportFileError("XLSX imports require openpyxl; upload a CSV file instead.")
+    try:
+        workbook = openpyxl.load_workbook(binary_file, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFileError(f"Could not read the XLSX file: {e}")
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        try:
+            header = [_normalize_header(column) for column in next(rows)]
+        except StopIteration:
+            raise ImportFileError("The file is empty.")
+        _check_header(header)
+        for row_number, values in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in values):
+                yield row_number, {
+                    column: '' if value is None else str(value) for column, value in zip(header, values)
+                }
+    finally:
+        workbook.close()
+
+
+def iter_rows(binary_file, filename):
+    if filename.lower().endswith('.xlsx'):
+        return iter_xlsx_rows(binary_file)
+    if filename.lower().endswith('.csv'):
+        return iter_csv_rows(binary_file)
+    raise ImportFileError("Upload a .csv or .xlsx file.")
+
+
+def _clean_row(values):
+    """Normalize and validate one row the way Product.clean() would; returns (fields, error)."""
+    name = " ".join((values.get('name') or '').split())
+    description = (values.get('description') or '').strip()
+    category = _CATEGORY_LOOKUP.get(" ".join((values.get('category') or '').split()).casefold())
+    if not name:
+        return None, "Product name is required."
+    if len(name) > _NAME_MAX_LENGTH:
+        return None, f"Product name is longer than {_NAME_MAX_LENGTH} characters."
+    if category is None:
+        return None, f"Unknown category '{values.get('category', '')}'."
+
+    try:
+        price = Decimal((values.get('price') or '').strip().lstrip('$').replace(',', ''))
+    except (InvalidOperation, ValueError):
+        return None, "Price must be a number."
+    if not price.is_finite():
+        return None, "Price must be a number."
+    # Check the magnitude before quantize(), which would fail on huge exponents.
+    if price.adjusted() >= _PRICE_FIELD.max_digits - _PRICE_FIELD.decimal_places:
+        return None, "Price is too large."
+    try:
+        price = _PRICE_FIELD.to_python(price.quantize(Decimal('0.01')))
+    except (InvalidOperation, ValidationError):
+        return None, "Price must be a number."
+    if price <= 0:
+        return None, "Price must be greater than 0."
+
+    raw_quantity = (values.get('quantity') or '').strip() or '0'
+    try:
+        quantity = Decimal(raw_quantity)
+    except (InvalidOperation, ValueError):
+        return None, "Quantity must be a whole number."
+    if not quantity.is_finite():
+        return None, "Quantity must be a whole number."
+    # Bound it before int(), which is slow on exponents like 1e99999999.
+    if quantity.copy_abs() > MAX_QUANTITY:
+        return None, "Quantity is too large."
+    try:
+        if quantity < 0 or quantity != quantity.to_integral_value():
+            return None, "Quantity must be a whole number of 0 or more."
+        quantity = int(quantity)
+    except (InvalidOperation, OverflowError):
+        return None, "Quantity must be a whole number."
+
+    return {
+        'name': name,
+        'description': description,
+        'category': category,
+        'price': price,
+        'quantity': quantity,
+    }, None
+
+
+def _import_chunk(chunk, result, seen_keys, update_existing, user):
+    """
+    Validate one chunk, then write it with one lookup, one bulk_create and one bulk_update.
+
+    bulk_create() and bulk_update() skip Product.save(), so stock movements
+    and price history are written here in bulk too.
+    """
+    valid = {}
+    for row_number, values in chunk:
+        fields, error = _clean_row(values)
+        if error:
+            result.add_error(row_number, error)
+            continue
+        key = Product.build_dedup_key(fields['name'], fields['description'], fields['category'])
+        if key in seen_keys:
+            result.add_error(row_number, f"Duplicate of row {seen_keys[key]} in this file.")
+            continue
+        seen_keys[key] = row_number
+        valid[key] = (row_number, fields)
+    if not valid:
+        return
+
+    existing = {
+        product.dedup_key: product
+        for product in Product.objects.filter(dedup_key__in=valid.keys()).only('id', 'dedup_key', 'price', 'quantity')
+    }
+    to_create, to_update, movements, price_changes = [], [], [], {}
+    now = timezone.now()
+    for key, (row_number, fields) in valid.items():
+        product = existing.get(key)
+        if product is None:
+            to_create.append(Product(dedup_key=key, **fields))
+            continue
+        if not update_existing:
+            result.skipped += 1
+            continue
+        quantity_change = fields['quantity'] - product.quantity
+        if fields['price'] != product.price:
+            price_changes[product.id] = fields['price']
+        product.price = fields['price']
+        product.quantity = fields['quantity']
+        # bulk_update() skips auto_now, so stamp it here.
+        product.updated_at = now
+        to_update.append(product)
+        movements.append(StockMovement(
+            product=product,
+            changed_by=user,
+            quantity_change=quantity_change,
+            reason='restock' if quantity_change > 0 else 'adjustment',
+            note='Product import',
+        ))
+
+    try:
+        with transaction.atomic():
+            created = Product.objects.bulk_create(to_create)
+            if to_update:
+                Product.objects.bulk_update(to_update, ['price', 'quantity', 'updated_at'])
+            movements.extend(
+                StockMovement(
+                    product=product,
+                    changed_by=user,
+                    quantity_change=product.quantity,
+                    reason='restock',
+                    note='Product import',
+                )
+                for product in created
+            )
+            record_stock_movements(movements)
+            price_changes.update((product.id, product.price) for product in created)
+            record_price_changes(price_changes, effective_from=now)
+            catalog_changed()
+    except IntegrityError:
+        # Another writer added one of these products meanwhile; report the
+        # whole chunk so it can be re-run, rather than half-applying it.
+        for row_number, _ in valid.values():
+            result.add_error(row_number, "Conflicted with a concurrent change; import this row again.")
+        return
+    result.created += len(created)
+    result.updated += len(to_update)
+
+
+def import_products(rows, chunk_size=IMPORT_CHUNK_SIZE, update_existing=False, user=None, dry_run=False):
+    """
+    Import (row_number, values) pairs from iter_rows() in chunks.
+
+    Rows matching an existing product's dedup_key are skipped, or have
+    their price and quantity updated when update_existing is set. Each
+    chunk is committed on its own so memory stays flat regardless of file
+    size; dry_run validates and rolls every chunk back.
+    """
+    result = ImportResult()
+    seen_keys = {}
+    chunk = []
+
+    def flush():
+        if dry_run:
+            with transaction.atomic():
+                _import_chunk(chunk, result, seen_keys, update_existing, user)
+                transaction.set_rollback(True)
+        else:
+            _import_chunk(chunk, result, seen_keys, update_existing, user)
+        chunk.clear()
+
+    for row_number, values in rows:
+        chunk.append((row_number, values))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return result
@@ -0,0 +1,221 @@
+# Base/jobs.py
+import logging
+import os
+import socket
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+from .reorder import refresh_reorder_points
+from .sales import rebuild_product_sales_counters, rebuild_sales_rollup
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def _setting(name, default):
+    return int(getattr(settings, name, default))
+
+
+def job_handler(name, scrub_payload=False):
+    """
+    Register a function as the handler for jobs called name.
+
+    It receives the payload as keyword arguments. scrub_payload empties the
+    stored payload once the job finishes, for payloads carrying secrets
+    such as password-reset links.
+    """
+    def register(func):
+        _handlers[name] = (func, scrub_payload)
+        return func
+    return register
+
+
+def enqueue(name, payload=None, queue='default', run_at=None, max_attempts=None):
+    """
+    Queue a job and return it.
+
+    The row is written in the caller's transaction, so a job queued inside
+    atomic() only becomes visible to workers once that commits. Handlers
+    may run more than once (after a crash or an expired visibility
+    timeout) and should be safe to repeat.
+    """
+    if name not in _handlers:
+        raise ValueError(f"No job handler registered for '{name}'.")
+    return Job.objects.create(
+        name=name,
+        queue=queue,
+        payload=payload or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or _setting('JOB_MAX_ATTEMPTS', 5),
+    )
+
+
+def scrubbed_job_names():
+    """Names of handlers registered with scrub_payload."""
+    return [name for name, (_, scrub_payload) in _handlers.items() if scrub_payload]
+
+
+def retry_delay(attempts):
+    """Exponential backoff after the given number of failed attempts, capped at JOB_RETRY_MAX_SECONDS."""
+    base = _setting('JOB_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), _setting('JOB_RETRY_MAX_SECONDS', 3600)))
+
+
+def _fail_exhausted(now):
+    """Fail jobs whose worker died or hung on their last attempt, instead of reclaiming them."""
+    exhausted = Job.objects.filter(status='running', locked_until__lt=now, attempts__gte=F('max_attempts'))
+    exhausted.filter(name__in=scrubbed_job_names()).update(payload={})
+    exhausted.update(
+        status='failed',
+        locked_until=None,
+        last_error="Visibility timeout expired on the last attempt.",
+        finished_at=now,
+    )
+
+
+def claim_jobs(worker_id, limit=1, queues=None, visibility_timeout=None):
+    """
+    Atomically take up to limit due jobs for worker_id.
+
+    Due means queued with run_at passed, or running with an expired lock
+    and attempts left. One conditional UPDATE stamps the rows with a fresh
+    claim token, so two workers can never claim the same job; a second
+    query reads them back.
+    """
+    now = timezone.now()
+    timeout = visibility_timeout or _setting('JOB_VISIBILITY_TIMEOUT_SECONDS', 300)
+    _fail_exhausted(now)
+    due = Q(status='queued', run_at__lte=now) | Q(
+        status='running', locked_until__lt=now, attempts__lt=F('max_attempts'),
+    )
+    candidates = Job.objects.filter(due)
+    if queues:
+        candidates = candidates.filter(queue__in=queues)
+    candidate_ids = list(candidates.order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+    if not candidate_ids:
+        return []
+
+    token = f"{worker_id}:{uuid.uuid4().hex[:12]}"
+    Job.objects.filter(due, id__in=candidate_ids).update(
+        status='running',
+        locked_by=token,
+        locked_until=now + timedelta(seconds=timeout),
+        attempts=F('attempts') + 1,
+    )
+    return list(Job.objects.filter(locked_by=token, status='running').order_by('run_at', 'id'))
+
+
+def run_job(job):
+    """
+    Run one claimed job and record the outcome.
+
+    Failures go back to the queue with backoff until max_attempts is used
+    up. Outcomes are only written while this worker still holds the claim,
+    so a job re-claimed after its lock expired is not overwritten.
+    """
+    handler, scrub_payload = _handlers.get(job.name, (None, False))
+    mine = Job.objects.filter(id=job.id, locked_by=job.locked_by, status='running')
+    finished = {'payload': {}} if scrub_payload else {}
+    try:
+        if handler is None:
+            raise LookupError(f"No job handler registered for '{job.name}'.")
+        handler(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s #%s failed (attempt %s/%s)", job.name, job.id, job.attempts, job.max_attempts)
+        if job.attempts >= job.max_attempts or handler is None:
+            mine.update(status='failed', locked_until=None, last_error=error, finished_at=timezone.now(), **finished)
+            return False
+        mine.update(
+            status='queued',
+            locked_by='',
+            locked_until=None,
+            last_error=error,
+            run_at=timezone.now() + retry_delay(job.attempts),
+        )
+        return False
+    mine.update(status='succeeded', locked_until=None, last_error='', finished_at=timezone.now(), **finished)
+    return True
+
+
+def _run_in_thread(job):
+    try:
+        return run_job(job)
+    finally:
+        # Worker threads each get their own connection; don't leak them.
+        connection.close()
+
+
+def run_worker(concurrency=1, queues=None, once=False, poll_interval=1.0, visibility_timeout=None, max_jobs=None):
+    """
+    Claim and run jobs until stopped; returns the number of jobs run.
+
+    concurrency > 1 runs jobs on that many threads, claiming only as many
+    as there are idle threads. once drains what is due and returns instead
+    of polling; max_jobs stops after that many jobs.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+
+    def budget(free):
+        return free if max_jobs is None else min(free, max_jobs - processed)
+
+    if concurrency <= 1:
+        while max_jobs is None or processed < max_jobs:
+            jobs = claim_jobs(worker_id, 1, queues, visibility_timeout)
+            if not jobs:
+                if once:
+                    break
+                close_old_connections()
+                time.sleep(poll_interval)
+                continue
+            run_job(jobs[0])
+            processed += 1
+        return processed
+
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='job-worker') as pool:
+        while True:
+            free = budget(concurrency - len(in_flight))
+            jobs = claim_jobs(worker_id, free, queues, visibility_timeout) if free > 0 else []
+            for job in jobs:
+                in_flight.add(pool.submit(_run_in_thread, job))
+            processed += len(jobs)
+            if not in_flight:
+                if once or (max_jobs is not None and processed >= max_jobs):
+                    break
+                close_old_connections()
+                time.sleep(poll_interval)
+                continue
+            _, in_flight = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+    return processed
+
+
+@job_handler('send_email', scrub_payload=True)
+def send_email(subject, body, to, from_email=None, html_body=None):
+    message = EmailMultiAlternatives(subject, body, from_email, to)
+    if html_body is not None:
+        message.attach_alternative(html_body, 'text/html')
+    message.send()
+
+
+@job_handler('refresh_reorder_points')
+def refresh_reorder_points_job():
+    refresh_reorder_points()
+
+
+@job_handler('rebuild_sales_rollup')
+def rebuild_sales_rollup_job():
+    rebuild_sales_rollup()
+    rebuild_product_sales_counters()
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from Base.models import PCBuild
+from Base.sales import refresh_build_counts
+
+
+class Command(BaseCommand):
+    help = "Populate PCBuild.item_count and unit_count from their line items."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        updated = 0
+        last_id = 0
+        while True:
+            batch = list(
+                PCBuild.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            updated += refresh_build_counts(batch)
+            last_id = batch[-1]
+        self.stdout.write(self.style.SUCCESS(f"Backfilled counts for {updated} build(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Base.stock import expire_reservations
+
+
+class Command(BaseCommand):
+    help = "Delete expired draft stock reservations in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        removed = expire_reservations(batch_size=max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f"Expired {removed} reservation(s)."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from Base.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORTS, export_lines
+
+
+class Command(BaseCommand):
+    help = "Stream checkout history, the product catalog or stock movements to CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', '-o', help="File to write; defaults to stdout.")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        lines = export_lines(options['dataset'], options['format'], chunk_size=max(options['chunk_size'], 1))
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        written = 0
+        with open(options['output'], 'w', encoding='utf-8', newline='') as handle:
+            for line in lines:
+                handle.write(line)
+                written += 1
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} line(s) to {options['output']}."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Base.imports import IMPORT_CHUNK_SIZE, ImportFileError, import_products, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Import products from a CSV or XLSX file in batches and print a per-row error report."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument(
+            '--update-existing',
+            action='store_true',
+            help="Update price and quantity of products that already exist instead of skipping them.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Validate and report without saving anything.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as handle:
+                result = import_products(
+                    iter_rows(handle, options['path']),
+                    chunk_size=max(options['chunk_size'], 1),
+                    update_existing=options['update_existing'],
+                    dry_run=options['dry_run'],
+                )
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+
+        for row_number, error in result.errors:
+            self.stdout.write(f"Row {row_number}: {error}")
+        prefix = "Dry run: " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{result.created} added, {result.updated} updated, "
+            f"{result.skipped} already existed, {len(result.errors)} row(s) rejected."
+        ))
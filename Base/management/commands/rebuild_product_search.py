@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Base.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SQLite FTS5 product search index from the product table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--optimize', action='store_true', help="Merge index segments after rebuilding.")
+
+    def handle(self, *args, **options):
+        if not rebuild_search_index(optimize=options['optimize']):
+            raise CommandError("Product search index is not available on this database.")
+        self.stdout.write(self.style.SUCCESS("Rebuilt the product search index."))
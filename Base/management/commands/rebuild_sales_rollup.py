@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Base.sales import rebuild_product_sales_counters, rebuild_sales_rollup
+
+
+class Command(BaseCommand):
+    help = "Recompute the SalesDailyRollup table and product sales counters from checked-out builds."
+
+    def handle(self, *args, **options):
+        rows = rebuild_sales_rollup()
+        counters = rebuild_product_sales_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows} daily rollup row(s) and {counters} product sales counter(s)."
+        ))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Base.models import Product, StockMovement
+from Base.stock import ledger_balances, record_stock_movements
+
+
+class Command(BaseCommand):
+    help = "Compare Product.quantity against the StockMovement ledger, one chunk of products at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help="Write an adjustment movement for every product whose ledger does not match its quantity.",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(options['chunk_size'], 1)
+        fix = options['fix']
+        checked = 0
+        mismatched = 0
+
+        products = Product.objects.order_by('id').values_list('id', 'name', 'quantity')
+        chunk = []
+        for row in products.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                mismatched += self._reconcile_chunk(chunk, fix)
+                checked += len(chunk)
+                chunk = []
+        if chunk:
+            mismatched += self._reconcile_chunk(chunk, fix)
+            checked += len(chunk)
+
+        summary = f"Checked {checked} product(s); {mismatched} mismatch(es)."
+        if fix and mismatched:
+            summary += " Adjustment movements recorded."
+        self.stdout.write(self.style.SUCCESS(summary) if not mismatched else self.style.WARNING(summary))
+
+    def _reconcile_chunk(self, chunk, fix):
+        balances = ledger_balances([product_id for product_id, _, _ in chunk])
+        adjustments = []
+        for product_id, name, quantity in chunk:
+            balance = balances.get(product_id, 0)
+            if balance == quantity:
+                continue
+            self.stdout.write(f"#{product_id} {name}: quantity={quantity} ledger={balance} drift={quantity - balance}")
+            adjustments.append(
+                StockMovement(
+                    product_id=product_id,
+                    quantity_change=quantity - balance,
+                    reason='adjustment',
+                    note='Reconciliation',
+                )
+            )
+
+        if fix and adjustments:
+            with transaction.atomic():
+                record_stock_movements(adjustments)
+        return len(adjustments)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from Base.reorder import REORDER_CHUNK_SIZE, refresh_reorder_points
+
+
+class Command(BaseCommand):
+    help = "Recompute sales velocity, days of cover and reorder suggestions for every active product."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=REORDER_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        written, needing = refresh_reorder_points(chunk_size=max(options['chunk_size'], 1))
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {written} reorder point(s); {needing} product(s) need reordering."
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from Base.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (emails, maintenance) with retries and visibility timeouts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help="Number of jobs to run at once.")
+        parser.add_argument('--queue', action='append', dest='queues', help="Only run jobs from this queue (repeatable).")
+        parser.add_argument('--once', action='store_true', help="Run every due job, then exit instead of polling.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument(
+            '--visibility-timeout',
+            type=int,
+            default=None,
+            help="Seconds a claimed job stays hidden from other workers (default JOB_VISIBILITY_TIMEOUT_SECONDS).",
+        )
+        parser.add_argument('--max-jobs', type=int, default=None, help="Exit after running this many jobs.")
+
+    def handle(self, *args, **options):
+        try:
+            processed = run_worker(
+                concurrency=max(options['concurrency'], 1),
+                queues=options['queues'],
+                once=options['once'],
+                poll_interval=max(options['poll_interval'], 0.1),
+                visibility_timeout=options['visibility_timeout'],
+                max_jobs=options['max_jobs'],
+            )
+        except KeyboardInterrupt:
+            self.stdout.write("Worker stopped.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Ran {processed} job(s)."))
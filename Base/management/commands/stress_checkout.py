@@ -0,0 +1,226 @@
+import json
+import logging
+import multiprocessing
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.base import UpdateError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.db.models import Min, Sum
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from Base.models import PCBuild, Product, StockMovement
+from Base.sales import reverse_build_sales, sales_data_changed
+
+STRESS_PREFIX = 'stress-checkout'
+# Session writes can hit 'database table is locked' while other workers check out;
+# the db session backend re-raises that as UpdateError.
+LOGIN_ATTEMPTS = 10
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_checkout_worker(username, product_ids, requests, max_quantity, seed):
+    """Fire sequential checkouts for one user; returns latencies and outcome counts."""
+    rng = random.Random(seed)
+    # Rejected checkouts (409) are expected here; keep them out of the log.
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    result = {'latencies': [], 'ok': 0, 'rejected': 0, 'locked': 0, 'errors': 0}
+    try:
+        with override_settings(ALLOWED_HOSTS=['*']):
+            client = Client()
+            user = User.objects.get(username=username)
+            for attempt in range(LOGIN_ATTEMPTS):
+                try:
+                    client.force_login(user)
+                    break
+                except (OperationalError, UpdateError):
+                    if attempt == LOGIN_ATTEMPTS - 1:
+                        raise
+                    time.sleep(0.05 * (attempt + 1))
+            url = reverse('checkout-pc-build-api')
+            for _ in range(requests):
+                picked = rng.sample(product_ids, rng.randint(1, len(product_ids)))
+                body = json.dumps({
+                    'build_items': [
+                        {'product_id': product_id, 'quantity': rng.randint(1, max_quantity)}
+                        for product_id in picked
+                    ],
+                })
+                started = time.perf_counter()
+                try:
+                    response = client.post(
+                        url,
+                        body,
+                        content_type='application/json',
+                        HTTP_IDEMPOTENCY_KEY=uuid.uuid4().hex,
+                    )
+                except OperationalError as e:
+                    result['locked' if 'locked' in str(e) else 'errors'] += 1
+                    continue
+                except Exception:
+                    result['errors'] += 1
+                    continue
+                finally:
+                    result['latencies'].append(time.perf_counter() - started)
+
+                if response.status_code == 200:
+                    result['ok'] += 1
+                elif response.status_code == 409:
+                    result['rejected'] += 1
+                else:
+                    result['errors'] += 1
+    finally:
+        connections.close_all()
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed products and fire concurrent checkouts at the checkout endpoint, then report "
+        "throughput, latency percentiles, lock errors and whether any stock was oversold."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=25, help="Checkouts per worker.")
+        parser.add_argument('--mode', choices=('thread', 'process'), default='thread')
+        parser.add_argument('--products', type=int, default=5)
+        parser.add_argument('--stock', type=int, default=50, help="Starting quantity of each seeded product.")
+        parser.add_argument('--max-quantity', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded users, products and builds.")
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        run_id = uuid.uuid4().hex[:8]
+        usernames, product_ids = self._seed(run_id, workers, options)
+
+        samples = []
+        stop = threading.Event()
+        monitor = threading.Thread(target=self._watch_stock, args=(product_ids, samples, stop), daemon=True)
+        monitor.start()
+
+        jobs = [
+            (username, product_ids, options['requests'], max(options['max_quantity'], 1), options['seed'] + index)
+            for index, username in enumerate(usernames)
+        ]
+        started = time.perf_counter()
+        if options['mode'] == 'process':
+            connections.close_all()
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+            with context.Pool(workers) as pool:
+                results = pool.starmap(run_checkout_worker, jobs)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(lambda job: run_checkout_worker(*job), jobs))
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        monitor.join()
+
+        try:
+            self._report(results, elapsed, options)
+            self._verify(product_ids, options['stock'], samples)
+        finally:
+            if not options['keep']:
+                self._cleanup(run_id, product_ids)
+
+    def _seed(self, run_id, workers, options):
+        usernames = [f"{STRESS_PREFIX}-{run_id}-{index}" for index in range(workers)]
+        users = [User(username=username) for username in usernames]
+        for user in users:
+            user.set_unusable_password()
+            user.save()
+
+        products = Product.objects.bulk_create([
+            Product(
+                name=f"{STRESS_PREFIX} {run_id} part {index}",
+                description='',
+                price='100.00',
+                quantity=options['stock'],
+                category='cpu',
+            )
+            for index in range(max(options['products'], 1))
+        ])
+        StockMovement.objects.bulk_create([
+            StockMovement(product=product, quantity_change=product.quantity, reason='restock', note='Stress seed')
+            for product in products
+        ])
+        return usernames, [product.id for product in products]
+
+    def _watch_stock(self, product_ids, samples, stop):
+        try:
+            while not stop.wait(0.05):
+                try:
+                    lowest = Product.objects.filter(id__in=product_ids).aggregate(lowest=Min('quantity'))['lowest']
+                except OperationalError:
+                    continue
+                samples.append(lowest)
+        finally:
+            connections.close_all()
+
+    def _report(self, results, elapsed, options):
+        latencies = sorted(latency for result in results for latency in result['latencies'])
+        totals = {key: sum(result[key] for result in results) for key in ('ok', 'rejected', 'locked', 'errors')}
+        attempted = len(latencies)
+
+        self.stdout.write(f"Mode: {options['mode']} x{len(results)} worker(s), {attempted} request(s) in {elapsed:.2f}s")
+        self.stdout.write(f"Throughput: {attempted / elapsed if elapsed else 0:.1f} req/s")
+        self.stdout.write(
+            "Latency ms: p50={:.1f} p95={:.1f} p99={:.1f}".format(
+                _percentile(latencies, 50) * 1000,
+                _percentile(latencies, 95) * 1000,
+                _percentile(latencies, 99) * 1000,
+            )
+        )
+        self.stdout.write(
+            f"Checked out: {totals['ok']}  Rejected (no stock): {totals['rejected']}  "
+            f"Database is locked: {totals['locked']}  Other errors: {totals['errors']}"
+        )
+
+    def _verify(self, product_ids, starting_stock, samples):
+        problems = []
+        if any(sample is not None and sample < 0 for sample in samples):
+            problems.append("quantity went negative during the run")
+
+        sold = dict(
+            StockMovement.objects.filter(product_id__in=product_ids, reason='checkout')
+            .order_by()
+            .values('product_id')
+            .annotate(total=Sum('quantity_change'))
+            .values_list('product_id', 'total')
+        )
+        for product_id, quantity in Product.objects.filter(id__in=product_ids).values_list('id', 'quantity'):
+            if quantity < 0:
+                problems.append(f"product #{product_id} ended at {quantity}")
+            if starting_stock + sold.get(product_id, 0) != quantity:
+                problems.append(f"product #{product_id} stock does not match its checkout movements")
+
+        if problems:
+            raise CommandError("Oversell check failed: " + "; ".join(problems))
+        self.stdout.write(self.style.SUCCESS(
+            f"Oversell check passed ({len(samples)} stock samples, no negative quantities)."
+        ))
+
+    def _cleanup(self, run_id, product_ids):
+        users = User.objects.filter(username__startswith=f"{STRESS_PREFIX}-{run_id}-")
+        builds = PCBuild.objects.filter(user__in=users)
+        reverse_build_sales(builds.values_list('id', flat=True))
+        builds.delete()
+        sales_data_changed()
+        StockMovement.objects.filter(product_id__in=product_ids).delete()
+        Product.objects.filter(id__in=product_ids).delete()
+        users.delete()
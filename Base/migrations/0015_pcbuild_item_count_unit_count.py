@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:49
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    PCBuild = apps.get_model('Base', 'PCBuild')
+    PCBuildItem = apps.get_model('Base', 'PCBuildItem')
+    lines = PCBuildItem.objects.filter(build_id=OuterRef('pk')).order_by().values('build_id')
+    PCBuild.objects.update(
+        item_count=Coalesce(
+            Subquery(lines.annotate(total=Count('id')).values('total'), output_field=IntegerField()),
+            Value(0),
+        ),
+        unit_count=Coalesce(
+            Subquery(lines.annotate(total=Sum('quantity')).values('total'), output_field=IntegerField()),
+            Value(0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base', '0014_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pcbuild',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pcbuild',
+            name='unit_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:52
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_rollup(apps, schema_editor):
+    PCBuild = apps.get_model('Base', 'PCBuild')
+    PCBuildItem = apps.get_model('Base', 'PCBuildItem')
+    SalesDailyRollup = apps.get_model('Base', 'SalesDailyRollup')
+    builds = PCBuild.objects.filter(status='checked_out')
+
+    rows = []
+    per_category = (
+        PCBuildItem.objects.filter(build__in=builds)
+        .annotate(day=TruncDate('build__created_at'))
+        .values('day', 'product__category')
+        .annotate(
+            revenue=Sum(F('quantity') * F('price_at_time'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            builds=Count('build_id', distinct=True),
+            units=Sum('quantity'),
+        )
+        .order_by()
+    )
+    for row in per_category:
+        rows.append(SalesDailyRollup(
+            date=row['day'],
+            category=row['product__category'],
+            revenue=row['revenue'] or 0,
+            builds=row['builds'],
+            units=row['units'] or 0,
+        ))
+
+    per_day = (
+        builds.annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(revenue=Sum('total_price'), builds=Count('id'), units=Sum('unit_count'))
+        .order_by()
+    )
+    for row in per_day:
+        rows.append(SalesDailyRollup(
+            date=row['day'],
+            category='',
+            revenue=row['revenue'] or 0,
+            builds=row['builds'],
+            units=row['units'] or 0,
+        ))
+    SalesDailyRollup.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base', '0015_pcbuild_item_count_unit_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('category', models.CharField(blank=True, choices=[('ram', 'RAM'), ('motherboard', 'Motherboard'), ('cpu', 'CPU'), ('gpu', 'GPU'), ('storage', 'Storage'), ('psu', 'Power Supply'), ('case', 'Case')], default='', max_length=50)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('builds', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date', 'category'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'category'), name='unique_sales_rollup_day_category')],
+            },
+        ),
+        migrations.RunPython(populate_rollup, migrations.RunPython.noop),
+    ]
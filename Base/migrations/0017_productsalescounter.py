@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Max, Sum
+
+
+def populate_counters(apps, schema_editor):
+    PCBuildItem = apps.get_model('Base', 'PCBuildItem')
+    ProductSalesCounter = apps.get_model('Base', 'ProductSalesCounter')
+    rows = (
+        PCBuildItem.objects.filter(build__status='checked_out')
+        .values('product_id', 'product__category')
+        .annotate(
+            orders=Count('id'),
+            units=Sum('quantity'),
+            revenue=Sum(F('quantity') * F('price_at_time'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            last_sold_at=Max('build__created_at'),
+        )
+        .order_by()
+    )
+    ProductSalesCounter.objects.bulk_create([
+        ProductSalesCounter(
+            product_id=row['product_id'],
+            category=row['product__category'],
+            times_ordered=row['orders'],
+            units_sold=row['units'] or 0,
+            revenue=row['revenue'] or 0,
+            last_sold_at=row['last_sold_at'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base', '0016_salesdailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesCounter',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales_counter', serialize=False, to='Base.product')),
+                ('category', models.CharField(choices=[('ram', 'RAM'), ('motherboard', 'Motherboard'), ('cpu', 'CPU'), ('gpu', 'GPU'), ('storage', 'Storage'), ('psu', 'Power Supply'), ('case', 'Case')], max_length=50)),
+                ('times_ordered', models.PositiveIntegerField(default=0)),
+                ('units_sold', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('last_sold_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-units_sold'], name='sales_counter_units'), models.Index(fields=['-times_ordered'], name='sales_counter_orders'), models.Index(fields=['-revenue'], name='sales_counter_revenue'), models.Index(fields=['category', '-units_sold'], name='sales_counter_cat_units'), models.Index(fields=['category', '-times_ordered'], name='sales_counter_cat_orders'), models.Index(fields=['category', '-revenue'], name='sales_counter_cat_revenue')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
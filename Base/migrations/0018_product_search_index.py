@@ -0,0 +1,64 @@
+from django.db import migrations
+
+# External-content FTS5 index over Base_product. Triggers keep it in step
+# with every INSERT/UPDATE/DELETE, including queryset.update() and bulk
+# writes that bypass model signals. Other databases skip this and search
+# falls back to icontains.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS "Base_product_fts" USING fts5(
+        name, description, category,
+        content='Base_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS "Base_product_fts_ai" AFTER INSERT ON "Base_product" BEGIN
+        INSERT INTO "Base_product_fts"(rowid, name, description, category)
+        VALUES (new.id, new.name, COALESCE(new.description, ''), new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS "Base_product_fts_ad" AFTER DELETE ON "Base_product" BEGIN
+        INSERT INTO "Base_product_fts"("Base_product_fts", rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, COALESCE(old.description, ''), old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS "Base_product_fts_au"
+    AFTER UPDATE OF name, description, category ON "Base_product" BEGIN
+        INSERT INTO "Base_product_fts"("Base_product_fts", rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, COALESCE(old.description, ''), old.category);
+        INSERT INTO "Base_product_fts"(rowid, name, description, category)
+        VALUES (new.id, new.name, COALESCE(new.description, ''), new.category);
+    END
+    """,
+    """INSERT INTO "Base_product_fts"("Base_product_fts") VALUES ('rebuild')""",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS "Base_product_fts_au"',
+    'DROP TRIGGER IF EXISTS "Base_product_fts_ad"',
+    'DROP TRIGGER IF EXISTS "Base_product_fts_ai"',
+    'DROP TABLE IF EXISTS "Base_product_fts"',
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base', '0017_productsalescounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
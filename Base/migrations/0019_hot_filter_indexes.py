@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base', '0018_product_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['action', 'status', 'created_at'], name='audit_action_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='pcbuild',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='build_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='pcbuild',
+            index=models.Index(fields=['status', 'user', 'created_at', 'id'], name='build_status_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at', 'id'], name='product_created'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['category', 'created_at', 'id'], name='product_active_cat_created'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['name', 'id'], name='product_active_name'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['price', 'id'], name='product_active_price'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['quantity', 'id'], name='product_active_quantity'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['build', 'created_at'], name='movement_build_created'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:23
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def _dedup_key(name, description, category):
+    parts = (" ".join((value or '').split()).casefold() for value in (name, description, category))
+    return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+
+def backfill_dedup_keys(apps, schema_editor):
+    # The oldest product of each duplicate group keeps the key; later
+    # duplicates stay NULL so the unique index can be created.
+    Product = apps.get_model('Base', 'Product')
+    seen = set()
+    batch = []
+    rows = Product.objects.order_by('id').only('id', 'name', 'description', 'category')
+    for product in rows.iterator(chunk_size=2000):
+        key = _dedup_key(product.name, product.description, product.category)
+        if key in seen:
+            continue
+        seen.add(key)
+        product.dedup_key = key
+        batch.append(product)
+        if len(batch) >= 2000:
+            Product.objects.bulk_update(batch, ['dedup_key'])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ['dedup_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base', '0019_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='dedup_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_dedup_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(condition=models.Q(('dedup_key__isnull', False)), fields=('dedup_key',), name='product_dedup_key_unique'),
+        ),
+    ]
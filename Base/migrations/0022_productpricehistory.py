@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_price_history(apps, schema_editor):
+    # Rebuild what history we can from the prices sales were made at: each
+    # product opens at its first sold price (or its current one) from
+    # created_at, steps at every sale with a different price, and ends at
+    # its current price from updated_at.
+    Product = apps.get_model('Base', 'Product')
+    PCBuildItem = apps.get_model('Base', 'PCBuildItem')
+    ProductPriceHistory = apps.get_model('Base', 'ProductPriceHistory')
+    products = Product.objects.order_by('id').values_list('id', 'price', 'created_at', 'updated_at')
+    chunk = []
+
+    def flush():
+        sales = {}
+        for product_id, sold_at, price in (
+            PCBuildItem.objects.filter(product_id__in=[row[0] for row in chunk], build__status='checked_out')
+            .order_by('product_id', 'build__created_at', 'id')
+            .values_list('product_id', 'build__created_at', 'price_at_time')
+        ):
+            sales.setdefault(product_id, []).append((sold_at, price))
+        rows = []
+        for product_id, price, created_at, updated_at in chunk:
+            points = []
+            for sold_at, sold_price in sales.get(product_id, []):
+                if not points or points[-1][1] != sold_price:
+                    points.append((sold_at, sold_price))
+            if not points:
+                points = [(created_at, price)]
+            points[0] = (min(created_at, points[0][0]), points[0][1])
+            if points[-1][1] != price:
+                points.append((max(updated_at, points[-1][0]), price))
+            rows.extend(
+                ProductPriceHistory(product_id=product_id, effective_from=effective_from, price=point_price)
+                for effective_from, point_price in points
+            )
+        ProductPriceHistory.objects.bulk_create(rows, batch_size=2000)
+        chunk.clear()
+
+    for row in products.iterator(chunk_size=2000):
+        chunk.append(row)
+        if len(chunk) >= 2000:
+            flush()
+    if chunk:
+        flush()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base', '0021_product_facets_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('effective_from', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='Base.product')),
+            ],
+            options={
+                'ordering': ['product', 'effective_from', 'id'],
+                'indexes': [models.Index(fields=['product', 'effective_from', 'id', 'price'], name='price_history_product_from')],
+            },
+        ),
+        migrations.RunPython(backfill_price_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base', '0022_productpricehistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductReorderPoint',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reorder', serialize=False, to='Base.product')),
+                ('units_7d', models.PositiveIntegerField(default=0)),
+                ('units_30d', models.PositiveIntegerField(default=0)),
+                ('units_90d', models.PositiveIntegerField(default=0)),
+                ('daily_velocity', models.DecimalField(decimal_places=3, default=0, max_digits=10)),
+                ('days_of_cover', models.DecimalField(blank=True, decimal_places=1, max_digits=10, null=True)),
+                ('reorder_point', models.PositiveIntegerField(default=0)),
+                ('suggested_quantity', models.PositiveIntegerField(default=0)),
+                ('needs_reorder', models.BooleanField(default=False)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('needs_reorder', True)), fields=['days_of_cover', 'product'], name='reorder_needed_cover')],
+            },
+        ),
+    ]
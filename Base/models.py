@@ -1,9 +1,11 @@
 # Base/models.py
+import hashlib
 from decimal import Decimal
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 
 CATEGORY_CHOICES = [
     ('ram', 'RAM'),
@@ -31,6 +33,46 @@ class Product(models.Model):
     is_archived = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Hash of the normalized name/description/category; NULL only on legacy
+    # duplicates left over from before the key existed.
+    dedup_key = models.CharField(max_length=64, blank=True, null=True, editable=False)
+
+    DEDUP_FIELDS = ('name', 'description', 'category')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(dedup_key__isnull=False),
+                name='product_dedup_key_unique',
+            ),
+        ]
+        # Match the product/category list filters and keyset sorts (each sort
+        # key with an id tiebreaker). Django renders boolean filters as bare
+        # column predicates, which SQLite only matches against partial index
+        # conditions, so is_archived lives in the index WHERE clause.
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='product_created'),
+            models.Index(
+                fields=['category', 'created_at', 'id'],
+                name='product_active_cat_created',
+                condition=models.Q(is_archived=False),
+            ),
+            models.Index(fields=['name', 'id'], name='product_active_name', condition=models.Q(is_archived=False)),
+            models.Index(fields=['price', 'id'], name='product_active_price', condition=models.Q(is_archived=False)),
+            models.Index(
+                fields=['quantity', 'id'], name='product_active_quantity', condition=models.Q(is_archived=False),
+            ),
+            # The same sorts on the admin's archived tab.
+            models.Index(fields=['name', 'id'], name='product_archived_name', condition=models.Q(is_archived=True)),
+            models.Index(fields=['price', 'id'], name='product_archived_price', condition=models.Q(is_archived=True)),
+            models.Index(
+                fields=['quantity', 'id'], name='product_archived_quantity', condition=models.Q(is_archived=True),
+            ),
+            # Covers every column facet_counts() reads, so its one aggregate
+            # walks this narrow index instead of the table.
+            models.Index(fields=['is_archived', 'category', 'quantity', 'price'], name='product_facets'),
+        ]
 
     def clean(self):
         normalized_name = " ".join((self.name or '').split())
@@ -50,21 +92,67 @@ class Product(models.Model):
         if self.quantity < 0:
             raise ValidationError({'quantity': 'Quantity cannot be negative.'})
 
-        duplicate_qs = Product.objects.filter(category=self.category)
+        duplicate_qs = Product.objects.filter(
+            dedup_key=self.build_dedup_key(normalized_name, normalized_description, self.category)
+        )
         if self.pk:
             duplicate_qs = duplicate_qs.exclude(pk=self.pk)
-        normalized_name_key = normalized_name.casefold()
-        normalized_description_key = normalized_description.casefold()
-        for existing in duplicate_qs.only('name', 'description'):
-            existing_name = " ".join((existing.name or '').split()).casefold()
-            existing_description = " ".join((existing.description or '').split()).casefold()
-            if existing_name == normalized_name_key and existing_description == normalized_description_key:
-                raise ValidationError(
-                    {
-                        'name': 'A product with this name, description, and category already exists.',
-                        'description': 'A product with this name, description, and category already exists.',
-                    }
-                )
+        if duplicate_qs.exists():
+            raise ValidationError(
+                {
+                    'name': 'A product with this name, description, and category already exists.',
+                    'description': 'A product with this name, description, and category already exists.',
+                }
+            )
+
+    @staticmethod
+    def build_dedup_key(name, description, category):
+        """SHA-256 of the casefolded, whitespace-collapsed name, description and category."""
+        parts = (" ".join((value or '').split()).casefold() for value in (name, description, category))
+        return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so save() can tell whether the price changed.
+        instance._loaded_price = instance.__dict__.get('price')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if (fields is None or 'price' in fields) and 'price' not in self.get_deferred_fields():
+            self._loaded_price = self.price
+
+    def _price_changed(self, update_fields):
+        if update_fields is not None and 'price' not in update_fields:
+            return False
+        if self._state.adding:
+            return True
+        if 'price' in self.get_deferred_fields():
+            return False
+        return self._meta.get_field('price').to_python(self.price) != getattr(self, '_loaded_price', None)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        price_changed = self._price_changed(update_fields)
+        if update_fields is None or set(update_fields) & set(self.DEDUP_FIELDS):
+            key = self.build_dedup_key(self.name, self.description, self.category)
+            # A legacy duplicate keeps its NULL key until it is made distinct.
+            legacy_duplicate = (
+                self.pk is not None and self.dedup_key is None and
+                Product.objects.filter(dedup_key=key).exclude(pk=self.pk).exists()
+            )
+            if not legacy_duplicate:
+                self.dedup_key = key
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'dedup_key'}
+        if not price_changed:
+            super().save(*args, **kwargs)
+            return
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            ProductPriceHistory.objects.create(product=self, price=self.price)
+        self._loaded_price = self._meta.get_field('price').to_python(self.price)
 
     def __str__(self):
         return self.name
@@ -93,8 +181,17 @@ class PCBuild(models.Model):
     total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     is_archived = models.BooleanField(default=False)
+    # Denormalized from items so history pages need no joins or COUNT queries.
+    item_count = models.PositiveIntegerField(default=0)
+    unit_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at', 'id'], name='build_status_created'),
+            models.Index(fields=['status', 'user', 'created_at', 'id'], name='build_status_user_created'),
+        ]
+
     def __str__(self):
         return f"Build #{self.id} - {self.user.username}"
 
@@ -118,6 +215,48 @@ class PCBuildItem(models.Model):
         return f"{self.product.name} x{self.quantity}"
 
 
+class StockReservation(models.Model):
+    build = models.ForeignKey(PCBuild, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['build', 'product'], name='unique_build_product_reservation'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'expires_at'], name='reservation_product_expiry'),
+            models.Index(fields=['expires_at'], name='reservation_expiry'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} x{self.quantity} held for Build #{self.build_id}"
+
+
+class CheckoutIdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='checkout_keys')
+    key = models.CharField(max_length=64)
+    build = models.ForeignKey(
+        PCBuild,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True,
+        null=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_checkout_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} -> Build #{self.build_id}"
+
+
 class StockMovement(models.Model):
     REASON_CHOICES = (
         ('checkout', 'Checkout'),
@@ -141,6 +280,9 @@ class StockMovement(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['build', 'created_at'], name='movement_build_created'),
+        ]
 
     def __str__(self):
         sign = '+' if self.quantity_change >= 0 else ''
@@ -170,7 +312,138 @@ class AuditLog(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['action', 'status', 'created_at'], name='audit_action_status_created'),
+        ]
 
     def __str__(self):
         who = self.user.username if self.user else (self.identifier or 'anonymous')
         return f"{self.action} ({self.status}) - {who}"
+
+
+class SalesDailyRollup(models.Model):
+    # category is blank on the per-day total row, which counts each build once.
+    date = models.DateField()
+    category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, blank=True, default='')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    builds = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['date', 'category']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category'], name='unique_sales_rollup_day_category'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.category or 'all'}: {self.revenue}"
+
+
+class ProductSalesCounter(models.Model):
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sales_counter',
+    )
+    # Copied from the product so category leaderboards stay on one index.
+    category = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
+    times_ordered = models.PositiveIntegerField(default=0)
+    units_sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_sold_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-units_sold'], name='sales_counter_units'),
+            models.Index(fields=['-times_ordered'], name='sales_counter_orders'),
+            models.Index(fields=['-revenue'], name='sales_counter_revenue'),
+            models.Index(fields=['category', '-units_sold'], name='sales_counter_cat_units'),
+            models.Index(fields=['category', '-times_ordered'], name='sales_counter_cat_orders'),
+            models.Index(fields=['category', '-revenue'], name='sales_counter_cat_revenue'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name}: {self.units_sold} sold"
+
+
+class ProductPriceHistory(models.Model):
+    """Append-only log of prices; a row's price holds from effective_from until the next row."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    effective_from = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['product', 'effective_from', 'id']
+        indexes = [
+            # Covers "latest row at or before T" seeks and per-product range scans.
+            models.Index(fields=['product', 'effective_from', 'id', 'price'], name='price_history_product_from'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.effective_from:%Y-%m-%d %H:%M}: {self.price}"
+
+
+class ProductReorderPoint(models.Model):
+    """Sales velocity and reorder suggestions per active product, rebuilt by refresh_reorder_points."""
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='reorder',
+    )
+    units_7d = models.PositiveIntegerField(default=0)
+    units_30d = models.PositiveIntegerField(default=0)
+    units_90d = models.PositiveIntegerField(default=0)
+    daily_velocity = models.DecimalField(max_digits=10, decimal_places=3, default=0)
+    # NULL when nothing sold recently, i.e. the stock never runs out at this rate.
+    days_of_cover = models.DecimalField(max_digits=10, decimal_places=1, blank=True, null=True)
+    reorder_point = models.PositiveIntegerField(default=0)
+    suggested_quantity = models.PositiveIntegerField(default=0)
+    needs_reorder = models.BooleanField(default=False)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['days_of_cover', 'product'], name='reorder_needed_cover', condition=models.Q(needs_reorder=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: reorder at {self.reorder_point}, suggest {self.suggested_quantity}"
+
+
+class Job(models.Model):
+    """A unit of background work run by the run_worker command (see Base/jobs.py)."""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+
+    queue = models.CharField(max_length=50, default='default')
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # Earliest time the job may (re)run; pushed back after each failure.
+    run_at = models.DateTimeField(default=timezone.now)
+    # While running, the job is hidden from other workers until locked_until;
+    # after that it is treated as abandoned and claimed again.
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'queue', 'run_at', 'id'], name='job_claim'),
+            models.Index(fields=['status', 'locked_until'], name='job_lock_expiry'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
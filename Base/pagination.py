@@ -0,0 +1,152 @@
+# Base/pagination.py
+from math import ceil
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+CURSOR_SALT = 'Base.pagination.cursor'
+
+
+class CursorPage:
+    """
+    One page of a CursorPaginator. Iterates like a Paginator page and
+    exposes next_cursor / previous_cursor for building links.
+    """
+
+    def __init__(self, object_list, number, has_next, has_previous, next_cursor, previous_cursor, paginator):
+        self.object_list = object_list
+        self.number = number
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.paginator = paginator
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    def start_index(self):
+        """1-based position of the first object on this page."""
+        return (self.number - 1) * self.paginator.per_page + 1 if self.object_list else 0
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over a whitelisted sort key with an id tiebreaker.
+
+    Pages are fetched with "WHERE (key, id) beyond the last row ORDER BY
+    key, id LIMIT per_page + 1", so every page is an index range scan and
+    page 500 costs the same as page 1. Cursors are signed, opaque tokens
+    carrying the boundary row and the page number; tampered or stale cursors
+    just restart at the first page. count is optional (an int or a callable)
+    and only feeds num_pages for "Page X of Y" displays.
+    """
+
+    def __init__(self, queryset, sort_key, per_page=10, count=None):
+        self.queryset = queryset
+        self.sort_key = sort_key
+        self.per_page = per_page
+        self._count = count
+        self.descending = sort_key.startswith('-')
+        self.field_name = sort_key.lstrip('-')
+
+    @property
+    def count(self):
+        if callable(self._count):
+            self._count = self._count()
+        return self._count
+
+    @property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return max(ceil(self.count / self.per_page), 1)
+
+    def _field(self):
+        annotation = self.queryset.query.annotations.get(self.field_name)
+        if annotation is not None:
+            return annotation.output_field
+        try:
+            return self.queryset.model._meta.get_field(self.field_name)
+        except FieldDoesNotExist:
+            return None
+
+    def _ordering(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return [f'{prefix}{self.field_name}', f'{prefix}id'], descending
+
+    def _position(self, obj):
+        value = getattr(obj, self.field_name)
+        if self.field_name != 'id':
+            field = self._field()
+            value = field.value_to_string(obj) if hasattr(field, 'attname') else value
+        return [value, obj.pk]
+
+    def _encode(self, obj, direction, number):
+        payload = {'k': self.sort_key, 'v': self._position(obj), 'd': direction, 'p': number}
+        return signing.dumps(payload, salt=CURSOR_SALT)
+
+    def _decode(self, token):
+        try:
+            data = signing.loads(token, salt=CURSOR_SALT)
+            if data['k'] != self.sort_key or data['d'] not in ('next', 'prev'):
+                return None
+            raw_value, pk = data['v']
+            field = self._field()
+            value = field.to_python(raw_value) if field is not None and raw_value is not None else raw_value
+            return value, int(pk), data['d'], max(int(data['p']), 1)
+        except (signing.BadSignature, KeyError, TypeError, ValueError, ValidationError):
+            return None
+
+    def _beyond(self, value, pk, descending):
+        op = 'lt' if descending else 'gt'
+        if self.field_name == 'id':
+            return Q(**{f'id__{op}': pk})
+        return Q(**{f'{self.field_name}__{op}': value}) | Q(**{self.field_name: value, f'id__{op}': pk})
+
+    def page(self, cursor=None):
+        decoded = self._decode(cursor) if cursor else None
+        if decoded is None:
+            ordering, _ = self._ordering()
+            rows = list(self.queryset.order_by(*ordering)[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            return self._build_page(rows, 1, has_next, False)
+
+        value, pk, direction, number = decoded
+        backwards = direction == 'prev'
+        ordering, descending = self._ordering(reverse=backwards)
+        rows = list(
+            self.queryset.filter(self._beyond(value, pk, descending)).order_by(*ordering)[:self.per_page + 1]
+        )
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not rows:
+            return self.page()
+        if backwards:
+            rows.reverse()
+            # Nothing before this page means it is the first one, whatever the cursor said.
+            return self._build_page(rows, number if more else 1, True, more)
+        return self._build_page(rows, number, more, number > 1)
+
+    def _build_page(self, rows, number, has_next, has_previous):
+        next_cursor = self._encode(rows[-1], 'next', number + 1) if has_next and rows else ''
+        previous_cursor = self._encode(rows[0], 'prev', number - 1) if has_previous and rows else ''
+        return CursorPage(rows, number, has_next, has_previous, next_cursor, previous_cursor, self)
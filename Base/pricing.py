@@ -0,0 +1,82 @@
+# Base/pricing.py
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Product, ProductPriceHistory
+
+PRICE_HISTORY_BATCH_SIZE = 500
+CENT = Decimal('0.01')
+
+
+def record_price_changes(prices, effective_from=None):
+    """
+    Append history rows for {product_id: new_price} in one INSERT.
+
+    Product.save() logs its own changes; this is for writes that bypass it
+    (queryset.update(), bulk_create() and bulk_update()).
+    """
+    effective_from = effective_from or timezone.now()
+    return ProductPriceHistory.objects.bulk_create(
+        ProductPriceHistory(product_id=product_id, price=price, effective_from=effective_from)
+        for product_id, price in prices.items()
+    )
+
+
+def _batches(product_ids, size=PRICE_HISTORY_BATCH_SIZE):
+    product_ids = sorted(set(product_ids))
+    for start in range(0, len(product_ids), size):
+        yield product_ids[start:start + size]
+
+
+def price_at(product_ids, when):
+    """
+    {product_id: price in effect at when} for many products.
+
+    Each batch is one query whose correlated subquery is a single seek on
+    (product, effective_from). Products with no price yet at when are left out.
+    """
+    latest = (
+        ProductPriceHistory.objects
+        .filter(product=OuterRef('pk'), effective_from__lte=when)
+        .order_by('-effective_from', '-id')
+        .values('price')[:1]
+    )
+    prices = {}
+    for batch in _batches(product_ids):
+        rows = (
+            Product.objects.filter(id__in=batch)
+            .annotate(price_then=Subquery(latest))
+            .filter(price_then__isnull=False)
+            .values_list('id', 'price_then')
+        )
+        # SQLite hands back subquery decimals unscaled; restore the cents.
+        prices.update((product_id, price.quantize(CENT)) for product_id, price in rows)
+    return prices
+
+
+def price_series(product_ids, since, until=None):
+    """
+    {product_id: [(effective_from, price), ...]} covering since..until.
+
+    The first point of each series is the price already in effect at since
+    (stamped at since), followed by every change in the range, so the
+    series can be drawn as a step chart. One price_at() lookup plus one
+    indexed range scan per batch.
+    """
+    until = until or timezone.now()
+    series = defaultdict(list)
+    for batch in _batches(product_ids):
+        for product_id, price in price_at(batch, since).items():
+            series[product_id].append((since, price))
+        changes = (
+            ProductPriceHistory.objects
+            .filter(product_id__in=batch, effective_from__gt=since, effective_from__lte=until)
+            .order_by('product_id', 'effective_from', 'id')
+            .values_list('product_id', 'effective_from', 'price')
+        )
+        for product_id, effective_from, price in changes:
+            series[product_id].append((effective_from, price))
+    return dict(series)
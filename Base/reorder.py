@@ -0,0 +1,148 @@
+# Base/reorder.py
+from decimal import ROUND_CEILING, Decimal
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .catalog import catalog_changed
+from .models import PCBuildItem, Product, ProductReorderPoint
+
+# Rolling windows (days) and how much each one counts towards the daily
+# velocity; recent demand weighs most without one quiet week zeroing it.
+VELOCITY_WINDOWS = {7: Decimal('0.5'), 30: Decimal('0.3'), 90: Decimal('0.2')}
+# Products without a reorder row yet (added since the last refresh), or
+# with no sales to derive a point from, fall back to the fixed threshold.
+LOW_STOCK_THRESHOLD = 5
+REORDER_CHUNK_SIZE = 2000
+
+# Low stock: in stock but at or under the reorder point. The point comes
+# from the last refresh while quantity is live, so restocks and sales
+# move products in and out of the list straight away. The whole test is
+# one comparison against a correlated primary-key lookup (NULL when out
+# of stock), not a join or a bare quantity range, so SQLite keeps walking
+# the list's sort index instead of switching to the quantity index and
+# sorting afterwards.
+LOW_STOCK_FILTER = Q(quantity__lte=Case(
+    When(quantity__gt=0, then=Coalesce(
+        Subquery(
+            ProductReorderPoint.objects
+            .filter(product=OuterRef('pk'), daily_velocity__gt=0)
+            .values('reorder_point')[:1]
+        ),
+        Value(LOW_STOCK_THRESHOLD),
+    )),
+    default=None,
+    output_field=IntegerField(),
+))
+
+
+def _setting(name, default):
+    return int(getattr(settings, name, default))
+
+
+def windowed_sales(now=None):
+    """{product_id: {window_days: units}} from checked-out builds, in one grouped query."""
+    now = now or timezone.now()
+    longest = max(VELOCITY_WINDOWS)
+    sums = {
+        f'units_{days}d': Sum('quantity', filter=Q(build__created_at__gte=now - timedelta(days=days)))
+        for days in VELOCITY_WINDOWS
+    }
+    rows = (
+        PCBuildItem.objects
+        .filter(build__status='checked_out', build__created_at__gte=now - timedelta(days=longest))
+        .order_by()
+        .values('product_id')
+        .annotate(**sums)
+    )
+    return {
+        row['product_id']: {days: row[f'units_{days}d'] or 0 for days in VELOCITY_WINDOWS}
+        for row in rows
+    }
+
+
+def reorder_figures(quantity, units):
+    """
+    Velocity, cover and reorder suggestion for one product.
+
+    units is {window_days: units sold}. The reorder point covers supplier
+    lead time plus safety stock at the current velocity; a product at or
+    under it is topped up to REORDER_TARGET_COVER_DAYS of stock on top of
+    the lead time.
+    """
+    lead_days = _setting('REORDER_LEAD_TIME_DAYS', 7)
+    safety_days = _setting('REORDER_SAFETY_STOCK_DAYS', 7)
+    cover_days = _setting('REORDER_TARGET_COVER_DAYS', 30)
+
+    velocity = sum(
+        (weight * units.get(days, 0) / days for days, weight in VELOCITY_WINDOWS.items()),
+        Decimal(0),
+    ).quantize(Decimal('0.001'))
+    reorder_point = int((velocity * (lead_days + safety_days)).to_integral_value(ROUND_CEILING))
+    needs_reorder = velocity > 0 and quantity <= reorder_point
+    target = int((velocity * (lead_days + cover_days)).to_integral_value(ROUND_CEILING))
+    return {
+        'units_7d': units.get(7, 0),
+        'units_30d': units.get(30, 0),
+        'units_90d': units.get(90, 0),
+        'daily_velocity': velocity,
+        'days_of_cover': (Decimal(max(quantity, 0)) / velocity).quantize(Decimal('0.1')) if velocity else None,
+        'reorder_point': reorder_point,
+        'suggested_quantity': max(target - quantity, 0) if needs_reorder else 0,
+        'needs_reorder': needs_reorder,
+    }
+
+
+def _upsert(rows):
+    ProductReorderPoint.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=[
+            'units_7d', 'units_30d', 'units_90d', 'daily_velocity', 'days_of_cover',
+            'reorder_point', 'suggested_quantity', 'needs_reorder', 'refreshed_at',
+        ],
+    )
+
+
+def refresh_reorder_points(now=None, chunk_size=REORDER_CHUNK_SIZE):
+    """
+    Recompute ProductReorderPoint for every active product in one pass.
+
+    Sales come from one grouped query; products are streamed and upserted
+    in chunks, and rows for archived or deleted products are dropped.
+    Cached facet counts are invalidated afterwards. Returns (rows written, products needing reorder).
+    """
+    now = now or timezone.now()
+    sales = windowed_sales(now)
+    written = needing = 0
+    batch = []
+    products = Product.objects.filter(is_archived=False).order_by('id').values_list('id', 'quantity')
+    for product_id, quantity in products.iterator(chunk_size=chunk_size):
+        figures = reorder_figures(quantity, sales.get(product_id, {}))
+        needing += figures['needs_reorder']
+        batch.append(ProductReorderPoint(product_id=product_id, refreshed_at=now, **figures))
+        if len(batch) >= chunk_size:
+            _upsert(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        _upsert(batch)
+        written += len(batch)
+    ProductReorderPoint.objects.filter(refreshed_at__lt=now).delete()
+    # The low-stock facet reads these rows, so drop counts cached against them.
+    catalog_changed()
+    return written, needing
+
+
+def reorder_list(limit=100):
+    """Products flagged at the last refresh, soonest to run out first."""
+    return (
+        ProductReorderPoint.objects
+        .filter(needs_reorder=True, product__is_archived=False)
+        .select_related('product')
+        .order_by('days_of_cover', 'product_id')[:limit]
+    )
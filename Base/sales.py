@@ -0,0 +1,361 @@
+# Base/sales.py
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import PCBuild, PCBuildItem, ProductSalesCounter, SalesDailyRollup
+
+# Category key of the per-day total row in SalesDailyRollup.
+ALL_CATEGORIES = ''
+
+SALES_VERSION_KEY = 'sales:version'
+
+
+def sales_data_version():
+    """
+    Current version of checked-out sales data; cached reports key on it.
+
+    Like catalog_version(), it needs a cache shared by every process.
+    """
+    version = cache.get(SALES_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a cleared key never reuses an old version.
+        cache.add(SALES_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(SALES_VERSION_KEY)
+    return version
+
+
+def _bump_sales_version():
+    try:
+        cache.incr(SALES_VERSION_KEY)
+    except ValueError:
+        sales_data_version()
+
+
+def sales_data_changed():
+    """Invalidate cached sales reports once the current transaction commits."""
+    transaction.on_commit(_bump_sales_version)
+
+
+def refresh_build_counts(build_ids=None):
+    """Recompute stored item_count/unit_count from line items with one UPDATE."""
+    lines = PCBuildItem.objects.filter(build_id=OuterRef('pk')).order_by().values('build_id')
+    builds = PCBuild.objects.all()
+    if build_ids is not None:
+        builds = builds.filter(id__in=build_ids)
+    return builds.update(
+        item_count=Coalesce(
+            Subquery(lines.annotate(total=Count('id')).values('total'), output_field=IntegerField()),
+            Value(0),
+        ),
+        unit_count=Coalesce(
+            Subquery(lines.annotate(total=Sum('quantity')).values('total'), output_field=IntegerField()),
+            Value(0),
+        ),
+    )
+
+
+def _line_revenue():
+    return Sum(F('quantity') * F('price_at_time'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _rollup_totals(builds):
+    """Grouped (date, category) totals for a queryset of checked-out builds."""
+    totals = defaultdict(lambda: [Decimal('0.00'), 0, 0])
+    per_category = (
+        PCBuildItem.objects.filter(build__in=builds)
+        .annotate(day=TruncDate('build__created_at'))
+        .values('day', 'product__category')
+        .annotate(revenue=_line_revenue(), builds=Count('build_id', distinct=True), units=Sum('quantity'))
+        .order_by()
+    )
+    for row in per_category:
+        totals[(row['day'], row['product__category'])] = [row['revenue'] or Decimal('0.00'), row['builds'], row['units'] or 0]
+
+    per_day = (
+        builds.annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(revenue=Sum('total_price'), builds=Count('id'), units=Sum('unit_count'))
+        .order_by()
+    )
+    for row in per_day:
+        totals[(row['day'], ALL_CATEGORIES)] = [row['revenue'] or Decimal('0.00'), row['builds'], row['units'] or 0]
+    return totals
+
+
+def _apply_rollup(totals, sign):
+    if not totals:
+        return
+    SalesDailyRollup.objects.bulk_create(
+        [SalesDailyRollup(date=day, category=category) for day, category in totals],
+        ignore_conflicts=True,
+    )
+    # Clamp at zero so builds that never reached the rollup (e.g. created
+    # outside checkout) cannot break a delete; rebuild_sales_rollup fixes drift.
+    zero = Value(0)
+    for (day, category), (revenue, builds, units) in totals.items():
+        SalesDailyRollup.objects.filter(date=day, category=category).update(
+            revenue=Greatest(F('revenue') + sign * revenue, Value(Decimal('0.00'))),
+            builds=Greatest(F('builds') + sign * builds, zero),
+            units=Greatest(F('units') + sign * units, zero),
+        )
+
+
+def _apply_counters(per_product, sign, sold_at=None):
+    """
+    Apply {product_id: (category, orders, units, revenue)} to the sales
+    counters with one INSERT for missing rows and one UPDATE, whatever the
+    number of products.
+    """
+    if not per_product:
+        return
+    ProductSalesCounter.objects.bulk_create(
+        [ProductSalesCounter(product_id=product_id, category=values[0]) for product_id, values in per_product.items()],
+        ignore_conflicts=True,
+    )
+
+    def delta(index, output_field):
+        return Case(
+            *[When(product_id=product_id, then=Value(sign * values[index])) for product_id, values in per_product.items()],
+            default=Value(0),
+            output_field=output_field,
+        )
+
+    changes = {
+        'times_ordered': Greatest(F('times_ordered') + delta(1, IntegerField()), Value(0)),
+        'units_sold': Greatest(F('units_sold') + delta(2, IntegerField()), Value(0)),
+        'revenue': Greatest(
+            F('revenue') + delta(3, DecimalField(max_digits=14, decimal_places=2)),
+            Value(Decimal('0.00')),
+        ),
+    }
+    if sold_at is not None:
+        changes['last_sold_at'] = Value(sold_at)
+    ProductSalesCounter.objects.filter(product_id__in=per_product.keys()).update(**changes)
+
+
+def record_checkout_sales(build, lines):
+    """
+    Add a freshly checked-out build to the daily rollup and product counters.
+
+    lines is an iterable of (product_id, category, quantity, price_at_time).
+    Runs inside the checkout transaction so neither can disagree with the
+    builds.
+    """
+    day = timezone.localdate(build.created_at)
+    totals = defaultdict(lambda: [Decimal('0.00'), 0, 0])
+    per_product = {}
+    for product_id, category, quantity, price in lines:
+        entry = totals[(day, category)]
+        entry[0] += price * quantity
+        entry[1] = 1
+        entry[2] += quantity
+        per_product[product_id] = (category, 1, quantity, price * quantity)
+    totals[(day, ALL_CATEGORIES)] = [build.total_price, 1, build.unit_count]
+    _apply_rollup(totals, 1)
+    _apply_counters(per_product, 1, sold_at=timezone.now())
+
+
+def _counter_totals(lines):
+    return {
+        row['product_id']: (row['product__category'], row['orders'], row['units'] or 0, row['revenue'] or Decimal('0.00'))
+        for row in lines.values('product_id', 'product__category')
+        .annotate(orders=Count('id'), units=Sum('quantity'), revenue=_line_revenue())
+        .order_by()
+    }
+
+
+def reverse_build_sales(build_ids):
+    """Remove checked-out builds that are about to be deleted from the rollup and counters."""
+    builds = PCBuild.objects.filter(id__in=build_ids, status='checked_out')
+    _apply_rollup(_rollup_totals(builds), -1)
+    _apply_counters(_counter_totals(PCBuildItem.objects.filter(build__in=builds)), -1)
+
+
+@transaction.atomic
+def rebuild_sales_rollup():
+    """Recompute the whole rollup from checked-out builds; returns the row count."""
+    SalesDailyRollup.objects.all().delete()
+    totals = _rollup_totals(PCBuild.objects.filter(status='checked_out'))
+    SalesDailyRollup.objects.bulk_create([
+        SalesDailyRollup(date=day, category=category, revenue=revenue, builds=builds, units=units)
+        for (day, category), (revenue, builds, units) in totals.items()
+    ])
+    return len(totals)
+
+
+@transaction.atomic
+def rebuild_product_sales_counters():
+    """Recompute every product's sales counter from checked-out lines; returns the row count."""
+    ProductSalesCounter.objects.all().delete()
+    rows = (
+        PCBuildItem.objects.filter(build__status='checked_out')
+        .values('product_id', 'product__category')
+        .annotate(orders=Count('id'), units=Sum('quantity'), revenue=_line_revenue(), last_sold_at=Max('build__created_at'))
+        .order_by()
+    )
+    counters = [
+        ProductSalesCounter(
+            product_id=row['product_id'],
+            category=row['product__category'],
+            times_ordered=row['orders'],
+            units_sold=row['units'] or 0,
+            revenue=row['revenue'] or Decimal('0.00'),
+            last_sold_at=row['last_sold_at'],
+        )
+        for row in rows
+    ]
+    ProductSalesCounter.objects.bulk_create(counters, batch_size=1000)
+    return len(counters)
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+LEADERBOARD_METRICS = {
+    'units': 'units_sold',
+    'orders': 'times_ordered',
+    'revenue': 'revenue',
+}
+
+
+def top_products(limit=10, metric='units', category=None, since=None, until=None):
+    """
+    Top-N products by units sold, times ordered or revenue.
+
+    Without a date range this is an indexed ORDER BY ... LIMIT over the
+    sales counters; since/until (dates, inclusive) fall back to grouping the
+    checked-out lines in that window.
+    """
+    field = LEADERBOARD_METRICS[metric]
+    if since is None and until is None:
+        counters = ProductSalesCounter.objects.filter(**{f'{field}__gt': 0})
+        if category:
+            counters = counters.filter(category=category)
+        return [
+            {
+                'product_id': counter.product_id,
+                'name': counter.product.name,
+                'category': counter.category,
+                'times_ordered': counter.times_ordered,
+                'units_sold': counter.units_sold,
+                'revenue': counter.revenue,
+            }
+            for counter in counters.select_related('product').order_by(f'-{field}', 'product_id')[:limit]
+        ]
+
+    lines = PCBuildItem.objects.filter(build__status='checked_out')
+    if category:
+        lines = lines.filter(product__category=category)
+    if since is not None:
+        lines = lines.filter(build__created_at__gte=_start_of_day(since))
+    if until is not None:
+        lines = lines.filter(build__created_at__lt=_start_of_day(until + timedelta(days=1)))
+    rows = (
+        lines.values('product_id', 'product__name', 'product__category')
+        .annotate(times_ordered=Count('id'), units_sold=Sum('quantity'), revenue=_line_revenue())
+        .order_by(f'-{field}', 'product_id')[:limit]
+    )
+    return [
+        {
+            'product_id': row['product_id'],
+            'name': row['product__name'],
+            'category': row['product__category'],
+            'times_ordered': row['times_ordered'],
+            'units_sold': row['units_sold'],
+            'revenue': row['revenue'],
+        }
+        for row in rows
+    ]
+
+
+def _month_starts(months_back, today=None):
+    today = today or timezone.localdate()
+    year, month = today.year, today.month
+    starts = []
+    for _ in range(months_back):
+        starts.append(date(year, month, 1))
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return list(reversed(starts))
+
+
+def monthly_sales(months_back=6, category=ALL_CATEGORIES, today=None):
+    """Return [(month_start, revenue, builds, units)] for the last months_back calendar months."""
+    starts = _month_starts(months_back, today)
+    rows = (
+        SalesDailyRollup.objects.filter(category=category, date__gte=starts[0])
+        .annotate(month=TruncMonth('date'))
+        .values('month')
+        .annotate(revenue=Sum('revenue'), builds=Sum('builds'), units=Sum('units'))
+        .order_by()
+    )
+    by_month = {(row['month'].year, row['month'].month): row for row in rows}
+    series = []
+    for start in starts:
+        row = by_month.get((start.year, start.month), {})
+        revenue = Decimal(row.get('revenue') or 0).quantize(Decimal('0.01'))
+        series.append((start, revenue, row.get('builds') or 0, row.get('units') or 0))
+    return series
+
+
+def daily_sales(start, end, category=ALL_CATEGORIES):
+    """Rollup rows between two dates (inclusive) for date-range charts."""
+    return SalesDailyRollup.objects.filter(category=category, date__gte=start, date__lte=end).order_by('date')
+
+
+def checkout_history_stats(user=None, archived=False):
+    """
+    Header analytics for the checkout history page, cached per scope.
+
+    user limits the figures to that user's builds (None means every build).
+    Entries are keyed on sales_data_version(), so checkouts, archives,
+    restores and deletes invalidate them without explicit deletes.
+    """
+    scope = f"user:{user.id}" if user is not None else 'all'
+    cache_key = f"checkout_history_stats:{sales_data_version()}:{scope}:{int(bool(archived))}"
+    stats = cache.get(cache_key)
+    if stats is not None:
+        return stats
+
+    builds = PCBuild.objects.filter(status='checked_out', is_archived=archived)
+    if user is not None:
+        builds = builds.filter(user=user)
+    totals = builds.aggregate(
+        total_builds=Count('id'),
+        total_revenue=Coalesce(Sum('total_price'), Value(Decimal('0.00'))),
+    )
+    total_builds = totals['total_builds']
+    total_revenue = Decimal(totals['total_revenue']).quantize(Decimal('0.01'))
+
+    # Grouped over this scope's lines so the item always agrees with the
+    # totals beside it; the result is cached with them.
+    popular = None
+    if total_builds:
+        popular = (
+            PCBuildItem.objects.filter(build__in=builds)
+            .values('product_id', 'product__name')
+            .annotate(count=Count('id'))
+            .order_by('-count', 'product_id')
+            .first()
+        )
+
+    stats = {
+        'total_builds': total_builds,
+        'total_revenue': total_revenue,
+        'avg_order_value': total_revenue / total_builds if total_builds else Decimal('0.00'),
+        'most_popular_item': popular['product__name'] if popular else None,
+        'most_popular_count': popular['count'] if popular else 0,
+    }
+    cache.set(cache_key, stats, timeout=int(getattr(settings, 'CHECKOUT_HISTORY_STATS_CACHE_SECONDS', 60)))
+    return stats
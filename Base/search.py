@@ -0,0 +1,119 @@
+# Base/search.py
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+from .stock import with_available_stock
+
+# External-content FTS5 table over Base_product, kept in sync by triggers
+# created in migration 0018 (SQLite only).
+FTS_TABLE = 'Base_product_fts'
+PRODUCT_TABLE = Product._meta.db_table
+
+# Columns the part-search API may return; callers pick a subset to keep payloads small.
+PART_SEARCH_FIELDS = ('id', 'name', 'category', 'price', 'available_quantity')
+PART_SEARCH_DEFAULT_FIELDS = ('id', 'name', 'price', 'available_quantity')
+PART_SEARCH_MAX_LIMIT = 50
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_fts_state = {}
+
+
+def fts_available(using=connection):
+    """True when the database is SQLite and the product FTS table exists."""
+    if using.vendor != 'sqlite':
+        return False
+    key = using.settings_dict['NAME']
+    if key not in _fts_state:
+        with using.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_state[key] = cursor.fetchone() is not None
+    return _fts_state[key]
+
+
+def fts_match_expression(text):
+    """
+    Turn free text into an FTS5 query where every word must match as a prefix.
+
+    Only word characters are kept, so user input can never inject FTS5
+    syntax. Returns '' when nothing searchable is left.
+    """
+    return ' '.join(f'"{word}"*' for word in _WORD_RE.findall(text.casefold()))
+
+
+def _icontains(text):
+    return Q(name__icontains=text) | Q(description__icontains=text) | Q(category__icontains=text)
+
+
+def search_products(queryset, text, ranked=False):
+    """
+    Filter a Product queryset to rows matching text.
+
+    Uses the FTS5 index when available (name matches weigh most, then
+    category, then description); ranked=True also orders the result by
+    relevance. Falls back to icontains on other databases or when the text
+    has no searchable words.
+    """
+    text = (text or '').strip()
+    if not text:
+        return queryset
+    expression = fts_match_expression(text)
+    if not expression or not fts_available():
+        queryset = queryset.filter(_icontains(text))
+        if not ranked:
+            return queryset
+        # No relevance signal without FTS; keep search_rank so callers can still sort on it.
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).order_by('-created_at')
+
+    matches = RawSQL(f'SELECT rowid FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s', [expression])
+    queryset = queryset.filter(id__in=matches)
+    if not ranked:
+        return queryset
+    rank = RawSQL(
+        f'SELECT bm25("{FTS_TABLE}", 10.0, 1.0, 4.0) FROM "{FTS_TABLE}" '
+        f'WHERE "{FTS_TABLE}" MATCH %s AND rowid = "{PRODUCT_TABLE}"."id"',
+        [expression],
+        output_field=FloatField(),
+    )
+    # bm25() is lower for better matches.
+    return queryset.annotate(search_rank=rank).order_by('search_rank', '-created_at')
+
+
+def search_parts(text='', category=None, in_stock=False, limit=20, fields=PART_SEARCH_DEFAULT_FIELDS,
+                 exclude_build_id=None):
+    """
+    Active parts matching text as a list of dicts holding only fields.
+
+    Every word is matched as a prefix, so "ryz 77" finds "Ryzen 7 7700X";
+    results are ranked by relevance when searching and by name otherwise.
+    available_quantity is stock less other drafts' holds (exclude_build_id
+    is the caller's own draft), and in_stock drops parts with none left.
+    """
+    products = Product.objects.filter(is_archived=False)
+    if category:
+        products = products.filter(category=category)
+    if in_stock:
+        products = products.filter(quantity__gt=0)
+    products = with_available_stock(products, exclude_build_id)
+    if in_stock:
+        products = products.filter(available_quantity__gt=0)
+    if (text or '').strip():
+        products = search_products(products, text, ranked=True)
+    else:
+        products = products.order_by('name', 'id')
+    limit = min(max(int(limit), 1), PART_SEARCH_MAX_LIMIT)
+    return list(products.values(*fields)[:limit])
+
+
+def rebuild_search_index(optimize=False):
+    """Repopulate the FTS table from Base_product; returns False when FTS is unavailable."""
+    if not fts_available():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}") VALUES (\'rebuild\')')
+        if optimize:
+            cursor.execute(f'INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}") VALUES (\'optimize\')')
+    return True
@@ -1,8 +1,9 @@
 # Base/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Profile
+from .catalog import catalog_changed
+from .models import Product, Profile
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
@@ -12,3 +13,8 @@ def create_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, **kwargs):
         instance.profile.save()
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_catalog_changed(sender, **kwargs):
+    catalog_changed()
@@ -0,0 +1,172 @@
+# Base/stock.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .catalog import catalog_changed
+from .models import Product, StockMovement, StockReservation
+
+# Largest value an IntegerField holds on every supported database.
+MAX_QUANTITY = 2 ** 31 - 1
+
+
+class InsufficientStock(Exception):
+    """Raised when one or more products cannot cover the requested quantity."""
+
+    def __init__(self, shortfalls):
+        self.shortfalls = shortfalls
+        names = ", ".join(item['name'] or f"#{item['product_id']}" for item in shortfalls)
+        super().__init__(f"Not enough stock for {names}" if names else "Not enough stock")
+
+
+def reservation_ttl():
+    return timedelta(seconds=int(getattr(settings, 'STOCK_RESERVATION_TTL_SECONDS', 900)))
+
+
+def held_quantity(exclude_build_id=None):
+    """Expression for the quantity of a product held by other drafts' active reservations."""
+    holds = StockReservation.objects.filter(product_id=OuterRef('pk'), expires_at__gt=timezone.now())
+    if exclude_build_id is not None:
+        holds = holds.exclude(build_id=exclude_build_id)
+    held = holds.order_by().values('product_id').annotate(total=Sum('quantity')).values('total')
+    return Coalesce(Subquery(held, output_field=IntegerField()), Value(0))
+
+
+def with_available_stock(queryset, exclude_build_id=None):
+    """Annotate products with available_quantity = quantity minus active holds."""
+    return queryset.annotate(available_quantity=F('quantity') - held_quantity(exclude_build_id))
+
+
+def _stock_shortfalls(requested_quantities, exclude_build_id=None):
+    available = {
+        product_id: (name, quantity)
+        for product_id, name, quantity in with_available_stock(
+            Product.objects.filter(id__in=requested_quantities.keys(), is_archived=False),
+            exclude_build_id,
+        ).values_list('id', 'name', 'available_quantity')
+    }
+
+    shortfalls = []
+    for product_id, requested in requested_quantities.items():
+        name, quantity = available.get(product_id, (None, 0))
+        if quantity < requested:
+            shortfalls.append({
+                'product_id': product_id,
+                'name': name,
+                'requested': requested,
+                'available': max(quantity, 0),
+            })
+    return shortfalls
+
+
+def decrement_stock(requested_quantities, build=None):
+    """
+    Subtract every requested quantity in a single conditional UPDATE.
+
+    Each row is only touched when its current quantity, less whatever other
+    drafts are actively holding, still covers the request, so the check and
+    the write happen in one statement and stock can never go negative, even
+    without row locks (SQLite ignores select_for_update). If any product
+    falls short the whole decrement is rolled back and InsufficientStock
+    lists exactly which products failed.
+    """
+    if not requested_quantities:
+        return
+
+    exclude_build_id = build.id if build is not None else None
+    held = held_quantity(exclude_build_id)
+    covered = Q()
+    for product_id, quantity in requested_quantities.items():
+        covered |= Q(id=product_id, quantity__gte=held + Value(quantity))
+
+    amount = Case(
+        *[When(id=product_id, then=Value(quantity)) for product_id, quantity in requested_quantities.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+    with transaction.atomic():
+        updated = Product.objects.filter(covered, is_archived=False).update(quantity=F('quantity') - amount)
+        if updated == len(requested_quantities):
+            catalog_changed()
+            return
+        transaction.set_rollback(True)
+
+    raise InsufficientStock(_stock_shortfalls(requested_quantities, exclude_build_id))
+
+
+def hold_stock(build, product_id, quantity):
+    """
+    Set the draft build's hold on a product to quantity (0 releases it).
+
+    Holding refreshes the expiry of every active hold on the build so an active
+    session keeps its parts. Checkout still re-checks stock in its UPDATE,
+    so holds only ever make a sale fail earlier, never oversell.
+    """
+    now = timezone.now()
+    expires_at = now + reservation_ttl()
+    with transaction.atomic():
+        if quantity <= 0:
+            build.reservations.filter(product_id=product_id).delete()
+            build.reservations.filter(expires_at__gt=now).update(expires_at=expires_at)
+            return None
+
+        row = (
+            with_available_stock(Product.objects.filter(id=product_id, is_archived=False), build.id)
+            .values_list('name', 'available_quantity')
+            .first()
+        )
+        name, available = row if row else (None, 0)
+        if quantity > available:
+            raise InsufficientStock([{
+                'product_id': product_id,
+                'name': name,
+                'requested': quantity,
+                'available': max(available, 0),
+            }])
+
+        reservation, _ = StockReservation.objects.update_or_create(
+            build=build,
+            product_id=product_id,
+            defaults={'quantity': quantity, 'expires_at': expires_at},
+        )
+        build.reservations.filter(expires_at__gt=now).update(expires_at=expires_at)
+    return reservation
+
+
+def expire_reservations(batch_size=1000):
+    """Delete expired holds in id batches; returns the number removed."""
+    removed = 0
+    now = timezone.now()
+    while True:
+        batch = list(
+            StockReservation.objects.filter(expires_at__lte=now)
+            .order_by('expires_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not batch:
+            return removed
+        removed += StockReservation.objects.filter(id__in=batch).delete()[0]
+
+
+def record_stock_movements(movements):
+    """Write a request's ledger rows with one bulk INSERT."""
+    movements = [movement for movement in movements if movement.quantity_change]
+    if movements:
+        StockMovement.objects.bulk_create(movements)
+    return movements
+
+
+def ledger_balances(product_ids):
+    """Return {product_id: sum of quantity_change} for the given products."""
+    return dict(
+        StockMovement.objects.filter(product_id__in=product_ids)
+        .order_by()
+        .values('product_id')
+        .annotate(balance=Sum('quantity_change'))
+        .values_list('product_id', 'balance')
+    )
@@ -1,9 +1,50 @@
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock, skipUnless
+
 from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import override_settings
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from .models import AuditLog, PCBuild, PCBuildItem, Product
+from .models import (
+    AuditLog,
+    Job,
+    PCBuild,
+    PCBuildItem,
+    Product,
+    ProductPriceHistory,
+    ProductReorderPoint,
+    ProductSalesCounter,
+    SalesDailyRollup,
+    StockMovement,
+    StockReservation,
+)
+from . import analytics
+from .catalog import catalog_snapshot
+from .checks import shared_cache_check
+from .exports import export_lines
+from .imports import import_products
+from .jobs import claim_jobs, enqueue, job_handler, run_job, run_worker
+from .pricing import price_at, price_series
+from .reorder import LOW_STOCK_FILTER, refresh_reorder_points, windowed_sales
+from .sales import monthly_sales, rebuild_product_sales_counters, rebuild_sales_rollup, sales_data_changed
+from .search import fts_available, fts_match_expression, search_products
+from .stock import InsufficientStock, decrement_stock
+from .views import PRODUCT_SORT_KEYS
 
 
 class RBACTests(TestCase):
@@ -373,3 +414,1546 @@ class AuthSecurityTests(TestCase):
                 identifier='secureuser',
             ).exists()
         )
+
+
+class CheckoutStockTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cashier', password='pass12345')
+        self.cpu = Product.objects.create(name='Stock CPU', description='', price='500.00', quantity=3, category='cpu')
+        self.ram = Product.objects.create(name='Stock RAM', description='', price='100.00', quantity=1, category='ram')
+        self.client.login(username='cashier', password='pass12345')
+
+    def _checkout(self, items):
+        return self.client.post(reverse('checkout_pc_build'), {'build_items': json.dumps(items)})
+
+    def test_checkout_decrements_stock_and_creates_items(self):
+        response = self._checkout([
+            {'product_id': self.cpu.id, 'quantity': 2},
+            {'product_id': self.ram.id, 'quantity': 1},
+        ])
+
+        self.assertRedirects(response, reverse('landing'))
+        self.cpu.refresh_from_db()
+        self.ram.refresh_from_db()
+        self.assertEqual(self.cpu.quantity, 1)
+        self.assertEqual(self.ram.quantity, 0)
+        build = PCBuild.objects.get(user=self.user, status='checked_out')
+        self.assertEqual(str(build.total_price), '1100.00')
+        self.assertEqual(build.items.count(), 2)
+        self.assertEqual((build.item_count, build.unit_count), (2, 3))
+
+    def test_checkout_shortfall_rolls_back_every_product(self):
+        response = self._checkout([
+            {'product_id': self.cpu.id, 'quantity': 2},
+            {'product_id': self.ram.id, 'quantity': 5},
+        ])
+
+        self.assertRedirects(response, reverse('pc-builder'))
+        self.assertIn("Not enough stock for Stock RAM", [str(m) for m in get_messages(response.wsgi_request)])
+        self.cpu.refresh_from_db()
+        self.ram.refresh_from_db()
+        self.assertEqual(self.cpu.quantity, 3)
+        self.assertEqual(self.ram.quantity, 1)
+        self.assertFalse(PCBuild.objects.filter(status='checked_out').exists())
+
+    def test_decrement_stock_uses_single_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            decrement_stock({self.cpu.id: 1, self.ram.id: 1})
+
+        writes = [query['sql'] for query in ctx.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(writes), 1)
+        self.cpu.refresh_from_db()
+        self.assertEqual(self.cpu.quantity, 2)
+
+    def test_decrement_stock_reports_each_shortfall(self):
+        with self.assertRaises(InsufficientStock) as ctx:
+            decrement_stock({self.cpu.id: 4, self.ram.id: 2})
+
+        shortfalls = {item['product_id']: item['available'] for item in ctx.exception.shortfalls}
+        self.assertEqual(shortfalls, {self.cpu.id: 3, self.ram.id: 1})
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='ledger_admin', password='pass12345')
+        self.admin_user.profile.role = 'admin'
+        self.admin_user.profile.save(update_fields=['role'])
+        self.client.login(username='ledger_admin', password='pass12345')
+
+    def test_add_checkout_and_edit_write_ledger_rows(self):
+        self.client.post(reverse('add-product'), {
+            'name': 'Ledger GPU', 'description': '', 'price': '300.00', 'quantity': '5', 'category': 'gpu',
+        })
+        product = Product.objects.get(name='Ledger GPU')
+
+        self.client.post(reverse('checkout_pc_build'), {
+            'build_items': json.dumps([{'product_id': product.id, 'quantity': 2}]),
+        })
+        self.client.post(reverse('edit-product', args=[product.id]), {
+            'name': 'Ledger GPU', 'description': '', 'price': '300.00', 'quantity': '10', 'category': 'gpu',
+        })
+
+        reasons = list(product.stock_movements.order_by('id').values_list('reason', 'quantity_change'))
+        self.assertEqual(reasons, [('restock', 5), ('checkout', -2), ('restock', 7)])
+        checkout_movement = product.stock_movements.get(reason='checkout')
+        self.assertIsNotNone(checkout_movement.build_id)
+
+    def test_reconcile_stock_reports_and_fixes_drift(self):
+        product = Product.objects.create(name='Legacy SSD', description='', price='80.00', quantity=4, category='storage')
+
+        out = StringIO()
+        call_command('reconcile_stock', '--fix', stdout=out)
+        self.assertIn('1 mismatch', out.getvalue())
+
+        out = StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn('0 mismatch', out.getvalue())
+        self.assertEqual(product.stock_movements.get().quantity_change, 4)
+
+
+class CheckoutIdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='retry_staff', password='pass12345')
+        self.product = Product.objects.create(name='Retry PSU', description='', price='150.00', quantity=5, category='psu')
+        self.client.login(username='retry_staff', password='pass12345')
+        self.items = json.dumps([{'product_id': self.product.id, 'quantity': 2}])
+
+    def test_form_resubmission_does_not_deduct_stock_twice(self):
+        payload = {'build_items': self.items, 'idempotency_key': 'form-key-1'}
+        self.client.post(reverse('checkout_pc_build'), payload)
+        response = self.client.post(reverse('checkout_pc_build'), payload)
+
+        self.assertRedirects(response, reverse('landing'))
+        self.assertIn("This checkout was already processed.", [str(m) for m in get_messages(response.wsgi_request)])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 3)
+        self.assertEqual(PCBuild.objects.filter(status='checked_out').count(), 1)
+
+    def test_json_replay_returns_original_build(self):
+        url = reverse('checkout-pc-build-api')
+        body = json.dumps({'build_items': json.loads(self.items)})
+
+        first = self.client.post(url, body, content_type='application/json', HTTP_IDEMPOTENCY_KEY='api-key-1')
+        # Session + user lookups, then the single idempotency key lookup.
+        with self.assertNumQueries(3):
+            second = self.client.post(url, body, content_type='application/json', HTTP_IDEMPOTENCY_KEY='api-key-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertFalse(first.json()['replayed'])
+        self.assertTrue(second.json()['replayed'])
+        self.assertEqual(first.json()['build_id'], second.json()['build_id'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 3)
+
+    def test_keys_longer_than_the_column_are_rejected(self):
+        url = reverse('checkout-pc-build-api')
+        body = json.dumps({'build_items': json.loads(self.items)})
+        prefix = 'k' * 64
+
+        first = self.client.post(url, body, content_type='application/json', HTTP_IDEMPOTENCY_KEY=prefix)
+        second = self.client.post(url, body, content_type='application/json', HTTP_IDEMPOTENCY_KEY=prefix + 'b')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 400)
+        self.assertIn('at most 64 characters', second.json()['error'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 3)
+
+    def test_json_checkout_reports_shortfalls(self):
+        response = self.client.post(
+            reverse('checkout-pc-build-api'),
+            json.dumps({'build_items': [{'product_id': self.product.id, 'quantity': 9}]}),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['shortfalls'][0]['available'], 5)
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.holder = User.objects.create_user(username='holder', password='pass12345')
+        self.buyer = User.objects.create_user(username='buyer', password='pass12345')
+        self.gpu = Product.objects.create(name='Held GPU', description='', price='900.00', quantity=3, category='gpu')
+
+    def _reserve(self, quantity):
+        return self.client.post(
+            reverse('reserve-build-part'),
+            json.dumps({'product_id': self.gpu.id, 'quantity': quantity}),
+            content_type='application/json',
+        )
+
+    def test_hold_reduces_stock_available_to_other_checkouts(self):
+        self.client.login(username='holder', password='pass12345')
+        self.assertEqual(self._reserve(2).status_code, 200)
+        self.client.logout()
+
+        self.client.login(username='buyer', password='pass12345')
+        response = self.client.post(reverse('checkout_pc_build'), {
+            'build_items': json.dumps([{'product_id': self.gpu.id, 'quantity': 2}]),
+        })
+
+        self.assertRedirects(response, reverse('pc-builder'))
+        self.gpu.refresh_from_db()
+        self.assertEqual(self.gpu.quantity, 3)
+        self.assertEqual(self._reserve(2).status_code, 409)
+
+    def test_checkout_converts_own_hold_into_sale(self):
+        self.client.login(username='holder', password='pass12345')
+        self._reserve(3)
+
+        response = self.client.post(reverse('checkout_pc_build'), {
+            'build_items': json.dumps([{'product_id': self.gpu.id, 'quantity': 3}]),
+        })
+
+        self.assertRedirects(response, reverse('landing'))
+        self.gpu.refresh_from_db()
+        self.assertEqual(self.gpu.quantity, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expired_holds_are_ignored_and_swept(self):
+        build = PCBuild.objects.create(user=self.holder)
+        StockReservation.objects.create(
+            build=build,
+            product=self.gpu,
+            quantity=3,
+            expires_at=timezone.now() - timedelta(minutes=1),
+        )
+
+        decrement_stock({self.gpu.id: 3})
+        out = StringIO()
+        call_command('expire_reservations', stdout=out)
+
+        self.assertIn('Expired 1 reservation', out.getvalue())
+        self.assertFalse(StockReservation.objects.exists())
+
+
+class StressCheckoutCommandTests(TransactionTestCase):
+    def test_concurrent_checkouts_never_oversell(self):
+        out = StringIO()
+        call_command(
+            'stress_checkout',
+            '--workers', '2',
+            '--requests', '5',
+            '--products', '2',
+            '--stock', '6',
+            stdout=out,
+        )
+
+        self.assertIn('Throughput:', out.getvalue())
+        self.assertIn('Oversell check passed', out.getvalue())
+        self.assertFalse(Product.objects.exists())
+
+
+class BuildCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='counter', password='pass12345')
+        product = Product.objects.create(name='Count Case', description='', price='50.00', quantity=9, category='case')
+        self.build = PCBuild.objects.create(user=self.user, total_price='150.00', status='checked_out')
+        PCBuildItem.objects.create(build=self.build, product=product, quantity=3, price_at_time='50.00')
+
+    def test_backfill_build_counts_populates_stored_counts(self):
+        call_command('backfill_build_counts', stdout=StringIO())
+
+        self.build.refresh_from_db()
+        self.assertEqual((self.build.item_count, self.build.unit_count), (1, 3))
+
+    def test_history_pages_read_stored_counts(self):
+        call_command('backfill_build_counts', stdout=StringIO())
+        self.client.login(username='counter', password='pass12345')
+
+        with CaptureQueriesContext(connection) as detail_ctx:
+            detail = self.client.get(reverse('checkout-history-detail', args=[self.build.id]))
+        with CaptureQueriesContext(connection) as history_ctx:
+            response = self.client.get(reverse('checkout-history'))
+
+        self.assertFalse(any('COUNT(' in query['sql'] for query in detail_ctx.captured_queries))
+        self.assertFalse(any(
+            'JOIN "Base_pcbuilditem"' in query['sql']
+            for query in history_ctx.captured_queries
+            if query['sql'].startswith('SELECT "Base_pcbuild"')
+        ))
+        self.assertEqual(response.context['builds'][0].item_count, 1)
+        self.assertContains(detail, 'Items Checked Out')
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='rollup_admin', password='pass12345')
+        self.admin_user.profile.role = 'admin'
+        self.admin_user.profile.save(update_fields=['role'])
+        self.cpu = Product.objects.create(name='Rollup CPU', description='', price='400.00', quantity=10, category='cpu')
+        self.ram = Product.objects.create(name='Rollup RAM', description='', price='50.00', quantity=10, category='ram')
+        self.client.login(username='rollup_admin', password='pass12345')
+
+    def _checkout(self):
+        self.client.post(reverse('checkout_pc_build'), {
+            'build_items': json.dumps([
+                {'product_id': self.cpu.id, 'quantity': 1},
+                {'product_id': self.ram.id, 'quantity': 2},
+            ]),
+        })
+        return PCBuild.objects.filter(status='checked_out').latest('id')
+
+    def _rollup(self):
+        return {
+            row.category: (str(row.revenue), row.builds, row.units)
+            for row in SalesDailyRollup.objects.all()
+        }
+
+    def test_checkout_updates_rollup_in_same_transaction(self):
+        self._checkout()
+        self._checkout()
+
+        self.assertEqual(self._rollup(), {
+            '': ('1000.00', 2, 6),
+            'cpu': ('800.00', 2, 2),
+            'ram': ('200.00', 2, 4),
+        })
+        incremental = self._rollup()
+        rebuild_sales_rollup()
+        self.assertEqual(self._rollup(), incremental)
+
+    def test_deleting_archived_build_reverses_rollup(self):
+        build = self._checkout()
+        build.is_archived = True
+        build.save(update_fields=['is_archived'])
+
+        self.client.post(reverse('delete-build', args=[build.id]), {'next_view': 'archived', 'confirm_delete': 'DELETE'})
+
+        self.assertEqual(self._rollup()[''], ('0.00', 0, 0))
+
+    def test_monthly_sales_uses_calendar_months(self):
+        SalesDailyRollup.objects.create(date=date(2025, 12, 31), revenue='10.00', builds=1, units=1)
+        SalesDailyRollup.objects.create(date=date(2026, 3, 1), revenue='20.00', builds=2, units=2)
+
+        series = monthly_sales(months_back=4, today=date(2026, 3, 31))
+
+        self.assertEqual(
+            [(start.month, str(revenue), builds) for start, revenue, builds, _ in series],
+            [(12, '10.00', 1), (1, '0.00', 0), (2, '0.00', 0), (3, '20.00', 2)],
+        )
+
+
+class CheckoutHistoryStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='stats_staff', password='pass12345')
+        self.product = Product.objects.create(name='Stats GPU', description='', price='250.00', quantity=10, category='gpu')
+        self.client.login(username='stats_staff', password='pass12345')
+
+    def _checkout(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('checkout_pc_build'), {
+                'build_items': json.dumps([{'product_id': self.product.id, 'quantity': 2}]),
+            })
+
+    def test_header_analytics_are_cached_until_next_checkout(self):
+        self._checkout()
+        first = self.client.get(reverse('checkout-history'))
+        self.assertEqual(first.context['total_builds'], 1)
+        self.assertEqual(first.context['total_revenue'], 500.0)
+        self.assertEqual(first.context['most_popular_item'], 'Stats GPU')
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('checkout-history'))
+        self.assertFalse(any('SUM(' in query['sql'] for query in ctx.captured_queries))
+
+        self._checkout()
+        second = self.client.get(reverse('checkout-history'))
+        self.assertEqual(second.context['total_builds'], 2)
+        self.assertEqual(second.context['avg_order_value'], 500.0)
+        self.assertEqual(second.context['most_popular_count'], 2)
+        self.assertContains(second, 'ordered 2 times')
+
+    def test_most_popular_item_is_scoped_to_the_viewer_and_tab(self):
+        self._checkout()
+        other = User.objects.create_user(username='stats_other', password='pass12345')
+        other_product = Product.objects.create(name='Other CPU', description='', price='100.00', quantity=9, category='cpu')
+        for _ in range(2):
+            build = PCBuild.objects.create(user=other, total_price='100.00', status='checked_out')
+            PCBuildItem.objects.create(build=build, product=other_product, quantity=1, price_at_time='100.00')
+        archived = PCBuild.objects.create(user=self.user, total_price='100.00', status='checked_out', is_archived=True)
+        PCBuildItem.objects.create(build=archived, product=other_product, quantity=1, price_at_time='100.00')
+
+        own = self.client.get(reverse('checkout-history'))
+        self.assertEqual((own.context['most_popular_item'], own.context['most_popular_count']), ('Stats GPU', 1))
+        self.assertNotContains(own, 'Other CPU')
+        own_archived = self.client.get(reverse('checkout-history'), {'view': 'archived'})
+        self.assertEqual(own_archived.context['most_popular_item'], 'Other CPU')
+
+
+class ProductPopularityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='popular_staff', password='pass12345')
+        self.cpu = Product.objects.create(name='Fast CPU', description='', price='300.00', quantity=20, category='cpu')
+        self.ram = Product.objects.create(name='Popular RAM', description='', price='40.00', quantity=20, category='ram')
+        self.client.login(username='popular_staff', password='pass12345')
+
+    def _checkout(self, items):
+        self.client.post(reverse('checkout_pc_build'), {
+            'build_items': json.dumps([{'product_id': product.id, 'quantity': qty} for product, qty in items]),
+        })
+
+    def test_checkout_updates_counters_and_leaderboard(self):
+        self._checkout([(self.cpu, 1), (self.ram, 4)])
+        self._checkout([(self.ram, 2)])
+
+        counter = ProductSalesCounter.objects.get(product=self.ram)
+        self.assertEqual((counter.times_ordered, counter.units_sold, str(counter.revenue)), (2, 6, '240.00'))
+
+        response = self.client.get(reverse('top-products-api'), {'metric': 'revenue'})
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Fast CPU', 'Popular RAM'])
+
+        response = self.client.get(reverse('top-products-api'), {'category': 'cpu'})
+        self.assertEqual([row['product_id'] for row in response.json()['results']], [self.cpu.id])
+
+    def test_leaderboard_date_filter_and_rebuild(self):
+        self._checkout([(self.ram, 3)])
+        today = timezone.localdate()
+
+        response = self.client.get(reverse('top-products-api'), {'since': str(today), 'until': str(today)})
+        self.assertEqual(response.json()['results'][0]['units_sold'], 3)
+        response = self.client.get(reverse('top-products-api'), {'until': str(today - timedelta(days=1))})
+        self.assertEqual(response.json()['results'], [])
+        self.assertEqual(self.client.get(reverse('top-products-api'), {'since': 'soon'}).status_code, 400)
+
+        ProductSalesCounter.objects.all().delete()
+        rebuild_product_sales_counters()
+        self.assertEqual(ProductSalesCounter.objects.get(product=self.ram).units_sold, 3)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='export_admin', password='pass12345')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.staff = User.objects.create_user(username='export_staff', password='pass12345')
+        self.cpu = Product.objects.create(name='Export CPU', description='', price='250.00', quantity=10, category='cpu')
+        self.ram = Product.objects.create(name='Export RAM', description='', price='50.00', quantity=10, category='ram')
+        for user, items in ((self.admin, [(self.cpu, 1), (self.ram, 2)]), (self.staff, [(self.ram, 1)])):
+            build = PCBuild.objects.create(user=user, status='checked_out', item_count=len(items))
+            for product, quantity in items:
+                PCBuildItem.objects.create(build=build, product=product, quantity=quantity, price_at_time=product.price)
+
+    def _body(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_checkout_history_csv_has_one_row_per_line_item(self):
+        self.client.login(username='export_admin', password='pass12345')
+        response = self.client.get(reverse('export-data', args=['checkout-history']))
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = self._body(response).splitlines()
+        self.assertTrue(rows[0].startswith('build_id,username,'))
+        self.assertEqual(len(rows), 4)
+
+    def test_jsonl_export_uses_fixed_number_of_queries(self):
+        lines = list(export_lines('checkout-history', 'jsonl', chunk_size=1))
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(len(json.loads(lines[0])['items']), 2)
+
+        # One query for the builds plus one items prefetch per chunk.
+        with self.assertNumQueries(1 + 2):
+            list(export_lines('checkout-history', 'jsonl', chunk_size=1))
+
+    def test_staff_only_export_their_own_history(self):
+        self.client.login(username='export_staff', password='pass12345')
+        response = self.client.get(reverse('export-data', args=['checkout-history']), {'format': 'jsonl'})
+        records = [json.loads(line) for line in self._body(response).splitlines()]
+        self.assertEqual([record['username'] for record in records], ['export_staff'])
+
+        response = self.client.get(reverse('export-data', args=['products']))
+        self.assertRedirects(response, reverse('landing'), fetch_redirect_response=False)
+
+    def test_export_command_writes_products(self):
+        out = StringIO()
+        call_command('export_data', 'products', '--format', 'jsonl', stdout=out)
+        names = [json.loads(line)['name'] for line in out.getvalue().splitlines()]
+        self.assertEqual(names, ['Export CPU', 'Export RAM'])
+
+
+@skipUnless(analytics.numpy_available(), "NumPy is not installed")
+class SalesAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='analytics_admin', password='pass12345')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.staff = User.objects.create_user(username='analytics_staff', password='pass12345')
+        self.cpu = Product.objects.create(name='Analytics CPU', description='', price='199.99', quantity=10, category='cpu')
+        self.ram = Product.objects.create(name='Analytics RAM', description='', price='45.10', quantity=10, category='ram')
+        self.today = timezone.localdate()
+        self._build(self.admin, [(self.cpu, 1), (self.ram, 2)], days_ago=0)
+        self._build(self.staff, [(self.ram, 1)], days_ago=0)
+        self._build(self.staff, [(self.cpu, 2)], days_ago=3)
+
+    def _build(self, user, items, days_ago):
+        build = PCBuild.objects.create(user=user, status='checked_out')
+        PCBuild.objects.filter(id=build.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+        for product, quantity in items:
+            PCBuildItem.objects.create(build=build, product=product, quantity=quantity, price_at_time=product.price)
+        return build
+
+    def test_breakdowns_match_line_totals(self):
+        frame = analytics.load_sales_frame()
+        self.assertEqual(len(frame), 4)
+        self.assertEqual(frame.totals()['revenue'], Decimal('735.27'))
+
+        by_category = frame.revenue_by_category()
+        self.assertEqual(by_category['cpu'], Decimal('599.97'))
+        self.assertEqual(by_category['ram'], Decimal('135.30'))
+        self.assertEqual(frame.revenue_by_user(), {self.staff.id: Decimal('445.08'), self.admin.id: Decimal('290.19')})
+
+        series = frame.revenue_by_period('day')
+        self.assertEqual(
+            [(start, revenue, builds) for start, revenue, builds, _ in series],
+            [(self.today - timedelta(days=3), Decimal('399.98'), 1), (self.today, Decimal('335.29'), 2)],
+        )
+        recent = frame.filter(since=self.today)
+        self.assertEqual(recent.order_value_percentiles((0, 100)), {0: Decimal('45.10'), 100: Decimal('290.19')})
+
+    def test_moving_average_uses_partial_leading_windows(self):
+        self.assertEqual(list(analytics.moving_average([2, 4, 6, 8], 2)), [2.0, 3.0, 5.0, 7.0])
+
+    def test_frame_cached_until_sales_version_changes(self):
+        frame = analytics.sales_frame()
+        with self.assertNumQueries(0):
+            self.assertIs(analytics.sales_frame(), frame)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sales_data_changed()
+        self.assertIsNot(analytics.sales_frame(), frame)
+
+    def test_report_api(self):
+        self.client.login(username='analytics_admin', password='pass12345')
+        response = self.client.get(reverse('sales-report-api'), {'group': 'period', 'period': 'week', 'window': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['totals']['revenue'], '735.27')
+
+        response = self.client.get(reverse('sales-report-api'), {'group': 'user', 'category': 'ram'})
+        self.assertEqual(
+            [(row['username'], row['revenue']) for row in response.json()['results']],
+            [('analytics_admin', '90.20'), ('analytics_staff', '45.10')],
+        )
+        self.assertEqual(self.client.get(reverse('sales-report-api'), {'period': 'hour'}).status_code, 400)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='search_admin', password='pass12345')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.ryzen = Product.objects.create(name='Ryzen 7 7700X', description='Eight cores', price='300.00', quantity=5, category='cpu')
+        self.board = Product.objects.create(
+            name='B650 Board', description='Socket AM5 board for Ryzen processors', price='180.00', quantity=5, category='motherboard',
+        )
+        Product.objects.create(name='Corsair Vengeance', description='DDR5 kit', price='90.00', quantity=5, category='ram')
+
+    def _names(self, queryset):
+        return [product.name for product in queryset]
+
+    def test_prefix_search_ranks_name_matches_first(self):
+        self.assertTrue(fts_available())
+        results = search_products(Product.objects.all(), 'ryz', ranked=True)
+        self.assertEqual(self._names(results), ['Ryzen 7 7700X', 'B650 Board'])
+        self.assertEqual(self._names(search_products(Product.objects.all(), 'venge ddr5')), ['Corsair Vengeance'])
+
+    def test_index_follows_updates_and_deletes(self):
+        Product.objects.filter(id=self.ryzen.id).update(name='Threadripper 7980X')
+        self.assertEqual(self._names(search_products(Product.objects.all(), 'threadrip')), ['Threadripper 7980X'])
+        self.assertEqual(self._names(search_products(Product.objects.all(), 'ryzen')), ['B650 Board'])
+
+        self.board.delete()
+        self.assertFalse(search_products(Product.objects.all(), 'ryzen').exists())
+
+    def test_product_page_search_and_rebuild_command(self):
+        call_command('rebuild_product_search', '--optimize', stdout=StringIO())
+        self.client.login(username='search_admin', password='pass12345')
+
+        response = self.client.get(reverse('product'), {'search': 'ryzen'})
+        self.assertEqual(response.context['sort_by'], 'relevance')
+        self.assertEqual(self._names(response.context['products']), ['Ryzen 7 7700X', 'B650 Board'])
+
+        response = self.client.get(reverse('category'), {'search': 'ryzen', 'sort': 'price'})
+        self.assertEqual(self._names(response.context['products']), ['B650 Board', 'Ryzen 7 7700X'])
+
+    def test_punctuation_only_search_falls_back_to_icontains(self):
+        self.assertEqual(fts_match_expression('"*)'), '')
+        self.assertFalse(search_products(Product.objects.all(), '"*)').exists())
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='pager_admin', password='pass12345')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        # Equal prices force the id tiebreaker to keep pages disjoint.
+        Product.objects.bulk_create([
+            Product(name=f'Pager Part {index:02d}', description='', price='10.00', quantity=index, category='case')
+            for index in range(25)
+        ])
+
+    def _walk(self, url, params):
+        names, cursor, numbers = [], None, []
+        while True:
+            response = self.client.get(url, {**params, **({'cursor': cursor} if cursor else {})})
+            page = response.context['products']
+            names.extend(product.name for product in page)
+            numbers.append(page.number)
+            if not page.has_next():
+                return names, numbers, page
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_row_once_in_sort_order(self):
+        self.client.login(username='pager_admin', password='pass12345')
+        names, numbers, last_page = self._walk(reverse('product'), {'sort': '-price'})
+
+        self.assertEqual(len(names), 25)
+        self.assertEqual(len(set(names)), 25)
+        self.assertEqual(numbers, [1, 2, 3])
+        self.assertEqual(last_page.paginator.num_pages, 3)
+
+        response = self.client.get(reverse('product'), {'sort': '-price', 'cursor': last_page.previous_cursor})
+        self.assertEqual([product.name for product in response.context['products']], names[10:20])
+        self.assertEqual(response.context['products'].number, 2)
+
+    def test_deep_pages_use_keyset_filter_not_offset(self):
+        self.client.login(username='pager_admin', password='pass12345')
+        first = self.client.get(reverse('category'), {'sort': 'quantity'}).context['products']
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('category'), {'sort': 'quantity', 'cursor': first.next_cursor})
+        page_queries = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT "Base_product"')]
+        self.assertTrue(page_queries)
+        self.assertFalse(any('OFFSET' in sql for sql in page_queries))
+        self.assertEqual([p.quantity for p in response.context['products']], list(range(10, 20)))
+
+    def test_unknown_sort_and_bad_cursor_fall_back(self):
+        self.client.login(username='pager_admin', password='pass12345')
+        response = self.client.get(reverse('category'), {'sort': 'description', 'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['sort_by'], '-created_at')
+        self.assertEqual(response.context['products'].number, 1)
+
+    def test_checkout_history_numbers_continue_across_pages(self):
+        for _ in range(12):
+            PCBuild.objects.create(user=self.admin, status='checked_out')
+        self.client.login(username='pager_admin', password='pass12345')
+
+        first = self.client.get(reverse('checkout-history')).context['builds']
+        second = self.client.get(reverse('checkout-history'), {'cursor': first.next_cursor}).context['builds']
+
+        self.assertEqual([build.display_number for build in first], list(range(12, 2, -1)))
+        self.assertEqual([build.display_number for build in second], [2, 1])
+
+
+class QueryPlanTests(TestCase):
+    """Run EXPLAIN QUERY PLAN over the hot views' queries and reject table scans and temp sorts."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='plan_admin', password='pass12345')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.staff = User.objects.create_user(username='plan_staff', password='pass12345')
+        product = Product.objects.create(name='Plan CPU', description='', price='100.00', quantity=5, category='cpu')
+        self.build = PCBuild.objects.create(user=self.staff, status='checked_out', total_price='100.00')
+        PCBuildItem.objects.create(build=self.build, product=product, quantity=1, price_at_time='100.00')
+
+    # Queries allowed to sort in a temp B-tree, with the reason beside each use.
+    EXEMPT_PLAN_MARKERS = (
+        'AS "product__name", COUNT("Base_pcbuilditem"."id") AS "count"',
+    )
+
+    def _bad_plans(self, queries):
+        problems = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'sqlite_master' in sql:
+                    continue
+                if any(marker in sql for marker in self.EXEMPT_PLAN_MARKERS):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    full_scan = detail.startswith('SCAN ') and 'INDEX' not in detail
+                    if full_scan or 'USE TEMP B-TREE' in detail:
+                        problems.append(f'{detail}\n    {sql}')
+        return problems
+
+    def assertIndexedPlans(self, url, params=None, username='plan_admin'):
+        self.client.login(username=username, password='pass12345')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._bad_plans(ctx.captured_queries), [])
+
+    def test_product_list_plans(self):
+        for sort in PRODUCT_SORT_KEYS:
+            for archive_status in ('', 'active', 'archived'):
+                with self.subTest(sort=sort, archive_status=archive_status):
+                    self.assertIndexedPlans(reverse('product'), {'sort': sort, 'archive_status': archive_status})
+        self.assertIndexedPlans(reverse('product'), {'category': 'cpu'})
+        self.assertIndexedPlans(reverse('product'), {'stock_status': 'low_stock'})
+
+    def test_category_list_plans(self):
+        for sort in PRODUCT_SORT_KEYS:
+            self.assertIndexedPlans(reverse('category'), {'sort': sort}, username='plan_staff')
+        self.assertIndexedPlans(reverse('category'), {'category': 'cpu'}, username='plan_staff')
+        self.assertIndexedPlans(reverse('category'), {'stock_status': 'low_stock'}, username='plan_staff')
+
+    def test_checkout_history_plans(self):
+        # Cold cache, so the header stats queries are checked too. The most
+        # popular item is the one exemption: a top-N over an arbitrary scope
+        # of lines needs a GROUP BY sort, and it is cached per sales version.
+        self.assertIndexedPlans(reverse('checkout-history'), {'view': 'active'})
+        self.assertIndexedPlans(reverse('checkout-history'), {'view': 'archived'})
+        self.assertIndexedPlans(reverse('checkout-history'), {'view': 'active'}, username='plan_staff')
+        self.assertIndexedPlans(reverse('checkout-history-detail', args=[self.build.id]))
+
+    def test_audit_log_filter_plan(self):
+        with CaptureQueriesContext(connection) as ctx:
+            list(AuditLog.objects.filter(action='login', status='failed').order_by('-created_at')[:50])
+        self.assertEqual(self._bad_plans(ctx.captured_queries), [])
+
+
+class ProductDedupKeyTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='dedup_admin', password='pass12345')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.product = Product.objects.create(
+            name='Noctua  NH-D15', description='Dual tower\ncooler', price='99.00', quantity=3, category='case',
+        )
+
+    def test_key_ignores_case_and_whitespace(self):
+        self.assertEqual(
+            self.product.dedup_key,
+            Product.build_dedup_key(' noctua nh-d15 ', 'DUAL  TOWER cooler', 'case'),
+        )
+        self.assertNotEqual(self.product.dedup_key, Product.build_dedup_key('Noctua NH-D15', 'Dual tower cooler', 'cpu'))
+
+    def test_add_product_rejects_duplicate_with_indexed_lookup(self):
+        self.client.login(username='dedup_admin', password='pass12345')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('add-product'), {
+                'name': 'noctua nh-d15', 'description': 'dual tower cooler', 'price': '99.00',
+                'quantity': '1', 'category': 'case',
+            })
+
+        self.assertIn('already exists', str(list(get_messages(response.wsgi_request))[0]))
+        self.assertEqual(Product.objects.count(), 1)
+        product_selects = [q['sql'] for q in ctx.captured_queries if 'FROM "Base_product"' in q['sql']]
+        self.assertEqual(len(product_selects), 1)
+        self.assertIn('"dedup_key" =', product_selects[0])
+
+    def test_clean_and_save_keep_key_in_step(self):
+        duplicate = Product(name='NOCTUA NH-D15', description='dual tower cooler', price='1.00', quantity=0, category='case')
+        with self.assertRaises(ValidationError):
+            duplicate.full_clean()
+
+        self.product.name = 'Noctua NH-D15 chromax'
+        self.product.save()
+        self.assertEqual(self.product.dedup_key, Product.build_dedup_key('Noctua NH-D15 chromax', 'Dual tower cooler', 'case'))
+
+    def test_legacy_duplicate_keeps_null_key_on_save(self):
+        legacy = Product.objects.create(name='Legacy', description='', price='5.00', quantity=1, category='ram')
+        Product.objects.filter(id=legacy.id).update(
+            name=self.product.name, description=self.product.description, category='case', dedup_key=None,
+        )
+        legacy.refresh_from_db()
+
+        legacy.save()
+        legacy.is_archived = True
+        legacy.save(update_fields=['is_archived'])
+
+        legacy.refresh_from_db()
+        self.assertIsNone(legacy.dedup_key)
+
+
+class ProductImportTests(TestCase):
+    CSV = (
+        "Name,Description,Category,Price,Quantity\n"
+        "Ryzen 5 7600,Six cores,cpu,199.99,4\n"
+        "Existing  Fan,,Case,12.00,9\n"
+        ",,cpu,10,1\n"
+        "Bad Price,,gpu,free,1\n"
+        "ryzen 5 7600,six cores,CPU,189.99,2\n"
+        "PSU 750W,,Power Supply,\"1,099.00\",0\n"
+    )
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='import_admin', password='pass12345')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.existing = Product.objects.create(name='Existing Fan', description='', price='10.00', quantity=3, category='case')
+
+    def _upload(self, **extra):
+        upload = SimpleUploadedFile('parts.csv', self.CSV.encode(), content_type='text/csv')
+        return self.client.post(reverse('import-products'), {'file': upload, **extra}, HTTP_ACCEPT='application/json')
+
+    def test_upload_reports_row_errors_and_skips_duplicates(self):
+        self.client.login(username='import_admin', password='pass12345')
+        report = self._upload().json()
+
+        self.assertEqual((report['created'], report['updated'], report['skipped']), (2, 0, 1))
+        self.assertEqual(
+            [(error['row'], error['error']) for error in report['errors']],
+            [
+                (4, 'Product name is required.'),
+                (5, 'Price must be a number.'),
+                (6, 'Duplicate of row 2 in this file.'),
+            ],
+        )
+        psu = Product.objects.get(name='PSU 750W')
+        self.assertEqual((psu.category, str(psu.price)), ('psu', '1099.00'))
+        self.assertEqual(psu.dedup_key, Product.build_dedup_key('PSU 750W', '', 'psu'))
+        self.assertTrue(StockMovement.objects.filter(product__name='Ryzen 5 7600', quantity_change=4).exists())
+
+    def test_update_existing_sets_price_and_quantity_with_ledger_rows(self):
+        self.client.login(username='import_admin', password='pass12345')
+        report = self._upload(update_existing='on').json()
+
+        self.assertEqual(report['updated'], 1)
+        self.existing.refresh_from_db()
+        self.assertEqual((str(self.existing.price), self.existing.quantity), ('12.00', 9))
+        self.assertTrue(StockMovement.objects.filter(product=self.existing, quantity_change=6, reason='restock').exists())
+
+    def test_command_batches_writes_and_supports_dry_run(self):
+        path = Path(self.enterContext(TemporaryDirectory())) / 'parts.csv'
+        path.write_text(self.CSV)
+
+        out = StringIO()
+        call_command('import_products', str(path), '--dry-run', stdout=out)
+        self.assertIn('Dry run: 2 added', out.getvalue())
+        self.assertEqual(Product.objects.count(), 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('import_products', str(path), '--chunk-size', '3', stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 3)
+        inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "Base_product"')]
+        self.assertEqual(len(inserts), 2)
+
+    def test_non_finite_and_out_of_range_numbers_are_row_errors(self):
+        self.client.login(username='import_admin', password='pass12345')
+        csv_text = (
+            "name,category,price,quantity\n"
+            "NaN Price,cpu,NaN,1\n"
+            "Infinite Price,cpu,-Infinity,1\n"
+            "Huge Price,cpu,1e99999999,1\n"
+            "Infinite Stock,cpu,10,Infinity\n"
+            "Huge Stock,cpu,10,1e400\n"
+            "Slow Stock,cpu,10,1e99999999\n"
+            "Tiny Stock,cpu,10,1e-99999999\n"
+            "Fine Part,cpu,10,2\n"
+        )
+        upload = SimpleUploadedFile('parts.csv', csv_text.encode(), content_type='text/csv')
+        report = self.client.post(reverse('import-products'), {'file': upload}, HTTP_ACCEPT='application/json').json()
+
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(
+            [(error['row'], error['error']) for error in report['errors']],
+            [
+                (2, 'Price must be a number.'),
+                (3, 'Price must be a number.'),
+                (4, 'Price is too large.'),
+                (5, 'Quantity must be a whole number.'),
+                (6, 'Quantity is too large.'),
+                (7, 'Quantity is too large.'),
+                (8, 'Quantity must be a whole number of 0 or more.'),
+            ],
+        )
+
+    def test_missing_columns_rejected(self):
+        self.client.login(username='import_admin', password='pass12345')
+        upload = SimpleUploadedFile('parts.csv', b"title,cost\nx,1\n", content_type='text/csv')
+        response = self.client.post(reverse('import-products'), {'file': upload}, HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('name, category, price', response.json()['error'])
+
+
+class BulkProductUpdateTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='bulk_price_admin', password='pass12345')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.gpu = Product.objects.create(name='Bulk GPU', description='', price='500.00', quantity=4, category='gpu')
+        self.ssd = Product.objects.create(name='Bulk SSD', description='', price='80.00', quantity=10, category='storage')
+        self.client.login(username='bulk_price_admin', password='pass12345')
+
+    def _post_json(self, updates):
+        return self.client.post(
+            reverse('bulk-update-products'), json.dumps({'updates': updates}), content_type='application/json',
+        )
+
+    def test_json_updates_apply_in_one_statement_with_ledger_rows(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._post_json([
+                {'id': self.gpu.id, 'price': '449.99', 'quantity_delta': 3},
+                {'id': self.ssd.id, 'price_delta': '-5', 'quantity': 6},
+            ])
+
+        self.assertEqual(response.json(), {'ok': True, 'updated': 2})
+        self.gpu.refresh_from_db()
+        self.ssd.refresh_from_db()
+        self.assertEqual((str(self.gpu.price), self.gpu.quantity), ('449.99', 7))
+        self.assertEqual((str(self.ssd.price), self.ssd.quantity), ('75.00', 6))
+        self.assertEqual(
+            sorted(StockMovement.objects.values_list('product_id', 'quantity_change', 'reason')),
+            sorted([(self.gpu.id, 3, 'restock'), (self.ssd.id, -4, 'adjustment')]),
+        )
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "Base_product"')]
+        self.assertEqual(len(updates), 1)
+
+    def test_any_invalid_entry_rejects_the_whole_batch(self):
+        response = self._post_json([
+            {'id': self.gpu.id, 'price': '10.00'},
+            {'id': self.ssd.id, 'quantity_delta': -11},
+            {'id': 999999, 'price': '1.00'},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['id'] for error in response.json()['errors']], [self.ssd.id, 999999])
+        self.gpu.refresh_from_db()
+        self.assertEqual(str(self.gpu.price), '500.00')
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_non_finite_and_overflowing_prices_are_entry_errors(self):
+        response = self._post_json([
+            {'id': self.gpu.id, 'price': 'NaN'},
+            {'id': self.ssd.id, 'price_delta': 'Infinity'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(error['id'], error['error']) for error in response.json()['errors']],
+            [(self.gpu.id, "Price values must be finite numbers."), (self.ssd.id, "Price values must be finite numbers.")],
+        )
+
+        response = self._post_json([{'id': self.gpu.id, 'price': 1e30}, {'id': self.ssd.id, 'price_delta': '-1e99999999'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(error['id'], error['error']) for error in response.json()['errors']],
+            [(self.gpu.id, "Price value is too large."), (self.ssd.id, "Price value is too large.")],
+        )
+        response = self._post_json([{'id': self.gpu.id, 'quantity_delta': 10 ** 30}])
+        self.assertEqual(response.json()['errors'], [{'id': self.gpu.id, 'error': "Quantity value is too large."}])
+        self.gpu.refresh_from_db()
+        self.assertEqual((str(self.gpu.price), self.gpu.quantity), ('500.00', 4))
+
+    def test_form_applies_same_change_to_selected_products(self):
+        response = self.client.post(reverse('bulk-update-products'), {
+            'selected_product_ids': [self.gpu.id, self.ssd.id],
+            'price_mode': 'delta',
+            'bulk_price': '10',
+            'quantity_mode': 'set',
+            'bulk_quantity': '',
+            'next_querystring': 'sort=price',
+        })
+
+        self.assertRedirects(response, '/product/?sort=price', fetch_redirect_response=False)
+        self.assertEqual(
+            sorted(str(price) for price in Product.objects.values_list('price', flat=True)),
+            ['510.00', '90.00'],
+        )
+
+
+class CatalogSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='catalog_admin', password='pass12345')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.psu = Product.objects.create(name='Snapshot PSU', description='', price='120.00', quantity=5, category='psu')
+        self.client.login(username='catalog_admin', password='pass12345')
+
+    def _catalog_queries(self, ctx):
+        return [q['sql'] for q in ctx.captured_queries if 'FROM "Base_product"' in q['sql']]
+
+    def test_pc_builder_renders_from_cached_snapshot(self):
+        self.client.get(reverse('pc-builder'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('pc-builder'))
+
+        self.assertContains(response, 'Snapshot PSU')
+        self.assertEqual(self._catalog_queries(ctx), [])
+
+    def test_snapshot_refreshes_after_save_archive_and_checkout(self):
+        self.client.get(reverse('pc-builder'))
+
+        self.psu.name = 'Renamed PSU'
+        self.psu.save()
+        self.assertContains(self.client.get(reverse('pc-builder')), 'Renamed PSU')
+
+        self.client.post(reverse('checkout_pc_build'), {
+            'build_items': json.dumps([{'product_id': self.psu.id, 'quantity': 2}]),
+        })
+        self.assertContains(self.client.get(reverse('pc-builder')), 'data-stock="3"')
+
+        self.client.post(reverse('archive-product', args=[self.psu.id]))
+        self.assertNotContains(self.client.get(reverse('pc-builder')), 'Renamed PSU')
+
+    def test_holds_are_overlaid_per_request(self):
+        other = User.objects.create_user(username='catalog_other', password='pass12345')
+        build = PCBuild.objects.create(user=other, status='draft')
+        self.client.get(reverse('pc-builder'))
+        StockReservation.objects.create(
+            build=build, product=self.psu, quantity=4, expires_at=timezone.now() + timedelta(minutes=5),
+        )
+
+        self.assertContains(self.client.get(reverse('pc-builder')), 'data-stock="1"')
+
+
+    def test_deploy_check_warns_about_per_process_cache(self):
+        self.assertEqual([warning.id for warning in shared_cache_check(None)], ['Base.W001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(shared_cache_check(None), [])
+
+
+class PartSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='part_searcher', password='pass12345')
+        self.ryzen = Product.objects.create(name='Ryzen 7 7700X', description='8 cores', price='350.00', quantity=4, category='cpu')
+        self.intel = Product.objects.create(name='Core i5 13600K', description='14 cores', price='300.00', quantity=0, category='cpu')
+        Product.objects.create(name='Ryzen Cooler Case', description='', price='90.00', quantity=2, category='case')
+        Product.objects.create(name='Ryzen 5 Old', description='', price='150.00', quantity=3, category='cpu', is_archived=True)
+        self.client.login(username='part_searcher', password='pass12345')
+
+    def _search(self, **params):
+        response = self.client.get(reverse('part-search-api'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_prefix_search_with_category_and_compact_fields(self):
+        results = self._search(q='ryz 77', category='cpu')
+
+        self.assertEqual(results, [{
+            'id': self.ryzen.id, 'name': 'Ryzen 7 7700X', 'price': '350.00', 'available_quantity': 4,
+        }])
+        compact = self._search(q='ryzen', fields='id,category')
+        self.assertCountEqual(compact, [
+            {'id': self.ryzen.id, 'category': 'cpu'},
+            {'id': Product.objects.get(name='Ryzen Cooler Case').id, 'category': 'case'},
+        ])
+
+    def test_in_stock_filter_counts_other_drafts_holds(self):
+        other = User.objects.create_user(username='other_drafter', password='pass12345')
+        draft = PCBuild.objects.create(user=other, status='draft')
+        StockReservation.objects.create(
+            build=draft, product=self.ryzen, quantity=4, expires_at=timezone.now() + timedelta(minutes=5),
+        )
+
+        self.assertEqual([row['name'] for row in self._search(category='cpu')], ['Core i5 13600K', 'Ryzen 7 7700X'])
+        self.assertEqual(self._search(category='cpu', in_stock='1'), [])
+
+    def test_limit_and_invalid_params(self):
+        self.assertEqual(len(self._search(limit=1)), 1)
+        for params in ({'category': 'toaster'}, {'fields': 'id,quantity'}, {'limit': 'many'}):
+            self.assertEqual(self.client.get(reverse('part-search-api'), params).status_code, 400)
+
+    @override_settings(PC_BUILDER_INLINE_OPTION_LIMIT=1)
+    def test_large_categories_are_searched_on_demand(self):
+        response = self.client.get(reverse('pc-builder'))
+
+        self.assertContains(response, 'data-type="cpu" data-searchable="1"')
+        self.assertNotContains(response, 'Ryzen 7 7700X')
+        self.assertContains(response, 'Ryzen Cooler Case')
+
+
+class FacetCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(username='facet_staff', password='pass12345')
+        Product.objects.create(name='Facet CPU', description='', price='900.00', quantity=3, category='cpu')
+        Product.objects.create(name='Facet CPU Pro', description='', price='3000.00', quantity=0, category='cpu')
+        Product.objects.create(name='Facet GPU', description='', price='1200.00', quantity=10, category='gpu')
+        Product.objects.create(name='Old GPU', description='', price='500.00', quantity=2, category='gpu', is_archived=True)
+        self.client.login(username='facet_staff', password='pass12345')
+
+    def _facets(self, url_name='category', **params):
+        return self.client.get(reverse(url_name), params).context['facets']
+
+    def test_counts_each_facet_against_the_other_filters(self):
+        facets = self._facets(category='cpu', stock_status='in_stock')
+
+        # Category counts ignore the category filter but honor the stock filter.
+        self.assertEqual(facets['category']['cpu'], 1)
+        self.assertEqual(facets['category']['gpu'], 1)
+        # Stock counts ignore the stock filter but honor the category filter.
+        self.assertEqual(facets['stock_status'], {'in_stock': 1, 'low_stock': 1, 'out_of_stock': 1})
+        self.assertEqual([bin['count'] for bin in facets['price'][:3]], [1, 0, 0])
+        self.assertEqual(facets['total'], 1)
+
+    def test_facets_and_total_come_from_one_cached_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('category'), {'search': 'facet'})
+        product_queries = [q['sql'] for q in ctx.captured_queries if 'FROM "Base_product"' in q['sql']]
+        # One aggregate for facets and total, one for the page of rows.
+        self.assertEqual(len(product_queries), 2)
+        self.assertEqual(response.context['products'].paginator.count, 3)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('category'), {'search': ' FACET '})
+        self.assertEqual(len([q for q in ctx.captured_queries if 'COUNT(' in q['sql']]), 0)
+
+    def test_catalog_writes_refresh_cached_facets(self):
+        self.assertEqual(self._facets()['category']['gpu'], 1)
+        Product.objects.create(name='New GPU', description='', price='700.00', quantity=1, category='gpu')
+        self.assertEqual(self._facets()['category']['gpu'], 2)
+
+    def test_product_page_counts_archive_status(self):
+        admin = User.objects.create_user(username='facet_admin', password='pass12345')
+        admin.profile.role = 'admin'
+        admin.profile.save()
+        self.client.login(username='facet_admin', password='pass12345')
+
+        facets = self._facets('product', archive_status='archived')
+
+        self.assertEqual(facets['archive_status'], {'active': 3, 'archived': 1})
+        self.assertEqual(facets['category']['gpu'], 1)
+        self.assertEqual(facets['total'], 1)
+
+
+class PriceHistoryTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='price_admin', password='pass12345')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.cpu = Product.objects.create(name='History CPU', description='', price='300.00', quantity=5, category='cpu')
+        self.client.login(username='price_admin', password='pass12345')
+
+    def _prices(self, product):
+        return [str(price) for price in product.price_history.values_list('price', flat=True)]
+
+    def test_every_price_write_path_appends_history(self):
+        edit = {'name': 'History CPU', 'description': '', 'quantity': '5', 'category': 'cpu'}
+        self.client.post(reverse('edit-product', args=[self.cpu.id]), {**edit, 'price': '300.00'})
+        self.client.post(reverse('edit-product', args=[self.cpu.id]), {**edit, 'price': '280.00'})
+        self.client.post(
+            reverse('bulk-update-products'),
+            json.dumps({'updates': [{'id': self.cpu.id, 'price_delta': '-30'}]}),
+            content_type='application/json',
+        )
+        import_products(
+            [(2, {'name': 'History CPU', 'description': '', 'category': 'cpu', 'price': '260', 'quantity': '5'}),
+             (3, {'name': 'History GPU', 'description': '', 'category': 'gpu', 'price': '900', 'quantity': '1'})],
+            update_existing=True,
+        )
+
+        self.assertEqual(self._prices(self.cpu), ['300.00', '280.00', '250.00', '260.00'])
+        self.assertEqual(self._prices(Product.objects.get(name='History GPU')), ['900.00'])
+
+        self.cpu.refresh_from_db()
+        self.cpu.quantity = 9
+        self.cpu.save()
+        self.assertEqual(self.cpu.price_history.count(), 4)
+
+    def test_price_at_and_series_use_one_query_per_batch(self):
+        gpu = Product.objects.create(name='History GPU', description='', price='800.00', quantity=1, category='gpu')
+        start = timezone.now() - timedelta(days=30)
+        ProductPriceHistory.objects.all().delete()
+        ProductPriceHistory.objects.bulk_create([
+            ProductPriceHistory(product=self.cpu, price='320.00', effective_from=start),
+            ProductPriceHistory(product=self.cpu, price='300.00', effective_from=start + timedelta(days=10)),
+            ProductPriceHistory(product=gpu, price='800.00', effective_from=start + timedelta(days=20)),
+        ])
+
+        with self.assertNumQueries(1):
+            prices = price_at([self.cpu.id, gpu.id], start + timedelta(days=15))
+        self.assertEqual(prices, {self.cpu.id: Decimal('300.00')})
+        self.assertEqual(price_at([self.cpu.id], start - timedelta(days=1)), {})
+
+        since = start + timedelta(days=5)
+        with self.assertNumQueries(2):
+            series = price_series([self.cpu.id, gpu.id], since)
+        self.assertEqual(series[self.cpu.id], [(since, Decimal('320.00')), (start + timedelta(days=10), Decimal('300.00'))])
+        self.assertEqual(series[gpu.id], [(start + timedelta(days=20), Decimal('800.00'))])
+
+    def test_prices_api(self):
+        at = timezone.now().isoformat()
+        response = self.client.get(reverse('product-prices-api'), {'ids': str(self.cpu.id), 'at': at})
+        self.assertEqual(response.json()['prices'], {str(self.cpu.id): '300.00'})
+
+        response = self.client.get(reverse('product-prices-api'), {'ids': str(self.cpu.id), 'since': '2000-01-01'})
+        self.assertEqual([point['price'] for point in response.json()['series'][str(self.cpu.id)]], ['300.00'])
+
+        for params in ({'ids': ''}, {'ids': 'x'}, {'ids': '1', 'at': 'yesterday'}):
+            self.assertEqual(self.client.get(reverse('product-prices-api'), params).status_code, 400)
+
+
+@override_settings(REORDER_LEAD_TIME_DAYS=7, REORDER_SAFETY_STOCK_DAYS=7, REORDER_TARGET_COVER_DAYS=30)
+class ReorderPointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='reorder_admin', password='pass12345')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.fast = Product.objects.create(name='Fast SSD', description='', price='80.00', quantity=20, category='storage')
+        self.slow = Product.objects.create(name='Slow Case', description='', price='60.00', quantity=3, category='case')
+        self.idle = Product.objects.create(name='Idle PSU', description='', price='90.00', quantity=2, category='psu')
+
+    def _sell(self, product, quantity, days_ago):
+        build = PCBuild.objects.create(user=self.admin, status='checked_out')
+        PCBuild.objects.filter(id=build.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+        PCBuildItem.objects.create(build=build, product=product, quantity=quantity, price_at_time=product.price)
+
+    def test_refresh_computes_velocity_cover_and_suggestion_in_one_pass(self):
+        self._sell(self.fast, 14, days_ago=1)
+        self._sell(self.fast, 16, days_ago=20)
+        self._sell(self.slow, 9, days_ago=60)
+        self._sell(self.fast, 5, days_ago=200)
+
+        with self.assertNumQueries(1):
+            sales = windowed_sales()
+        self.assertEqual(sales[self.fast.id], {7: 14, 30: 30, 90: 30})
+
+        written, needing = refresh_reorder_points()
+        self.assertEqual((written, needing), (3, 1))
+
+        fast = ProductReorderPoint.objects.get(product=self.fast)
+        # 0.5 * 14/7 + 0.3 * 30/30 + 0.2 * 30/90 = 1.367 units a day.
+        self.assertEqual(fast.daily_velocity, Decimal('1.367'))
+        self.assertEqual(fast.days_of_cover, Decimal('14.6'))
+        self.assertEqual(fast.reorder_point, 20)
+        self.assertTrue(fast.needs_reorder)
+        self.assertEqual(fast.suggested_quantity, 51 - 20)
+
+        slow = ProductReorderPoint.objects.get(product=self.slow)
+        self.assertEqual((slow.reorder_point, slow.needs_reorder, slow.suggested_quantity), (1, False, 0))
+        self.assertIsNone(ProductReorderPoint.objects.get(product=self.idle).days_of_cover)
+
+    def test_low_stock_filter_uses_reorder_points_with_threshold_fallback(self):
+        self._sell(self.fast, 21, days_ago=1)
+        refresh_reorder_points()
+        Product.objects.create(name='New Fan', description='', price='10.00', quantity=4, category='case')
+        self.client.login(username='reorder_admin', password='pass12345')
+
+        response = self.client.get(reverse('category'), {'stock_status': 'low_stock'})
+
+        # Slow Case and Idle PSU have rows but no sales, so the fixed threshold still applies.
+        self.assertEqual(
+            {product.name for product in response.context['products']},
+            {'Fast SSD', 'New Fan', 'Slow Case', 'Idle PSU'},
+        )
+        self.assertEqual(response.context['facets']['stock_status']['low_stock'], 4)
+
+    def test_refresh_invalidates_cached_facet_counts(self):
+        self.client.login(username='reorder_admin', password='pass12345')
+        before = self.client.get(reverse('category'), {'stock_status': 'low_stock'})
+        self.assertEqual(
+            (before.context['facets']['category']['storage'], before.context['facets']['category']['case']), (0, 1),
+        )
+
+        self._sell(self.fast, 21, days_ago=1)
+        self._sell(self.slow, 30, days_ago=1)
+        Product.objects.filter(id=self.slow.id).update(quantity=60)
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_reorder_points()
+
+        after = self.client.get(reverse('category'), {'stock_status': 'low_stock'})
+        self.assertEqual(
+            (after.context['facets']['category']['storage'], after.context['facets']['category']['case']), (1, 0),
+        )
+        self.assertEqual({product.name for product in after.context['products']}, {'Fast SSD', 'Idle PSU'})
+
+    def test_products_without_sales_keep_the_threshold_after_refresh(self):
+        Product.objects.filter(id=self.idle.id).update(quantity=1)
+        low_stock = Product.objects.filter(LOW_STOCK_FILTER)
+        self.assertIn(self.idle, low_stock)
+
+        refresh_reorder_points()
+
+        self.assertEqual(ProductReorderPoint.objects.get(product=self.idle).reorder_point, 0)
+        self.assertIn(self.idle, low_stock.all())
+
+    def test_command_and_reorder_api(self):
+        self._sell(self.fast, 21, days_ago=1)
+        out = StringIO()
+        call_command('refresh_reorder_points', stdout=out)
+        self.assertIn('Refreshed 3 reorder point(s); 1 product(s) need reordering.', out.getvalue())
+
+        self.fast.is_archived = True
+        self.fast.save()
+        call_command('refresh_reorder_points', stdout=StringIO())
+        self.assertFalse(ProductReorderPoint.objects.filter(product=self.fast).exists())
+
+        self.fast.is_archived = False
+        self.fast.save()
+        call_command('refresh_reorder_points', stdout=StringIO())
+        self.client.login(username='reorder_admin', password='pass12345')
+        results = self.client.get(reverse('reorder-report-api')).json()['results']
+        self.assertEqual([(row['name'], row['suggested_quantity']) for row in results], [('Fast SSD', 46)])
+
+
+class BulkBuildActionTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='bulk_build_admin', password='pass12345')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.staff = User.objects.create_user(username='bulk_build_staff', password='pass12345')
+        self.product = Product.objects.create(name='Bulk RAM', description='', price='50.00', quantity=100, category='ram')
+        self.client.login(username='bulk_build_admin', password='pass12345')
+
+    def _checkout(self, count, archived):
+        ids = []
+        for _ in range(count):
+            build = PCBuild.objects.create(user=self.staff, total_price='50.00', status='checked_out', is_archived=archived)
+            PCBuildItem.objects.create(build=build, product=self.product, quantity=1, price_at_time='50.00')
+            ids.append(str(build.id))
+        rebuild_sales_rollup()
+        rebuild_product_sales_counters()
+        return ids
+
+    def _post(self, action, ids):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse('bulk-manage-builds'), {
+                'bulk_action': action,
+                'next_view': 'archived',
+                'selected_build_ids': ids,
+                'confirm_delete': 'DELETE',
+            })
+        return len(ctx.captured_queries)
+
+    def test_archive_and_restore_are_single_updates(self):
+        ids = self._checkout(3, archived=False)
+        self.assertEqual(self._post('archive', ids), self._post('archive', ids[:1]))
+        self.assertEqual(PCBuild.objects.filter(is_archived=True).count(), 3)
+        self._post('restore', ids[:2])
+        self.assertEqual(PCBuild.objects.filter(is_archived=True).count(), 1)
+
+    def test_bulk_delete_runs_in_constant_queries_with_audit_rows(self):
+        few = self._post('delete', self._checkout(2, archived=True))
+        many_ids = self._checkout(8, archived=True)
+        many = self._post('delete', many_ids)
+
+        self.assertEqual(few, many)
+        self.assertFalse(PCBuild.objects.exists())
+        self.assertFalse(PCBuildItem.objects.exists())
+        self.assertEqual(ProductSalesCounter.objects.get(product=self.product).units_sold, 0)
+        logs = AuditLog.objects.filter(action='delete_build')
+        self.assertEqual(logs.count(), 10)
+        self.assertEqual(
+            logs.get(identifier=many_ids[0]).metadata,
+            {'target_user': 'bulk_build_staff', 'total_price': '50.00', 'bulk': True},
+        )
+
+    def test_bulk_delete_skips_active_builds(self):
+        active = self._checkout(1, archived=False)
+        archived = self._checkout(1, archived=True)
+
+        self._post('delete', active + archived)
+
+        self.assertEqual(list(PCBuild.objects.values_list('id', flat=True)), [int(active[0])])
+
+
+class BulkProductActionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='bulk_product_admin', password='pass12345')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.client.login(username='bulk_product_admin', password='pass12345')
+
+    def _products(self, count, prefix):
+        return [
+            Product.objects.create(name=f'{prefix} {index}', description='', price='10.00', quantity=1, category='case')
+            for index in range(count)
+        ]
+
+    def _post(self, action, products):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('bulk-manage-products'), {
+                'bulk_action': action,
+                'selected_product_ids': [str(product.id) for product in products],
+                'confirm_delete': 'DELETE',
+                'next_querystring': '',
+            })
+        return response, len(ctx.captured_queries)
+
+    def test_archive_refreshes_catalog_snapshot(self):
+        products = self._products(3, 'Snapshot Case')
+        catalog_snapshot()
+
+        self._post('archive', products)
+
+        self.assertEqual(catalog_snapshot()['case'], [])
+        self.assertEqual(Product.objects.filter(is_archived=True).count(), 3)
+        self._post('restore', products[:1])
+        self.assertEqual([part['name'] for part in catalog_snapshot()['case']], ['Snapshot Case 0'])
+
+    def test_delete_partitions_protected_products_in_constant_queries(self):
+        def protect(product):
+            StockMovement.objects.create(product=product, quantity_change=1, reason='restock')
+
+        few = self._products(2, 'Few Case')
+        protect(few[0])
+        _, few_queries = self._post('delete', few)
+
+        many = self._products(8, 'Many Case')
+        for product in many[:3]:
+            protect(product)
+        build = PCBuild.objects.create(user=self.admin, status='checked_out')
+        PCBuildItem.objects.create(build=build, product=many[3], quantity=1, price_at_time='10.00')
+        response, many_queries = self._post('delete', many)
+
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(
+            sorted(Product.objects.values_list('name', flat=True)),
+            ['Few Case 0', 'Many Case 0', 'Many Case 1', 'Many Case 2', 'Many Case 3'],
+        )
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)][-2:],
+            [
+                "4 product(s) deleted permanently.",
+                "4 product(s) could not be deleted because they have related checkout/stock records.",
+            ],
+        )
+
+    def test_product_with_initial_stock_is_kept_by_delete(self):
+        self.client.post(reverse('add-product'), {
+            'name': 'Stocked Case', 'description': '', 'category': 'case', 'price': '45.00', 'quantity': '3',
+        })
+        product = Product.objects.get(name='Stocked Case')
+
+        response = self.client.post(reverse('delete-product', args=[product.id]))
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)][-1],
+            "Cannot delete 'Stocked Case' because stock movement logs exist for this product. "
+            "Archive it to hide it from the catalog.",
+        )
+        response, _ = self._post('delete', [product])
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)][-1],
+            "1 product(s) could not be deleted because they have related checkout/stock records.",
+        )
+
+        product.refresh_from_db()
+        self.assertFalse(product.is_archived)
+        self.assertEqual(StockMovement.objects.filter(product=product).count(), 1)
+
+
+FLAKY_JOB_CALLS = []
+
+
+@job_handler('test_flaky')
+def _flaky_job(fail_times):
+    FLAKY_JOB_CALLS.append(fail_times)
+    if len(FLAKY_JOB_CALLS) <= fail_times:
+        raise RuntimeError("temporary failure")
+
+
+@override_settings(JOB_RETRY_BASE_SECONDS=30, JOB_VISIBILITY_TIMEOUT_SECONDS=60)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        FLAKY_JOB_CALLS.clear()
+
+    def _make_due(self):
+        Job.objects.update(run_at=timezone.now() - timedelta(seconds=1))
+
+    def test_password_reset_email_is_sent_by_the_worker(self):
+        User.objects.create_user(username='reset_user', email='reset@example.com', password='pass12345')
+
+        response = self.client.post(reverse('forgot_password'), {'email': 'reset@example.com'})
+
+        self.assertRedirects(response, reverse('forgot_password_done'))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(AuditLog.objects.filter(action='forgot_password', identifier='reset@example.com').exists())
+        job = Job.objects.get()
+        self.assertEqual((job.name, job.queue, job.status), ('send_email', 'email', 'queued'))
+
+        self.assertEqual(run_worker(once=True), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reset@example.com'])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.payload), ('succeeded', {}))
+
+    def test_failures_retry_with_backoff_until_attempts_run_out(self):
+        job = enqueue('test_flaky', {'fail_times': 5}, max_attempts=3)
+
+        self.assertEqual(run_worker(once=True), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('temporary failure', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=25))
+        # Not due yet, so nothing runs.
+        self.assertEqual(run_worker(once=True), 0)
+
+        self._make_due()
+        run_worker(once=True)
+        job.refresh_from_db()
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=55))
+
+        self._make_due()
+        run_worker(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, len(FLAKY_JOB_CALLS)), ('failed', 3, 3))
+
+    def test_expired_claims_are_picked_up_by_another_worker(self):
+        job = enqueue('test_flaky', {'fail_times': 0})
+        [first] = claim_jobs('worker-a')
+        self.assertEqual(claim_jobs('worker-b'), [])
+
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        [second] = claim_jobs('worker-b')
+        self.assertEqual((second.id, second.attempts), (job.id, 2))
+
+        # The first worker lost its claim, so its late result is ignored.
+        self.assertTrue(run_job(first))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), ('running', second.locked_by))
+        run_job(second)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+
+    def test_unknown_jobs_are_rejected_and_command_drains_queue(self):
+        with self.assertRaises(ValueError):
+            enqueue('no_such_job')
+        enqueue('test_flaky', {'fail_times': 0})
+        enqueue('test_flaky', {'fail_times': 0}, queue='other')
+
+        out = StringIO()
+        call_command('run_worker', '--once', '--queue', 'default', stdout=out)
+
+        self.assertIn('Ran 1 job(s).', out.getvalue())
+        self.assertEqual(Job.objects.get(queue='other').status, 'queued')
+
+    def test_expired_claims_on_the_last_attempt_fail_instead_of_retrying(self):
+        job = enqueue('test_flaky', {'fail_times': 0}, max_attempts=2)
+        claim_jobs('worker-a')
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        claim_jobs('worker-b')
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(claim_jobs('worker-c'), [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIn('Visibility timeout', job.last_error)
+
+    def test_retry_now_skips_finished_jobs_with_scrubbed_payloads(self):
+        admin_user = User.objects.create_superuser(username='job_admin', password='pass12345')
+        self.client.force_login(admin_user)
+        email = enqueue('send_email', {'subject': 'Hi', 'body': 'Link', 'to': ['a@example.com']}, max_attempts=1)
+        flaky = enqueue('test_flaky', {'fail_times': 5}, max_attempts=1)
+        with mock.patch('Base.jobs.EmailMultiAlternatives.send', side_effect=OSError('SMTP down')):
+            run_worker(once=True)
+        self.assertEqual(list(Job.objects.values_list('status', flat=True).distinct()), ['failed'])
+
+        response = self.client.post(
+            reverse('admin:Base_job_changelist'),
+            {'action': 'retry_now', '_selected_action': [email.id, flaky.id]},
+            follow=True,
+        )
+
+        self.assertContains(response, '1 job(s) queued. 1 job(s) skipped')
+        email.refresh_from_db()
+        flaky.refresh_from_db()
+        self.assertEqual((email.status, email.payload), ('failed', {}))
+        self.assertEqual((flaky.status, flaky.attempts), ('queued', 0))
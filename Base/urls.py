@@ -11,6 +11,8 @@ urlpatterns = [
     path('delete_product/<int:product_id>/', views.delete_product, name='delete-product'),
     path('archive_product/<int:product_id>/', views.archive_product, name='archive-product'),
     path('restore_product/<int:product_id>/', views.restore_product, name='restore-product'),
+    path('product/import/', views.import_products_upload, name='import-products'),
+    path('product/bulk-update/', views.bulk_update_products, name='bulk-update-products'),
     path('product/bulk-action/', views.bulk_manage_products, name='bulk-manage-products'),
     path('pc_builder/', views.pc_builder, name='pc-builder'),
 
@@ -49,7 +51,9 @@ urlpatterns = [
     # PROFILE SETTINGS
     path('profile/settings/', views.profile_settings, name='profile-settings'),
 
+    path('pc-builder/reserve/', views.reserve_build_part, name='reserve-build-part'),
     path('pc-builder/checkout/', views.checkout_pc_build, name='checkout_pc_build'),
+    path('pc-builder/checkout/api/', views.checkout_pc_build_api, name='checkout-pc-build-api'),
     path('pc-builder/history/', views.checkout_history, name='checkout-history'),
     path('pc-builder/history/bulk-action/', views.bulk_manage_builds, name='bulk-manage-builds'),
     path('pc-builder/history/<int:build_id>/', views.checkout_history_detail, name='checkout-history-detail'),
@@ -57,4 +61,10 @@ urlpatterns = [
     path('pc-builder/history/<int:build_id>/restore/', views.restore_build, name='restore-build'),
     path('pc-builder/history/<int:build_id>/delete/', views.delete_build, name='delete-build'),
     path('pc-builder/reorder/<int:build_id>/', views.reorder_build, name='reorder-build'),
+    path('export/<slug:dataset>/', views.export_data, name='export-data'),
+    path('api/sales/report/', views.sales_report_api, name='sales-report-api'),
+    path('api/products/top/', views.top_products_api, name='top-products-api'),
+    path('api/products/prices/', views.product_prices_api, name='product-prices-api'),
+    path('api/products/reorder/', views.reorder_report_api, name='reorder-report-api'),
+    path('api/parts/search/', views.part_search_api, name='part-search-api'),
 ]
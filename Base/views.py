@@ -1,6 +1,7 @@
 # Base/views.py
 import json
-from datetime import timedelta
+import uuid
+from datetime import datetime, time, timedelta
 from decimal import Decimal, InvalidOperation
 from functools import wraps
 from django.conf import settings
@@ -15,32 +16,72 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.contrib.auth.views import PasswordResetView
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.http import HttpResponseForbidden
+from django.http import Http404, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.middleware.csrf import get_token
 from django.urls import reverse_lazy
 from .models import Profile
 from .forms import SignUpForm
 from django.contrib.auth import login
-from .models import AuditLog, PCBuild, PCBuildItem, StockMovement
-from django.db import transaction
+from .models import (
+    AuditLog,
+    CheckoutIdempotencyKey,
+    PCBuild,
+    PCBuildItem,
+    ProductSalesCounter,
+    StockMovement,
+)
+from . import analytics
+from .catalog import catalog_changed, catalog_with_availability
+from .imports import ImportFileError, import_products, iter_rows
+from .facets import ProductFilters, facet_counts
+from .exports import CONTENT_TYPES, EXPORT_FORMATS, EXPORTS, export_lines
+from .pagination import CursorPaginator
+from .pricing import price_at, price_series, record_price_changes
+from .reorder import reorder_list
+from .search import PART_SEARCH_FIELDS, PART_SEARCH_DEFAULT_FIELDS, search_parts, search_products
+from .sales import (
+    LEADERBOARD_METRICS,
+    checkout_history_stats,
+    monthly_sales,
+    record_checkout_sales,
+    reverse_build_sales,
+    sales_data_changed,
+    top_products,
+)
+from .stock import (
+    MAX_QUANTITY,
+    InsufficientStock,
+    decrement_stock,
+    hold_stock,
+    record_stock_movements,
+)
+from django.db import IntegrityError, transaction
 from django.db.models.deletion import ProtectedError
-from django.db.models import Count, Exists, OuterRef, Sum
-from django.db.models.functions import TruncMonth
+from django.db.models import Case, DecimalField, Exists, F, IntegerField, OuterRef, Q, Value, When
 from django.shortcuts import redirect, get_object_or_404
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 # new imports
-from .forms import UserUpdateForm, ProfileUpdateForm
-
-def _normalized_text(value):
-    return " ".join((value or '').split()).casefold()
+from .forms import QueuedPasswordResetForm, UserUpdateForm, ProfileUpdateForm
 
 def _querystring_without_page(request):
     params = request.GET.copy()
     params.pop('page', None)
+    params.pop('cursor', None)
     return params.urlencode()
 
+
+# Sort options the product lists accept; anything else falls back to newest first.
+PRODUCT_SORT_KEYS = ('-created_at', 'created_at', 'name', '-name', '-price', 'price', '-quantity', 'quantity')
+
+
+def _product_sort(request, search_query):
+    sort_by = request.GET.get('sort', 'relevance' if search_query else '-created_at')
+    if sort_by == 'relevance' and search_query:
+        return sort_by
+    return sort_by if sort_by in PRODUCT_SORT_KEYS else '-created_at'
+
 def _is_admin(user):
     profile = getattr(user, 'profile', None)
     return bool(user.is_authenticated and profile and profile.role == 'admin')
@@ -69,8 +110,9 @@ def _consume_rate_limit(scope, key, limit, window_seconds):
 def _clear_rate_limit(scope, key):
     cache.delete(f"rate_limit:{scope}:{key}")
 
-def _create_audit_log(request, action, status, user=None, identifier='', metadata=None):
-    AuditLog.objects.create(
+def _audit_log(request, action, status, user=None, identifier='', metadata=None):
+    """An unsaved AuditLog for the request; bulk actions collect these for one bulk_create()."""
+    return AuditLog(
         user=user,
         action=action,
         status=status,
@@ -80,6 +122,10 @@ def _create_audit_log(request, action, status, user=None, identifier='', metadat
     )
 
 
+def _create_audit_log(request, action, status, user=None, identifier='', metadata=None):
+    _audit_log(request, action, status, user=user, identifier=identifier, metadata=metadata).save()
+
+
 def csrf_failure(request, reason=''):
     """
     Recover gracefully from stale/missing CSRF token on login-like pages.
@@ -106,6 +152,7 @@ def admin_required(view_func):
 
 
 class ForgotPasswordView(PasswordResetView):
+    form_class = QueuedPasswordResetForm
     template_name = 'auth/forgot_password_form.html'
     email_template_name = 'auth/forgot_password_email.html'
     subject_template_name = 'auth/forgot_password_subject.txt'
@@ -143,40 +190,13 @@ class ForgotPasswordView(PasswordResetView):
 @login_required
 def landing(request):
     products = Product.objects.filter(is_archived=False).order_by('-created_at')
-    now = timezone.now()
-    months_back = 6
-    start_date = now - timedelta(days=30 * (months_back - 1))
-    start_month = start_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    monthly_analytics = (
-        PCBuild.objects.filter(status='checked_out', created_at__gte=start_month)
-        .annotate(month=TruncMonth('created_at'))
-        .values('month')
-        .annotate(
-            revenue=Sum('total_price'),
-            builds=Count('id'),
-        )
-        .order_by('month')
-    )
-
-    monthly_map = {
-        entry['month'].strftime('%b %Y'): {
-            'revenue': float(entry['revenue'] or 0),
-            'builds': int(entry['builds'] or 0),
-        }
-        for entry in monthly_analytics
-    }
-
     chart_labels = []
     chart_revenue = []
     chart_builds = []
-    for offset in range(months_back - 1, -1, -1):
-        month_date = (now - timedelta(days=30 * offset)).replace(day=1)
-        month_key = month_date.strftime('%b %Y')
-        chart_labels.append(month_key)
-        month_data = monthly_map.get(month_key, {'revenue': 0.0, 'builds': 0})
-        chart_revenue.append(round(month_data['revenue'], 2))
-        chart_builds.append(month_data['builds'])
+    for month_start, revenue, builds, _ in monthly_sales(months_back=6):
+        chart_labels.append(month_start.strftime('%b %Y'))
+        chart_revenue.append(round(float(revenue), 2))
+        chart_builds.append(builds)
 
     return render(request, 'design/landing.html', {
         'products': products,
@@ -204,51 +224,37 @@ def product(request):
     stock_status = request.GET.get('stock_status', '')
     archive_status = request.GET.get('archive_status', 'active')
     
-    # GET sort option
-    sort_by = request.GET.get('sort', '-created_at')
+    # GET sort option (search results default to relevance)
+    sort_by = _product_sort(request, search_query)
 
     # APPLY SEARCH FILTER
+    catalog = Product.objects.all()
     if search_query:
-        products = products.filter(name__icontains=search_query)
+        catalog = search_products(catalog, search_query)
+        products = search_products(products, search_query, ranked=sort_by == 'relevance')
 
-    # APPLY CATEGORY FILTER
-    if category_filter:
-        products = products.filter(category=category_filter)
-    
-    # APPLY PRICE FILTERS
-    if min_price:
-        try:
-            products = products.filter(price__gte=Decimal(min_price))
-        except (InvalidOperation, ValueError):
-            pass
-    
-    if max_price:
-        try:
-            products = products.filter(price__lte=Decimal(max_price))
-        except (InvalidOperation, ValueError):
-            pass
-    
-    # APPLY STOCK STATUS FILTER
-    if stock_status == 'in_stock':
-        products = products.filter(quantity__gt=0)
-    elif stock_status == 'low_stock':
-        products = products.filter(quantity__gt=0, quantity__lte=5)
-    elif stock_status == 'out_of_stock':
-        products = products.filter(quantity__lte=0)
-
-    # APPLY ARCHIVE FILTER
-    if archive_status == 'archived':
-        products = products.filter(is_archived=True)
-    elif archive_status == 'all':
-        pass
-    else:
+    # APPLY CATEGORY, PRICE, STOCK STATUS AND ARCHIVE FILTERS
+    if archive_status not in ('archived', 'all'):
         archive_status = 'active'
-        products = products.filter(is_archived=False)
+    filters = ProductFilters(
+        category=category_filter,
+        stock_status=stock_status,
+        archive_status='' if archive_status == 'all' else archive_status,
+        min_price=min_price,
+        max_price=max_price,
+    )
+    products = filters.apply(products)
+    facets = facet_counts(catalog, filters, 'product', search_query)
     
-    # APPLY SORTING
-    products = products.order_by(sort_by)
-    paginator = Paginator(products, 10)
-    products_page = paginator.get_page(request.GET.get('page'))
+    # APPLY SORTING (keyset pages; relevance pages by rank, then id)
+    sort_key = 'search_rank' if sort_by == 'relevance' else sort_by
+    paginator = CursorPaginator(
+        products,
+        sort_key,
+        per_page=10,
+        count=facets['total'],
+    )
+    products_page = paginator.page(request.GET.get('cursor'))
     querystring = _querystring_without_page(request)
 
     return render(request, 'design/product.html', {
@@ -261,6 +267,7 @@ def product(request):
         'archive_status': archive_status,
         'sort_by': sort_by,
         'querystring': querystring,
+        'facets': facets,
     })
 
 @admin_required
@@ -276,13 +283,9 @@ def add_product(request):
             messages.error(request, "Product name and price are required.")
             return redirect('product')
 
-        normalized_name = _normalized_text(name)
-        normalized_description = _normalized_text(description)
-        duplicate_exists = any(
-            _normalized_text(product.name) == normalized_name and
-            _normalized_text(product.description) == normalized_description
-            for product in Product.objects.filter(category=category).only('name', 'description')
-        )
+        duplicate_exists = Product.objects.filter(
+            dedup_key=Product.build_dedup_key(name, description, category)
+        ).exists()
 
         if duplicate_exists:
             messages.error(
@@ -299,8 +302,18 @@ def add_product(request):
                 quantity=int(quantity) if quantity else 0,
                 category=category
             )
-            product.full_clean()
-            product.save()
+            with transaction.atomic():
+                product.full_clean()
+                product.save()
+                record_stock_movements([
+                    StockMovement(
+                        product=product,
+                        changed_by=request.user,
+                        quantity_change=product.quantity,
+                        reason='restock',
+                        note='Initial stock',
+                    )
+                ])
             messages.success(request, f"Product '{name}' added successfully!")
         except ValidationError as e:
             messages.error(request, "; ".join(e.messages))
@@ -311,6 +324,43 @@ def add_product(request):
 
     return redirect('product')
 
+@admin_required
+def import_products_upload(request):
+    """Bulk-load products from an uploaded CSV/XLSX file and report per-row errors."""
+    if request.method != 'POST':
+        return redirect('product')
+
+    wants_json = 'application/json' in request.headers.get('Accept', '')
+    upload = request.FILES.get('file')
+    try:
+        if upload is None:
+            raise ImportFileError("Choose a CSV or XLSX file to import.")
+        result = import_products(
+            iter_rows(upload, upload.name),
+            update_existing=request.POST.get('update_existing') == 'on',
+            user=request.user,
+        )
+    except ImportFileError as e:
+        if wants_json:
+            return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+        messages.error(request, str(e))
+        return redirect('product')
+
+    if wants_json:
+        return JsonResponse({'ok': True, **result.as_dict()})
+
+    messages.success(
+        request,
+        f"Import finished: {result.created} added, {result.updated} updated, "
+        f"{result.skipped} already existed, {len(result.errors)} row(s) rejected.",
+    )
+    for row_number, error in result.errors[:10]:
+        messages.error(request, f"Row {row_number}: {error}")
+    if len(result.errors) > 10:
+        messages.error(request, f"...and {len(result.errors) - 10} more rejected row(s).")
+    return redirect('product')
+
+
 @login_required
 def category(request):
     products = Product.objects.filter(is_archived=False)
@@ -319,36 +369,30 @@ def category(request):
     min_price = request.GET.get('min_price', '')
     max_price = request.GET.get('max_price', '')
     stock_status = request.GET.get('stock_status', '')
-    sort_by = request.GET.get('sort', '-created_at')
+    sort_by = _product_sort(request, search_query)
 
+    catalog = products
     if search_query:
-        products = products.filter(name__icontains=search_query)
-
-    if category_filter:
-        products = products.filter(category=category_filter)
-
-    if min_price:
-        try:
-            products = products.filter(price__gte=Decimal(min_price))
-        except (InvalidOperation, ValueError):
-            pass
-
-    if max_price:
-        try:
-            products = products.filter(price__lte=Decimal(max_price))
-        except (InvalidOperation, ValueError):
-            pass
-
-    if stock_status == 'in_stock':
-        products = products.filter(quantity__gt=0)
-    elif stock_status == 'low_stock':
-        products = products.filter(quantity__gt=0, quantity__lte=5)
-    elif stock_status == 'out_of_stock':
-        products = products.filter(quantity__lte=0)
-
-    products = products.order_by(sort_by)
-    paginator = Paginator(products, 10)
-    products_page = paginator.get_page(request.GET.get('page'))
+        catalog = search_products(catalog, search_query)
+        products = search_products(products, search_query, ranked=sort_by == 'relevance')
+
+    filters = ProductFilters(
+        category=category_filter,
+        stock_status=stock_status,
+        min_price=min_price,
+        max_price=max_price,
+    )
+    products = filters.apply(products)
+    facets = facet_counts(catalog, filters, 'category', search_query)
+
+    sort_key = 'search_rank' if sort_by == 'relevance' else sort_by
+    paginator = CursorPaginator(
+        products,
+        sort_key,
+        per_page=10,
+        count=facets['total'],
+    )
+    products_page = paginator.page(request.GET.get('cursor'))
     querystring = _querystring_without_page(request)
 
     return render(request, 'design/masterlist.html', {
@@ -360,6 +404,7 @@ def category(request):
         'stock_status': stock_status,
         'sort_by': sort_by,
         'querystring': querystring,
+        'facets': facets,
     })
 
 @admin_required
@@ -378,13 +423,26 @@ def edit_product(request, product_id):
             return redirect('product')
 
         try:
+            previous_quantity = product.quantity
             product.name = name
             product.description = description
             product.price = price
             product.quantity = int(quantity) if quantity else 0
             product.category = category
-            product.full_clean()
-            product.save()
+            with transaction.atomic():
+                product.full_clean()
+                product.save()
+                ProductSalesCounter.objects.filter(product=product).update(category=product.category)
+                quantity_change = product.quantity - previous_quantity
+                record_stock_movements([
+                    StockMovement(
+                        product=product,
+                        changed_by=request.user,
+                        quantity_change=quantity_change,
+                        reason='restock' if quantity_change > 0 else 'adjustment',
+                        note='Edited from Product Management',
+                    )
+                ])
 
             messages.success(request, f"Product '{name}' updated successfully!")
         except ValidationError as e:
@@ -419,12 +477,14 @@ def delete_product(request, product_id):
             if any(model_name.endswith('stockmovement') for model_name in protected_models):
                 messages.error(
                     request,
-                    f"Cannot delete '{product_name}' because stock movement logs exist for this product.",
+                    f"Cannot delete '{product_name}' because stock movement logs exist for this product. "
+                    "Archive it to hide it from the catalog.",
                 )
             else:
                 messages.error(
                     request,
-                    f"Cannot delete '{product_name}' because it is referenced by checkout history.",
+                    f"Cannot delete '{product_name}' because it is referenced by checkout history. "
+                    "Archive it to hide it from the catalog.",
                 )
         except Exception as e:
             messages.error(request, f"Error deleting product: {str(e)}")
@@ -438,27 +498,98 @@ def pc_builder(request):
     prefill_notes = request.session.pop('prefill_notes', [])
     prefill_cancel_url = request.session.pop('prefill_cancel_url', '')
 
-    # Fetch products per category
-    ram = Product.objects.filter(category='ram', is_archived=False)
-    motherboard = Product.objects.filter(category='motherboard', is_archived=False)
-    cpu = Product.objects.filter(category='cpu', is_archived=False)
-    gpu = Product.objects.filter(category='gpu', is_archived=False)
-    storage = Product.objects.filter(category='storage', is_archived=False)
-    psu = Product.objects.filter(category='psu', is_archived=False)
-    case = Product.objects.filter(category='case', is_archived=False)
+    # Parts come from the cached catalog snapshot; stock shown to the
+    # builder excludes parts other drafts are holding.
+    draft_build_id = _draft_build_id(request.user)
+    parts = catalog_with_availability(draft_build_id)
+
+    # Small categories are rendered as plain <option>s. Larger ones only
+    # carry the parts being reordered and are searched on demand through
+    # part_search_api, so the page stays small however big the catalog gets.
+    inline_limit = int(getattr(settings, 'PC_BUILDER_INLINE_OPTION_LIMIT', 200))
+    prefill_ids = {item.get('product_id') for item in prefill_build_items}
+    part_groups = []
+    for category, label in CATEGORY_CHOICES:
+        category_parts = parts.get(category, [])
+        searchable = len(category_parts) > inline_limit
+        if searchable:
+            category_parts = [part for part in category_parts if part['id'] in prefill_ids]
+        part_groups.append({
+            'category': category,
+            'label': label,
+            'parts': category_parts,
+            'searchable': searchable,
+        })
 
     return render(request, 'design/pc_builder.html', {
-        'ram': ram,
-        'motherboard': motherboard,
-        'cpu': cpu,
-        'gpu': gpu,
-        'storage': storage,
-        'psu': psu,
-        'case': case,
+        'part_groups': part_groups,
         'prefill_build_items_json': json.dumps(prefill_build_items),
         'prefill_notes': prefill_notes,
         'show_reorder_cancel': bool(prefill_build_items),
         'prefill_cancel_url': prefill_cancel_url,
+        'checkout_idempotency_key': uuid.uuid4().hex,
+    })
+
+
+def _draft_build_id(user):
+    return PCBuild.objects.filter(user=user, status='draft').values_list('id', flat=True).first()
+
+
+@login_required
+def part_search_api(request):
+    """Typeahead search over active parts for the PC builder."""
+    category = request.GET.get('category', '')
+    if category and category not in dict(CATEGORY_CHOICES):
+        return JsonResponse({'ok': False, 'error': "Invalid category."}, status=400)
+
+    fields = [field for field in request.GET.get('fields', '').split(',') if field] or PART_SEARCH_DEFAULT_FIELDS
+    if any(field not in PART_SEARCH_FIELDS for field in fields):
+        return JsonResponse({'ok': False, 'error': "Invalid fields."}, status=400)
+    try:
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        return JsonResponse({'ok': False, 'error': "Invalid limit."}, status=400)
+
+    results = search_parts(
+        request.GET.get('q', ''),
+        category=category or None,
+        in_stock=request.GET.get('in_stock') in ('1', 'true'),
+        limit=limit,
+        fields=fields,
+        exclude_build_id=_draft_build_id(request.user),
+    )
+    for row in results:
+        if 'price' in row:
+            row['price'] = str(row['price'])
+    return JsonResponse({'ok': True, 'results': results})
+
+
+@login_required
+def reserve_build_part(request):
+    if request.method != 'POST':
+        return JsonResponse({'ok': False, 'error': "POST required."}, status=405)
+
+    try:
+        payload = json.loads(request.body or b'{}')
+        product_id = int(payload.get('product_id'))
+        quantity = int(payload.get('quantity', 0))
+    except (json.JSONDecodeError, UnicodeDecodeError, AttributeError, TypeError, ValueError):
+        return JsonResponse({'ok': False, 'error': "Invalid product or quantity."}, status=400)
+
+    if product_id <= 0 or quantity < 0:
+        return JsonResponse({'ok': False, 'error': "Invalid product or quantity."}, status=400)
+
+    build, _ = PCBuild.objects.get_or_create(user=request.user, status='draft')
+    try:
+        reservation = hold_stock(build, product_id, quantity)
+    except InsufficientStock as e:
+        return JsonResponse({'ok': False, 'error': str(e), 'shortfalls': e.shortfalls}, status=409)
+
+    return JsonResponse({
+        'ok': True,
+        'product_id': product_id,
+        'held': reservation.quantity if reservation else 0,
+        'expires_at': reservation.expires_at.isoformat() if reservation else None,
     })
 
 
@@ -616,28 +747,18 @@ def profile_settings(request):
     }
     return render(request, 'profile/settings.html', context)
 
-@login_required
-@transaction.atomic
-def checkout_pc_build(request):
-    if request.method != 'POST':
-        return redirect('pc-builder')
+class CheckoutError(Exception):
+    pass
 
-    raw_items = request.POST.get('build_items', '[]')
-    try:
-        selected_items = json.loads(raw_items)
-    except json.JSONDecodeError:
-        messages.error(request, "Invalid build data.")
-        return redirect('pc-builder')
 
+def _parse_build_items(selected_items):
     if not isinstance(selected_items, list) or not selected_items:
-        messages.error(request, "No items selected for this build.")
-        return redirect('pc-builder')
+        raise CheckoutError("No items selected for this build.")
 
     requested_quantities = {}
     for item in selected_items:
         if not isinstance(item, dict):
-            messages.error(request, "Invalid build item format.")
-            return redirect('pc-builder')
+            raise CheckoutError("Invalid build item format.")
 
         product_id = item.get('product_id')
         quantity = item.get('quantity')
@@ -645,38 +766,36 @@ def checkout_pc_build(request):
             product_id = int(product_id)
             quantity = int(quantity)
         except (TypeError, ValueError):
-            messages.error(request, "Invalid product or quantity.")
-            return redirect('pc-builder')
+            raise CheckoutError("Invalid product or quantity.")
 
         if product_id <= 0 or quantity <= 0:
-            messages.error(request, "Invalid product or quantity.")
-            return redirect('pc-builder')
+            raise CheckoutError("Invalid product or quantity.")
 
         requested_quantities[product_id] = requested_quantities.get(product_id, 0) + quantity
+    return requested_quantities
+
 
+def _checkout_build(user, requested_quantities):
     build, _ = PCBuild.objects.get_or_create(
-        user=request.user,
+        user=user,
         status='draft'
     )
 
-    products = Product.objects.select_for_update().filter(
+    products = Product.objects.filter(
         id__in=requested_quantities.keys(),
         is_archived=False,
-    )
+    ).only('id', 'name', 'price', 'category')
     products_map = {product.id: product for product in products}
     if len(products_map) != len(requested_quantities):
-        messages.error(request, "One or more selected products do not exist.")
-        return redirect('pc-builder')
+        raise CheckoutError("One or more selected products do not exist.")
 
-    for product_id, quantity in requested_quantities.items():
-        product = products_map[product_id]
-        if quantity > product.quantity:
-            messages.error(request, f"Not enough stock for {product.name}")
-            return redirect('pc-builder')
+    decrement_stock(requested_quantities, build=build)
+    build.reservations.all().delete()
 
     build.items.all().delete()
 
     build_items_to_create = []
+    stock_movements = []
     total = Decimal('0.00')
     for product_id, quantity in requested_quantities.items():
         product = products_map[product_id]
@@ -690,24 +809,151 @@ def checkout_pc_build(request):
                 price_at_time=price_at_time,
             )
         )
-
-        product.quantity -= quantity
-        product.save(update_fields=['quantity'])
+        stock_movements.append(
+            StockMovement(
+                product=product,
+                build=build,
+                changed_by=user,
+                quantity_change=-quantity,
+                reason='checkout',
+            )
+        )
 
         try:
             total += price_at_time * quantity
         except (TypeError, InvalidOperation):
-            messages.error(request, "Could not compute total price.")
-            return redirect('pc-builder')
+            raise CheckoutError("Could not compute total price.")
 
     PCBuildItem.objects.bulk_create(build_items_to_create)
+    record_stock_movements(stock_movements)
 
     build.total_price = total
+    build.item_count = len(build_items_to_create)
+    build.unit_count = sum(requested_quantities.values())
     build.status = 'checked_out'
     build.save()
 
-    messages.success(request, "PC Build checked out successfully!")
+    record_checkout_sales(build, [
+        (item.product_id, item.product.category, item.quantity, item.price_at_time)
+        for item in build_items_to_create
+    ])
+    sales_data_changed()
+    return build
+
+
+def _replayed_checkout(user, idempotency_key):
+    if not idempotency_key:
+        return None
+    return (
+        CheckoutIdempotencyKey.objects.filter(
+            user=user,
+            key=idempotency_key,
+            expires_at__gt=timezone.now(),
+        )
+        .select_related('build')
+        .first()
+    )
+
+
+def _run_checkout(user, selected_items, idempotency_key=''):
+    """
+    Check out the user's build once per idempotency key.
+
+    Returns (build, replayed). A replayed key is answered from the stored
+    result without touching stock; a concurrent duplicate that loses the
+    race on the unique key is rolled back and answered the same way.
+    """
+    replay = _replayed_checkout(user, idempotency_key)
+    if replay is not None:
+        return replay.build, True
+
+    requested_quantities = _parse_build_items(selected_items)
+    try:
+        with transaction.atomic():
+            build = _checkout_build(user, requested_quantities)
+            if idempotency_key:
+                now = timezone.now()
+                ttl = int(getattr(settings, 'CHECKOUT_IDEMPOTENCY_TTL_SECONDS', 86400))
+                CheckoutIdempotencyKey.objects.filter(user=user, expires_at__lte=now).delete()
+                CheckoutIdempotencyKey.objects.create(
+                    user=user,
+                    key=idempotency_key,
+                    build=build,
+                    expires_at=now + timedelta(seconds=ttl),
+                )
+    except IntegrityError:
+        replay = _replayed_checkout(user, idempotency_key)
+        if replay is None:
+            raise
+        return replay.build, True
+    return build, False
+
+
+def _idempotency_key(request, payload):
+    key = str(payload.get('idempotency_key') or request.META.get('HTTP_IDEMPOTENCY_KEY') or '').strip()
+    # Truncating could make two different keys collide and replay the wrong build.
+    max_length = CheckoutIdempotencyKey._meta.get_field('key').max_length
+    if len(key) > max_length:
+        raise CheckoutError(f"Idempotency key must be at most {max_length} characters.")
+    return key
+
+
+@login_required
+def checkout_pc_build(request):
+    if request.method != 'POST':
+        return redirect('pc-builder')
+
+    raw_items = request.POST.get('build_items', '[]')
+    try:
+        selected_items = json.loads(raw_items)
+    except json.JSONDecodeError:
+        messages.error(request, "Invalid build data.")
+        return redirect('pc-builder')
+
+    try:
+        _, replayed = _run_checkout(request.user, selected_items, _idempotency_key(request, request.POST))
+    except (CheckoutError, InsufficientStock) as e:
+        messages.error(request, str(e))
+        return redirect('pc-builder')
+
+    if replayed:
+        messages.info(request, "This checkout was already processed.")
+    else:
+        messages.success(request, "PC Build checked out successfully!")
     return redirect('landing')
+
+
+@login_required
+def checkout_pc_build_api(request):
+    if request.method != 'POST':
+        return JsonResponse({'ok': False, 'error': "POST required."}, status=405)
+
+    try:
+        payload = json.loads(request.body or b'{}')
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({'ok': False, 'error': "Invalid build data."}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'ok': False, 'error': "Invalid build data."}, status=400)
+
+    try:
+        build, replayed = _run_checkout(
+            request.user,
+            payload.get('build_items'),
+            _idempotency_key(request, payload),
+        )
+    except InsufficientStock as e:
+        return JsonResponse({'ok': False, 'error': str(e), 'shortfalls': e.shortfalls}, status=409)
+    except CheckoutError as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'ok': True,
+        'build_id': build.id if build else None,
+        'total_price': str(build.total_price) if build else None,
+        'replayed': replayed,
+    })
+
+
 @login_required
 def checkout_history(request):
     """Display checkout history with analytics"""
@@ -718,45 +964,30 @@ def checkout_history(request):
     builds_qs = PCBuild.objects.filter(
         status='checked_out',
         is_archived=show_archived,
-    ).annotate(item_count=Count('items')).order_by('-created_at')
+    ).select_related('user')
+    scope_user = None
     if not _is_admin(request.user):
+        scope_user = request.user
         builds_qs = builds_qs.filter(user=request.user)
-    paginator = Paginator(builds_qs, 10)
-    builds_page = paginator.get_page(request.GET.get('page'))
-    
-    # Analytics calculations
-    total_builds = builds_qs.count()
-    
-    # Calculate total revenue using Python instead of Django ORM
-    total_revenue = Decimal('0.00')
-    for build in builds_qs:
-        total_revenue += build.total_price
-    
-    avg_order_value = total_revenue / total_builds if total_builds > 0 else Decimal('0.00')
-    
-    # Most popular item
-    most_popular_item = None
-    most_popular_count = 0
-    if total_builds > 0:
-        popular = PCBuildItem.objects.filter(build__in=builds_qs).values('product__name').annotate(
-            count=Count('id')
-        ).order_by('-count').first()
-        if popular:
-            most_popular_item = popular['product__name']
-            most_popular_count = popular['count']
-    
-    total_listed_builds = total_builds
-    for page_index, build in enumerate(builds_page, start=1):
-        global_index = (builds_page.number - 1) * paginator.per_page + page_index
-        build.display_number = total_listed_builds - global_index + 1
+
+    # Analytics come from one cached aggregate per (scope, archived) pair.
+    stats = checkout_history_stats(user=scope_user, archived=show_archived)
+    total_builds = stats['total_builds']
+
+    paginator = CursorPaginator(builds_qs, '-created_at', per_page=10, count=total_builds)
+    builds_page = paginator.page(request.GET.get('cursor'))
+
+    # The cursor carries the page number, so numbering survives keyset paging.
+    for global_index, build in enumerate(builds_page, start=builds_page.start_index()):
+        build.display_number = total_builds - global_index + 1
 
     context = {
         'builds': builds_page,
         'total_builds': total_builds,
-        'total_revenue': float(total_revenue),
-        'avg_order_value': float(avg_order_value),
-        'most_popular_item': most_popular_item,
-        'most_popular_count': most_popular_count,
+        'total_revenue': float(stats['total_revenue']),
+        'avg_order_value': float(stats['avg_order_value']),
+        'most_popular_item': stats['most_popular_item'],
+        'most_popular_count': stats['most_popular_count'],
         'show_archived': show_archived,
         'querystring': _querystring_without_page(request),
     }
@@ -768,24 +999,227 @@ def checkout_history_detail(request, build_id):
     build_filters = {'id': build_id}
     if not _is_admin(request.user):
         build_filters['user'] = request.user
-    build = get_object_or_404(PCBuild, **build_filters)
-    stock_movements = StockMovement.objects.filter(build=build).order_by('-created_at')
+    build = get_object_or_404(PCBuild.objects.select_related('user'), **build_filters)
+    build_items = build.items.select_related('product')
+    stock_movements = (
+        StockMovement.objects.filter(build=build)
+        .select_related('product', 'changed_by')
+        .order_by('-created_at')
+    )
     history_view = request.GET.get('view')
     if history_view not in ('active', 'archived'):
         history_view = 'archived' if build.is_archived else 'active'
     
     # Calculate average item price
-    item_count = build.items.count()
+    item_count = build.item_count
     avg_item_price = build.total_price / item_count if item_count > 0 else Decimal('0.00')
     
     return render(request, 'design/checkout_history_detail.html', {
         'build': build,
+        'build_items': build_items,
         'stock_movements': stock_movements,
         'avg_item_price': avg_item_price,
         'history_view': history_view,
     })
 
 
+@login_required
+def top_products_api(request):
+    metric = request.GET.get('metric', 'units')
+    if metric not in LEADERBOARD_METRICS:
+        return JsonResponse({'ok': False, 'error': "Invalid metric."}, status=400)
+
+    category = request.GET.get('category', '')
+    if category and category not in dict(CATEGORY_CHOICES):
+        return JsonResponse({'ok': False, 'error': "Invalid category."}, status=400)
+
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 100)
+        since, until = (
+            parse_date(request.GET[name]) if request.GET.get(name) else None
+            for name in ('since', 'until')
+        )
+    except ValueError:
+        since = until = limit = None
+    if limit is None or (request.GET.get('since') and since is None) or (request.GET.get('until') and until is None):
+        return JsonResponse({'ok': False, 'error': "Invalid limit or date."}, status=400)
+
+    results = top_products(limit=limit, metric=metric, category=category or None, since=since, until=until)
+    for row in results:
+        row['revenue'] = str(row['revenue'])
+    return JsonResponse({'ok': True, 'metric': metric, 'results': results})
+
+
+PRICE_HISTORY_MAX_PRODUCTS = 500
+
+
+def _parse_timestamp(value):
+    """An aware datetime from an ISO date or datetime string; raises ValueError."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        parsed = datetime.combine(day, time.min)
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+@login_required
+def product_prices_api(request):
+    """Prices in effect at ?at=, or price-over-time series for ?since=[&until=]."""
+    try:
+        product_ids = [int(value) for value in request.GET.get('ids', '').split(',') if value.strip()]
+        at, since, until = (
+            _parse_timestamp(request.GET[name]) if request.GET.get(name) else None
+            for name in ('at', 'since', 'until')
+        )
+    except ValueError:
+        return JsonResponse({'ok': False, 'error': "Invalid product ids or timestamp."}, status=400)
+    if not product_ids or len(product_ids) > PRICE_HISTORY_MAX_PRODUCTS:
+        return JsonResponse(
+            {'ok': False, 'error': f"Pass between 1 and {PRICE_HISTORY_MAX_PRODUCTS} product ids."}, status=400,
+        )
+
+    if since is None:
+        at = at or timezone.now()
+        prices = price_at(product_ids, at)
+        return JsonResponse({
+            'ok': True,
+            'at': at.isoformat(),
+            'prices': {str(product_id): str(price) for product_id, price in prices.items()},
+        })
+
+    series = price_series(product_ids, since, until)
+    return JsonResponse({
+        'ok': True,
+        'since': since.isoformat(),
+        'until': (until or timezone.now()).isoformat(),
+        'series': {
+            str(product_id): [{'at': effective_from.isoformat(), 'price': str(price)} for effective_from, price in points]
+            for product_id, points in series.items()
+        },
+    })
+
+
+@admin_required
+def reorder_report_api(request):
+    """Products at or under their reorder point as of the last refresh_reorder_points run."""
+    try:
+        limit = min(max(int(request.GET.get('limit', 100)), 1), 500)
+    except ValueError:
+        return JsonResponse({'ok': False, 'error': "Invalid limit."}, status=400)
+
+    results = [
+        {
+            'product_id': row.product_id,
+            'name': row.product.name,
+            'category': row.product.category,
+            'quantity': row.product.quantity,
+            'daily_velocity': str(row.daily_velocity),
+            'days_of_cover': str(row.days_of_cover) if row.days_of_cover is not None else None,
+            'reorder_point': row.reorder_point,
+            'suggested_quantity': row.suggested_quantity,
+            'refreshed_at': row.refreshed_at.isoformat(),
+        }
+        for row in reorder_list(limit)
+    ]
+    return JsonResponse({'ok': True, 'results': results})
+
+
+@admin_required
+def sales_report_api(request):
+    """Revenue breakdowns, moving averages and order-value percentiles from the columnar sales cache."""
+    if not analytics.numpy_available():
+        return JsonResponse({'ok': False, 'error': "Sales analytics are not available."}, status=503)
+
+    group = request.GET.get('group', 'period')
+    period = request.GET.get('period', 'day')
+    category = request.GET.get('category', '')
+    if group not in ('category', 'user', 'period') or period not in analytics.PERIODS:
+        return JsonResponse({'ok': False, 'error': "Invalid group or period."}, status=400)
+    if category and category not in dict(CATEGORY_CHOICES):
+        return JsonResponse({'ok': False, 'error': "Invalid category."}, status=400)
+    try:
+        window = min(max(int(request.GET.get('window', 7)), 1), 365)
+        since, until = (
+            parse_date(request.GET[name]) if request.GET.get(name) else None
+            for name in ('since', 'until')
+        )
+    except ValueError:
+        since = until = window = None
+    if window is None or (request.GET.get('since') and since is None) or (request.GET.get('until') and until is None):
+        return JsonResponse({'ok': False, 'error': "Invalid window or date."}, status=400)
+
+    frame = analytics.sales_frame().filter(
+        category=category or None,
+        since=since,
+        until=until,
+        archived=request.GET.get('view') == 'archived',
+    )
+    totals = frame.totals()
+    report = {
+        'ok': True,
+        'group': group,
+        'totals': {**totals, 'revenue': str(totals['revenue'])},
+        'order_value_percentiles': {
+            str(pct): str(value) for pct, value in frame.order_value_percentiles().items()
+        },
+    }
+    if group == 'category':
+        report['results'] = [
+            {'category': key, 'revenue': str(value)} for key, value in frame.revenue_by_category().items()
+        ]
+    elif group == 'user':
+        by_user = frame.revenue_by_user()
+        usernames = dict(get_user_model().objects.filter(id__in=by_user.keys()).values_list('id', 'username'))
+        report['results'] = [
+            {'user_id': user_id, 'username': usernames.get(user_id), 'revenue': str(value)}
+            for user_id, value in by_user.items()
+        ]
+    else:
+        series = frame.revenue_by_period(period)
+        averages = analytics.moving_average([revenue for _, revenue, _, _ in series], window)
+        report['period'] = period
+        report['results'] = [
+            {
+                'period_start': start.isoformat(),
+                'revenue': str(revenue),
+                'builds': builds,
+                'units': units,
+                'moving_average': str(Decimal(average).quantize(Decimal('0.01'))),
+            }
+            for (start, revenue, builds, units), average in zip(series, averages)
+        ]
+    return JsonResponse(report)
+
+
+@login_required
+def export_data(request, dataset):
+    """Stream checkout history, products or stock movements as CSV or JSONL."""
+    if dataset not in EXPORTS:
+        raise Http404("Unknown export.")
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'ok': False, 'error': "Invalid format."}, status=400)
+
+    queryset = None
+    if dataset == 'checkout-history':
+        queryset = PCBuild.objects.filter(status='checked_out')
+        view_mode = request.GET.get('view')
+        if view_mode in ('active', 'archived'):
+            queryset = queryset.filter(is_archived=view_mode == 'archived')
+        if not _is_admin(request.user):
+            queryset = queryset.filter(user=request.user)
+    elif not _is_admin(request.user):
+        messages.error(request, "Admin access required for this action.")
+        return redirect('landing')
+
+    response = StreamingHttpResponse(export_lines(dataset, fmt, queryset), content_type=CONTENT_TYPES[fmt])
+    filename = f"{dataset}-{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @admin_required
 def archive_build(request, build_id):
     if request.method != 'POST':
@@ -799,6 +1233,7 @@ def archive_build(request, build_id):
     if not build.is_archived:
         build.is_archived = True
         build.save(update_fields=['is_archived'])
+        sales_data_changed()
         messages.success(request, f"Build #{build.id} archived.")
 
     return redirect(f"/pc-builder/history/?view={next_view}")
@@ -817,6 +1252,7 @@ def restore_build(request, build_id):
     if build.is_archived:
         build.is_archived = False
         build.save(update_fields=['is_archived'])
+        sales_data_changed()
         messages.success(request, f"Build #{build.id} restored.")
 
     return redirect(f"/pc-builder/history/?view={next_view}")
@@ -861,7 +1297,10 @@ def delete_build(request, build_id):
     deleted_build_id = build.id
     deleted_username = build.user.username
     deleted_total = str(build.total_price)
-    build.delete()
+    with transaction.atomic():
+        reverse_build_sales([deleted_build_id])
+        build.delete()
+        sales_data_changed()
 
     _create_audit_log(
         request,
@@ -903,23 +1342,18 @@ def bulk_manage_builds(request):
         messages.error(request, "Selected builds are no longer available.")
         return redirect(f"/pc-builder/history/?view={next_view}")
 
-    changed_count = 0
-
+    # Archive, restore and delete are each one statement over the ID set.
     if action == 'archive':
-        for build in builds:
-            if not build.is_archived:
-                build.is_archived = True
-                build.save(update_fields=['is_archived'])
-                changed_count += 1
+        changed_count = builds.filter(is_archived=False).update(is_archived=True)
+        if changed_count:
+            sales_data_changed()
         messages.success(request, f"{changed_count} build(s) archived.")
         return redirect("/pc-builder/history/?view=active")
 
     if action == 'restore':
-        for build in builds:
-            if build.is_archived:
-                build.is_archived = False
-                build.save(update_fields=['is_archived'])
-                changed_count += 1
+        changed_count = builds.filter(is_archived=True).update(is_archived=False)
+        if changed_count:
+            sales_data_changed()
         messages.success(request, f"{changed_count} build(s) restored.")
         return redirect("/pc-builder/history/?view=archived")
 
@@ -929,28 +1363,34 @@ def bulk_manage_builds(request):
             messages.error(request, "Bulk delete cancelled. Type DELETE to confirm.")
             return redirect("/pc-builder/history/?view=archived")
 
-        for build in builds:
-            if not build.is_archived:
-                continue
-            deleted_build_id = build.id
-            deleted_username = build.user.username
-            deleted_total = str(build.total_price)
-            build.delete()
-            changed_count += 1
-            _create_audit_log(
-                request,
-                action='delete_build',
-                status='success',
-                user=request.user,
-                identifier=str(deleted_build_id),
-                metadata={
-                    'target_user': deleted_username,
-                    'total_price': deleted_total,
-                    'bulk': True,
-                },
+        with transaction.atomic():
+            doomed = list(
+                builds.filter(is_archived=True)
+                .select_related('user')
+                .only('id', 'total_price', 'user__username')
             )
-
-        messages.success(request, f"{changed_count} build(s) deleted permanently.")
+            doomed_ids = [build.id for build in doomed]
+            if doomed_ids:
+                reverse_build_sales(doomed_ids)
+                PCBuild.objects.filter(id__in=doomed_ids).delete()
+                sales_data_changed()
+                AuditLog.objects.bulk_create([
+                    _audit_log(
+                        request,
+                        action='delete_build',
+                        status='success',
+                        user=request.user,
+                        identifier=str(build.id),
+                        metadata={
+                            'target_user': build.user.username,
+                            'total_price': str(build.total_price),
+                            'bulk': True,
+                        },
+                    )
+                    for build in doomed
+                ])
+
+        messages.success(request, f"{len(doomed_ids)} build(s) deleted permanently.")
         return redirect("/pc-builder/history/?view=archived")
 
     messages.error(request, "Invalid bulk action.")
@@ -983,6 +1423,211 @@ def restore_product(request, product_id):
     return redirect('product')
 
 
+class BulkUpdateError(Exception):
+    """Carries per-product validation errors for a rejected bulk update."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(f"#{item['id']}: {item['error']}" for item in errors))
+
+
+def _parse_bulk_value(raw, parse):
+    if raw is None or raw == '':
+        return None
+    return parse(str(raw).strip())
+
+
+def _price_limit():
+    """Smallest price too large for Product.price (10 ** integer digits)."""
+    field = Product._meta.get_field('price')
+    return Decimal(10) ** (field.max_digits - field.decimal_places)
+
+
+def _parse_product_updates(entries):
+    """
+    Normalize [{id, price | price_delta, quantity | quantity_delta}] entries.
+
+    Returns {product_id: {'price': Decimal|None, 'price_delta': ..., 'quantity': int|None,
+    'quantity_delta': ...}}; raises BulkUpdateError listing every bad entry.
+    """
+    updates, errors = {}, []
+    max_price = _price_limit()
+    for entry in entries:
+        if not isinstance(entry, dict):
+            errors.append({'id': None, 'error': "Each update must be an object."})
+            continue
+        try:
+            product_id = int(entry.get('id'))
+        except (TypeError, ValueError):
+            errors.append({'id': entry.get('id'), 'error': "Invalid product id."})
+            continue
+        try:
+            change = {
+                'price': _parse_bulk_value(entry.get('price'), Decimal),
+                'price_delta': _parse_bulk_value(entry.get('price_delta'), Decimal),
+                'quantity': _parse_bulk_value(entry.get('quantity'), int),
+                'quantity_delta': _parse_bulk_value(entry.get('quantity_delta'), int),
+            }
+        except (InvalidOperation, ValueError):
+            errors.append({'id': product_id, 'error': "Price and quantity values must be numbers."})
+            continue
+        prices = [change[key] for key in ('price', 'price_delta') if change[key] is not None]
+        if any(not value.is_finite() for value in prices):
+            errors.append({'id': product_id, 'error': "Price values must be finite numbers."})
+        elif any(value.copy_abs() >= max_price for value in prices):
+            errors.append({'id': product_id, 'error': "Price value is too large."})
+        elif any(
+            change[key] is not None and abs(change[key]) > MAX_QUANTITY for key in ('quantity', 'quantity_delta')
+        ):
+            errors.append({'id': product_id, 'error': "Quantity value is too large."})
+        elif change['price'] is not None and change['price_delta'] is not None:
+            errors.append({'id': product_id, 'error': "Give either price or price_delta, not both."})
+        elif change['quantity'] is not None and change['quantity_delta'] is not None:
+            errors.append({'id': product_id, 'error': "Give either quantity or quantity_delta, not both."})
+        elif all(value is None for value in change.values()):
+            errors.append({'id': product_id, 'error': "Nothing to update."})
+        elif product_id in updates:
+            errors.append({'id': product_id, 'error': "Product listed more than once."})
+        else:
+            updates[product_id] = change
+    if errors:
+        raise BulkUpdateError(errors)
+    return updates
+
+
+def _apply_product_updates(updates, user):
+    """
+    Validate every update against current rows, then write them all at once.
+
+    Everything goes through one Case/When UPDATE. Quantity changes,
+    including absolute targets turned into deltas against the rows read
+    here, are applied as F('quantity') + delta so a concurrent checkout is
+    never overwritten and the ledger still balances. Stock movements and
+    price history rows are each written with one bulk INSERT. Returns the
+    number of products changed.
+    """
+    max_price = _price_limit()
+    with transaction.atomic():
+        current = {
+            product.id: product
+            for product in Product.objects.filter(id__in=updates.keys()).only('id', 'name', 'price', 'quantity')
+        }
+        errors, prices, quantities, movements = [], {}, {}, []
+        for product_id, change in updates.items():
+            product = current.get(product_id)
+            if product is None:
+                errors.append({'id': product_id, 'error': "Product not found."})
+                continue
+
+            price = change['price'] if change['price'] is not None else product.price + (change['price_delta'] or 0)
+            try:
+                price = price.quantize(Decimal('0.01'))
+            except InvalidOperation:
+                errors.append({'id': product_id, 'error': f"Price of '{product.name}' is not a valid amount."})
+                price = product.price
+            if price <= 0:
+                errors.append({'id': product_id, 'error': f"Price of '{product.name}' must be greater than 0."})
+            elif price >= max_price:
+                errors.append({'id': product_id, 'error': f"Price of '{product.name}' is too large."})
+            elif price != product.price:
+                prices[product_id] = price
+
+            if change['quantity'] is not None:
+                quantity_change = change['quantity'] - product.quantity
+            else:
+                quantity_change = change['quantity_delta'] or 0
+            if product.quantity + quantity_change < 0:
+                errors.append({'id': product_id, 'error': f"Quantity of '{product.name}' cannot go below 0."})
+            elif quantity_change:
+                quantities[product_id] = quantity_change
+                movements.append(StockMovement(
+                    product=product,
+                    changed_by=user,
+                    quantity_change=quantity_change,
+                    reason='restock' if quantity_change > 0 else 'adjustment',
+                    note='Bulk update from Product Management',
+                ))
+        if errors:
+            raise BulkUpdateError(errors)
+
+        changed_ids = set(prices) | set(quantities)
+        if not changed_ids:
+            return 0
+        price_expression = Case(
+            *[When(id=product_id, then=Value(price)) for product_id, price in prices.items()],
+            default=F('price'),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+        quantity_expression = F('quantity') + Case(
+            *[When(id=product_id, then=Value(change)) for product_id, change in quantities.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        # Deltas are re-checked in the UPDATE itself, like decrement_stock().
+        guard = Q()
+        for product_id in changed_ids:
+            guard |= Q(id=product_id, quantity__gte=-min(quantities.get(product_id, 0), 0))
+        updated = Product.objects.filter(guard).update(
+            price=price_expression,
+            quantity=quantity_expression,
+            updated_at=timezone.now(),
+        )
+        if updated != len(changed_ids):
+            raise BulkUpdateError([{'id': None, 'error': "Stock changed while saving; nothing was updated, try again."}])
+        record_price_changes(prices)
+        record_stock_movements(movements)
+        catalog_changed()
+    return len(changed_ids)
+
+
+def _bulk_form_updates(request):
+    """Turn the product list's bulk price/quantity form into update entries."""
+    price_field = 'price' if request.POST.get('price_mode', 'set') == 'set' else 'price_delta'
+    quantity_field = 'quantity' if request.POST.get('quantity_mode', 'set') == 'set' else 'quantity_delta'
+    price = (request.POST.get('bulk_price') or '').strip()
+    quantity = (request.POST.get('bulk_quantity') or '').strip()
+    return [
+        {'id': product_id, price_field: price, quantity_field: quantity}
+        for product_id in request.POST.getlist('selected_product_ids')
+    ]
+
+
+@admin_required
+def bulk_update_products(request):
+    """Apply many price/quantity changes (absolute or delta) in one transaction."""
+    if request.method != 'POST':
+        return redirect('product')
+
+    is_json = request.content_type == 'application/json'
+    next_querystring = (request.POST.get('next_querystring') or '').strip()
+    redirect_url = f"/product/?{next_querystring}" if next_querystring else '/product/'
+    try:
+        if is_json:
+            try:
+                payload = json.loads(request.body or b'{}')
+            except json.JSONDecodeError:
+                return JsonResponse({'ok': False, 'error': "Invalid JSON body."}, status=400)
+            entries = payload.get('updates') if isinstance(payload, dict) else None
+            if not isinstance(entries, list) or not entries:
+                return JsonResponse({'ok': False, 'error': "Provide a non-empty 'updates' list."}, status=400)
+        else:
+            entries = _bulk_form_updates(request)
+            if not entries:
+                messages.error(request, "No products selected.")
+                return redirect(redirect_url)
+        changed = _apply_product_updates(_parse_product_updates(entries), request.user)
+    except BulkUpdateError as e:
+        if is_json:
+            return JsonResponse({'ok': False, 'errors': e.errors}, status=400)
+        messages.error(request, f"Bulk update cancelled: {e}")
+        return redirect(redirect_url)
+
+    if is_json:
+        return JsonResponse({'ok': True, 'updated': changed})
+    messages.success(request, f"{changed} product(s) updated.")
+    return redirect(redirect_url)
+
+
 @admin_required
 def bulk_manage_products(request):
     if request.method != 'POST':
@@ -1009,24 +1654,18 @@ def bulk_manage_products(request):
         messages.error(request, "Selected products are no longer available.")
         return redirect(redirect_url)
 
-    changed_count = 0
-    blocked_count = 0
-
+    # update() skips the post_save signal, so the catalog is invalidated by hand.
     if action == 'archive':
-        for product in products_qs:
-            if not product.is_archived:
-                product.is_archived = True
-                product.save(update_fields=['is_archived'])
-                changed_count += 1
+        changed_count = products_qs.filter(is_archived=False).update(is_archived=True, updated_at=timezone.now())
+        if changed_count:
+            catalog_changed()
         messages.success(request, f"{changed_count} product(s) archived.")
         return redirect(redirect_url)
 
     if action == 'restore':
-        for product in products_qs:
-            if product.is_archived:
-                product.is_archived = False
-                product.save(update_fields=['is_archived'])
-                changed_count += 1
+        changed_count = products_qs.filter(is_archived=True).update(is_archived=False, updated_at=timezone.now())
+        if changed_count:
+            catalog_changed()
         messages.success(request, f"{changed_count} product(s) restored.")
         return redirect(redirect_url)
 
@@ -1036,12 +1675,23 @@ def bulk_manage_products(request):
             messages.error(request, "Bulk delete cancelled. Type DELETE to confirm.")
             return redirect(redirect_url)
 
-        for product in products_qs:
+        # Checkout lines and stock movements PROTECT their product; split
+        # the selection up front instead of letting each delete() fail.
+        protected = (
+            Exists(PCBuildItem.objects.filter(product_id=OuterRef('pk'))) |
+            Exists(StockMovement.objects.filter(product_id=OuterRef('pk')))
+        )
+        partition = dict(products_qs.annotate(protected=protected).values_list('id', 'protected'))
+        deletable_ids = [product_id for product_id, is_protected in partition.items() if not is_protected]
+        blocked_count = len(partition) - len(deletable_ids)
+        changed_count = 0
+        if deletable_ids:
             try:
-                product.delete()
-                changed_count += 1
+                _, deleted = Product.objects.filter(id__in=deletable_ids).delete()
+                changed_count = deleted.get(Product._meta.label, 0)
             except ProtectedError:
-                blocked_count += 1
+                # A checkout or stock change landed in between; delete() rolled back.
+                blocked_count = len(partition)
 
         if changed_count:
             messages.success(request, f"{changed_count} product(s) deleted permanently.")
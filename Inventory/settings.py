@@ -105,6 +105,20 @@ DATABASES = {
 }
 
 
+# Cache
+# The catalog and sales version keys (Base.catalog, Base.sales) are bumped
+# on every product write and checkout, and cached pages key on them, so
+# every web process and job worker must share one cache. The default
+# in-process LocMemCache is only correct with a single process; when
+# running several, point CACHE_BACKEND/CACHE_LOCATION at a shared server,
+# e.g. django.core.cache.backends.redis.RedisCache and redis://127.0.0.1:6379/1.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -10,5 +10,5 @@ builds = PCBuild.objects.all()
 print(f'Total builds: {builds.count()}')
 print(f'Checked out: {builds.filter(status="checked_out").count()}')
 
-for b in builds:
-    print(f'Build #{b.id}: status={b.status}, total={b.total_price}, items={b.items.count()}')
+for b in builds.iterator(chunk_size=2000):
+    print(f'Build #{b.id}: status={b.status}, total={b.total_price}, items={b.item_count}')